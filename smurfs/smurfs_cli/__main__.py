@@ -5,8 +5,10 @@ import typer
 from typing import Optional, Annotated
 from pathlib import Path
 
-from smurfs.smurfs_common.preprocessing.dataloader import FluxType, Mission
-from smurfs.smurfs_common.smurfs_.smurfs import Smurfs, FitMethod, ImproveFitMode
+from smurfs.smurfs_common.support.mprint import MPrinter
+from smurfs.smurfs_common.support.options import FluxType, Mission, FitMethod, ImproveFitMode, Significance, \
+    FapMethod, Verbosity
+from smurfs.smurfs_common.support.settings import Settings
 
 app = typer.Typer()
 
@@ -57,7 +59,31 @@ def main(
                                                             help="Ratio for comparing found frequency to original periodogram."),
         improve_fit_mode: ImproveFitMode = typer.Option(ImproveFitMode.ALL, "--improve-fit-mode", "-imf",
                                                         help="Mode for improving frequency fits."),
+        batch_size: int = typer.Option(1, "--batch-size", "-bs",
+                                       help="Maximum number of resolved peaks removed per iteration."),
+        batch_separation: float = typer.Option(2.5, "--batch-separation", "-bsep",
+                                               help="Minimum separation of peaks in a batch, in units of 1/T."),
+        max_frequencies: Optional[int] = typer.Option(None, "--max-frequencies", "-maxf",
+                                                      help="Stop the extraction after n frequencies."),
+        max_wall_time: Optional[float] = typer.Option(None, "--max-wall-time", "-maxt",
+                                                      help="Stop the extraction after this many seconds."),
+        max_memory: Optional[float] = typer.Option(None, "--max-memory", "-maxm",
+                                                   help="Stop the extraction if the process uses more memory (MB)."),
+        fit_time: Optional[float] = typer.Option(None, "--fit-time", "-fitt",
+                                                 help="Time budget of every fit in seconds, stalled fits fall back "
+                                                      "to a closed form fit."),
+        fit_cache_path: Optional[Path] = typer.Option(None, "--fit-cache", "-fc",
+                                                      help="Read and store fit results in this SQLite cache, which "
+                                                           "speeds up reruns of a target."),
+        fit_cache_size: float = typer.Option(256, "--fit-cache-size", "-fcs",
+                                             help="Maximum size of the fit cache in MB."),
         fit_method: FitMethod = typer.Option(FitMethod.LMFIT, "--fit-method", "-fm", help="Fitting library to use."),
+        significance: Significance = typer.Option(Significance.SNR, "--significance", "-sig",
+                                                  help="Significance criterion for frequencies."),
+        fap_threshold: float = typer.Option(0.01, "--fap-threshold", "-fap",
+                                            help="False alarm probability below which frequencies are significant."),
+        fap_method: FapMethod = typer.Option(FapMethod.BALUEV, "--fap-method", "-fapm",
+                                             help="Method to compute the false alarm probability."),
         flux_type: FluxType = typer.Option(FluxType.PDCSAP, "--flux-type", "-ft",
                                            help="Type of flux data product to use."),
         do_pca: bool = typer.Option(False, "--do-pca", "-pca", help="Activate PCA analysis for LC data."),
@@ -65,46 +91,87 @@ def main(
         store_object: bool = typer.Option(False, "--store-object", "-so",
                                           help="Store the SMURFS object in the results."),
         save_path: Path = typer.Option(Path("."), "--save-path", "-sp", help="Save path for the analysis results."),
+        catalog_path: Optional[Path] = typer.Option(None, "--catalog", "-cat",
+                                                    help="Additionally add the results to this SQLite catalog."),
         interactive: bool = typer.Option(False, "--interactive", "-i", help="Start an iPython shell after analysis."),
         mission: Mission = typer.Option(Mission.TESS, "--mission", "-m", help="Mission to consider."),
         sigma_clip: float = typer.Option(4.0, "--sigma-clip", "-cl", help="Sigma for the sigma clipping."),
         iters: int = typer.Option(1, "--iters", "-it", help="Iterations for the sigma clipping."),
         apply_corrections: bool = typer.Option(False, "--apply-corrections", "-ac", help="Apply corrections to files."),
+        log_level: Verbosity = typer.Option(Verbosity.LOG, "--log-level", "-ll",
+                                            help="Minimum level of printed messages."),
+        log_json: Optional[Path] = typer.Option(None, "--log-json", "-lj",
+                                                help="Additionally write all messages as JSON lines into this file."),
 ):
     """
     SMURFS: Stellar Measurements Under Relative Fairness Standards
 
     This tool analyzes stellar data from various missions or custom files to extract frequency information.
     """
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-
-        s = Smurfs(
-            target=target,
-            flux_type=flux_type,
-            sigma_clip=sigma_clip,
-            iters=iters,
-            do_pca=do_pca,
-            do_psf=do_psf,
-            apply_file_correction=apply_corrections,
-            mission=mission,
-        )
-
-        improve_fit = improve_fit_mode == ImproveFitMode.ALL
-        f_min = frequency_range.min if frequency_range else None
-        f_max = frequency_range.max if frequency_range else None
-
-        s.run(snr=snr, window_size=window_size, f_min=f_min, f_max=f_max,
-              skip_similar=skip_similar_frequencies, similar_chancel=not skip_cutoff
-              , extend_frequencies=extend_frequencies, improve_fit=improve_fit
-              , mode=fit_method, frequency_detection=frequency_detection)
-
-        if improve_fit:
-            s.improve_result()
-
-        s.save(save_path, store_object)
+    # Imported here, so that '--help' and argument errors don't wait for the scientific stack
+    from smurfs.smurfs_common.smurfs_.smurfs import Smurfs
+
+    Settings.level = log_level.value
+    json_file = log_json.open("a") if log_json is not None else None
+    MPrinter.set_json_output(json_file)
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+
+            s = Smurfs(
+                target=target,
+                flux_type=flux_type,
+                sigma_clip=sigma_clip,
+                iters=iters,
+                do_pca=do_pca,
+                do_psf=do_psf,
+                apply_file_correction=apply_corrections,
+                mission=mission,
+            )
+
+            improve_fit = improve_fit_mode == ImproveFitMode.ALL
+            f_min = frequency_range.min if frequency_range else None
+            f_max = frequency_range.max if frequency_range else None
+
+            fit_cache = None
+            if fit_cache_path is not None:
+                from smurfs.smurfs_common.signal.fit_cache import FitCache
+
+                fit_cache = FitCache(fit_cache_path, fit_cache_size)
+
+            try:
+                s.run(snr=snr, window_size=window_size, f_min=f_min, f_max=f_max,
+                      skip_similar=skip_similar_frequencies, similar_chancel=not skip_cutoff
+                      , extend_frequencies=extend_frequencies, improve_fit=improve_fit
+                      , mode=fit_method, frequency_detection=frequency_detection
+                      , significance=significance, fap_threshold=fap_threshold, fap_method=fap_method
+                      , batch_size=batch_size, batch_separation=batch_separation, max_frequencies=max_frequencies
+                      , max_wall_time=max_wall_time, max_memory=max_memory, fit_time=fit_time, fit_cache=fit_cache)
+
+                if improve_fit:
+                    s.improve_result()
+            finally:
+                if fit_cache is not None:
+                    fit_cache.close()
+
+            if catalog_path is not None:
+                from smurfs.smurfs_common.smurfs_.catalog import FrequencyCatalog
+
+                with FrequencyCatalog(catalog_path) as catalog:
+                    s.save(save_path, store_object, catalog)
+            else:
+                s.save(save_path, store_object)
+    finally:
+        if json_file is not None:
+            MPrinter.set_json_output(None)
+            json_file.close()
 
 if __name__ == "__main__" or __name__ == "smurfs.smurfs_cli.__main__":
-    app()
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from smurfs.smurfs_cli.serve import serve_app
+        serve_app(sys.argv[2:], prog_name="smurfs serve")
+    else:
+        app()
 
 sys.exit(0)
\ No newline at end of file
@@ -0,0 +1,27 @@
+from pathlib import Path
+from typing import Optional
+
+import typer
+
+serve_app = typer.Typer()
+
+
+@serve_app.command()
+def serve(
+        host: str = typer.Option("127.0.0.1", "--host", help="Host the service listens on."),
+        port: int = typer.Option(8765, "--port", "-p", help="Port the service listens on."),
+        socket_path: Optional[Path] = typer.Option(None, "--socket", "-s",
+                                                   help="Listen on this Unix socket instead of a TCP port."),
+        workers: Optional[int] = typer.Option(None, "--workers", "-w",
+                                              help="Number of concurrent analyses. Defaults to the number of CPUs."),
+        cache_size: int = typer.Option(32, "--cache-size", "-cs",
+                                       help="Number of light curves and periodograms kept in memory."),
+):
+    """
+    Runs SMURFS as a long-running JSON service. Libraries stay loaded and light curves and periodograms are cached
+    between jobs. Submit jobs with POST /jobs, stream results with GET /jobs/<id>/stream and read queue and
+    throughput metrics with GET /metrics.
+    """
+    from smurfs.smurfs_service.server import serve as run_service
+
+    run_service(host, port, socket_path, workers, cache_size)
@@ -1,3 +1,5 @@
+from typing import Tuple
+
 import numpy as np
 from uncertainties import unumpy as unp
 import astropy.units as u
@@ -25,4 +27,54 @@ def mag(lc: LightCurve) -> LightCurve:
 
     lc.flux = unp.nominal_values(valid_flux) * u.mag
     lc.flux_err = unp.std_devs(valid_flux) * u.mag
-    return lc
\ No newline at end of file
+    return lc
+
+def mag_arrays(flux: np.ndarray, flux_err: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Same conversion as *mag*, on plain arrays and without propagating the uncertainties through the *uncertainties*
+    package.
+
+    :param flux: Flux
+    :param flux_err: Uncertainty of the flux
+    :return: Magnitude and its uncertainty for all valid points, as well as the mask of valid points
+    """
+    valid = np.isfinite(flux)
+    if not np.any(valid):
+        return np.empty(0), np.empty(0), valid
+
+    flux = flux[valid]
+    flux = flux + (np.abs(2 * np.amin(flux)) if np.amin(flux) < 0 else 100)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        magnitude = -2.5 * np.log10(flux)
+        magnitude_err = 2.5 / np.log(10) * np.abs(flux_err[valid] / flux)
+
+    finite = np.isfinite(magnitude)
+    valid[valid] = finite
+    magnitude = magnitude[finite]
+    return magnitude - np.median(magnitude), magnitude_err[finite], valid
+
+
+def sigma_clip_mask(values: np.ndarray, sigma: float = 4, maxiters: int = 1) -> np.ndarray:
+    """
+    Iterative sigma clipping around the median, equivalent to *LightCurve.remove_outliers*. Points further away than
+    *sigma* standard deviations from the median are clipped, and median and standard deviation are recomputed from
+    the remaining points, until no further point is clipped or *maxiters* iterations are done.
+
+    :param values: Values that are clipped
+    :param sigma: Number of standard deviations
+    :param maxiters: Maximum number of iterations. None iterates until convergence
+    :return: Mask of points that are kept
+    """
+    mask = np.isfinite(values)
+    iteration = 0
+    while maxiters is None or iteration < maxiters:
+        kept = values[mask]
+        if len(kept) == 0:
+            break
+        new_mask = mask & (np.abs(values - np.median(kept)) <= sigma * np.std(kept))
+        iteration += 1
+        if np.count_nonzero(new_mask) == len(kept):
+            break
+        mask = new_mask
+    return mask
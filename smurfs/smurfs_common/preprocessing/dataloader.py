@@ -1,27 +1,14 @@
 import os.path
-from enum import Enum
 from pathlib import Path
 
 import numpy as np
-from lightkurve import LightCurveCollection
-from pandas import read_csv
-import lightkurve as lk
 
 from smurfs.smurfs_common.preprocessing.calculators import mag
+from smurfs.smurfs_common.preprocessing.download import fetch_light_curves, StorageBackend
+from smurfs.smurfs_common.preprocessing.sectors import preprocess_sectors, StageTimer
 from smurfs.smurfs_common.signal.lightcurve import LightCurve
 from smurfs.smurfs_common.support.mprint import mprint, log, warn, info
-
-
-class Mission(str, Enum):
-    KEPLER = "Kepler"
-    TESS = "TESS"
-    K2 = "K2"
-    all = "all"
-
-
-class FluxType(str, Enum):
-    PDCSAP = "PDCSAP"
-    SAP = "SAP"
+from smurfs.smurfs_common.support.options import Mission, FluxType
 
 
 def load_data_from_file(target_path : Path, clip: float = 4, it: int = 1, apply_file_correction: bool = False) -> LightCurve:
@@ -32,6 +19,8 @@ def load_data_from_file(target_path : Path, clip: float = 4, it: int = 1, apply_
     try:
         data = np.loadtxt(target_path)
     except ValueError:
+        from pandas import read_csv
+
         data = read_csv(target_path)
         data = np.array((data.time, data.flux))
     if data.shape[0] > data.shape[1]:
@@ -63,32 +52,27 @@ def load_data_from_file(target_path : Path, clip: float = 4, it: int = 1, apply_
     mprint("Extracted data from target!", info)
     return lc
 
-def load_data_from_target_name(target_name : str, flux_type: FluxType, mission: Mission = Mission.TESS, sigma_clip : float =4, iters: int = 1 ) -> LightCurve:
+def load_data_from_target_name(target_name : str, flux_type: FluxType, mission: Mission = Mission.TESS, sigma_clip : float =4, iters: int = 1,
+                               backend: StorageBackend = None) -> LightCurve:
 
     chosen_mission = (mission,) if mission != Mission.all else (Mission.KEPLER, Mission.TESS, Mission.K2)
     mprint(f"Searching processed light curves for {target_name} on mission(s) {','.join(chosen_mission)} ... ", log)
 
-    if len(chosen_mission) == 1:
-        results = lk.search_lightcurve(target_name, mission=chosen_mission[0].value)
-    else:
-        results = lk.search_lightcurve(target_name)
-
-    if len(results) == 0:
-        raise FileNotFoundError(f"No light curve found for {target_name} on mission(s) {','.join(chosen_mission)}")
-
-    downloads = results.download_all()
+    timer = StageTimer()
+    downloads = fetch_light_curves(target_name, chosen_mission, backend, timer=timer)
+    mprint(f"Downloaded {len(downloads)} light curves for {target_name}", info)
 
-    available_missions = set([result.mission[0].split(" ")[0] for result in results])
-    mprint(f"Found light curves for {target_name} on mission(s) {','.join(available_missions)}", info)
-
-    return LightCurve(downloads.stitch(corrector_func=mag).remove_nans().remove_outliers(sigma_clip,maxiters=iters))
+    lc = preprocess_sectors(downloads, sigma_clip, iters, timer=timer)
+    timer.report(f"Loading {target_name}")
+    return lc
 
-def load_data(target_name : str,  flux_type: FluxType,clip: float = 4, iters: int = 1, mission: Mission = Mission.TESS) -> LightCurve:
+def load_data(target_name : str,  flux_type: FluxType,clip: float = 4, iters: int = 1, mission: Mission = Mission.TESS,
+              backend: StorageBackend = None) -> LightCurve:
     target_path = Path(target_name)
 
     if target_path.is_file():
         return load_data_from_file(target_path,clip)
     else:
-        return load_data_from_target_name(target_name,flux_type,mission, clip, iters)
+        return load_data_from_target_name(target_name,flux_type,mission, clip, iters, backend)
 
     pass
\ No newline at end of file
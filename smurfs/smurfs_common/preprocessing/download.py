@@ -0,0 +1,176 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Sequence, TypeVar
+
+from smurfs.smurfs_common.preprocessing.sectors import StageTimer
+from smurfs.smurfs_common.support.mprint import mprint, log, warn
+from smurfs.smurfs_common.support.options import Mission
+
+T = TypeVar('T')
+
+# If set, light curves are read from this local mirror instead of the archive, see *MirrorBackend*
+mirror_env = "SMURFS_MIRROR"
+
+
+@dataclass
+class Product:
+    """
+    A single light curve product of a target, f.e. one TESS sector.
+
+    :param mission: Mission of the product
+    :param name: Name of the product, f.e. its file name
+    :param source: Backend specific reference of the product
+    """
+    mission: str
+    name: str
+    source: Any
+
+
+class StorageBackend:
+    """
+    Source of light curve products. Backends need to be thread safe, as products are searched and fetched
+    concurrently.
+    """
+
+    def search(self, target: str, mission: Mission) -> List[Product]:
+        """
+        Returns all products of a target for a mission.
+        """
+        raise NotImplementedError
+
+    def fetch(self, product: Product):
+        """
+        Downloads (or reads) a product and returns its light curve.
+        """
+        raise NotImplementedError
+
+
+class ArchiveBackend(StorageBackend):
+    """
+    Searches and downloads products from MAST through lightkurve.
+
+    :param download_dir: Cache directory of the downloads, defaults to the cache of lightkurve
+    """
+
+    def __init__(self, download_dir: Optional[Path] = None):
+        self.download_dir = download_dir
+
+    def search(self, target: str, mission: Mission) -> List[Product]:
+        # The search module pulls in astroquery, which is only needed for target names
+        import lightkurve as lk
+
+        results = lk.search_lightcurve(target, mission=Mission(mission).value)
+        return [Product(results.mission[i].split(" ")[0], str(results.table['productFilename'][i]), results[i])
+                for i in range(len(results))]
+
+    def fetch(self, product: Product):
+        download_dir = str(self.download_dir) if self.download_dir is not None else None
+        return product.source.download(download_dir=download_dir)
+
+
+class MirrorBackend(StorageBackend):
+    """
+    Reads products from a local directory, which mirrors the FITS products of the archive. The mirror has one
+    folder per mission and target, where spaces in the target name are replaced by underscores, f.e.
+    'mirror/TESS/TIC_12345/*.fits'. This allows to run and benchmark the download path offline.
+
+    :param root: Root directory of the mirror
+    :param pattern: Pattern of the product files
+    :param reader: Function reading a product file, defaults to *lightkurve.read*
+    """
+
+    def __init__(self, root: Path, pattern: str = "*.fits", reader: Callable[[Path], Any] = None):
+        self.root = Path(root)
+        self.pattern = pattern
+        self.reader = reader
+
+    def search(self, target: str, mission: Mission) -> List[Product]:
+        mission = Mission(mission).value
+        folder = self.root / mission / target.strip().replace(" ", "_")
+        return [Product(mission, path.name, path) for path in sorted(folder.glob(self.pattern))]
+
+    def fetch(self, product: Product):
+        if self.reader is not None:
+            return self.reader(product.source)
+
+        import lightkurve as lk
+
+        return lk.read(str(product.source))
+
+
+def default_backend() -> StorageBackend:
+    """
+    Returns a *MirrorBackend* if the SMURFS_MIRROR environment variable points to a mirror, otherwise an
+    *ArchiveBackend*.
+    """
+    mirror = os.environ.get(mirror_env)
+    return MirrorBackend(Path(mirror)) if mirror else ArchiveBackend()
+
+
+def with_retries(function: Callable[[], T], description: str, retries: int = 3, backoff: float = 1.0) -> T:
+    """
+    Calls *function*, and retries it with exponential backoff if it raises an exception.
+
+    :param function: Function without arguments
+    :param description: Description used in warnings
+    :param retries: Number of retries after the first attempt
+    :param backoff: Waiting time before the first retry in seconds, doubled for every further retry
+    :return: Return value of *function*
+    """
+    for attempt in range(retries + 1):
+        try:
+            return function()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            mprint(f"{description} failed ({e}), retrying in {'%.1f' % (backoff * 2 ** attempt)}s ...", warn)
+            time.sleep(backoff * 2 ** attempt)
+
+
+def fetch_light_curves(target: str, missions: Sequence[Mission], backend: StorageBackend = None, workers: int = 8,
+                       retries: int = 3, backoff: float = 1.0, timer: StageTimer = None) -> List[Any]:
+    """
+    Searches all missions concurrently for products of a target and fetches the products concurrently, using a
+    bounded thread pool. Failed searches and downloads are retried.
+
+    :param target: Name of the target
+    :param missions: Missions that are searched
+    :param backend: Storage backend, defaults to *default_backend*
+    :param workers: Maximum number of concurrent searches and downloads
+    :param retries: Number of retries of every search and download
+    :param backoff: Waiting time before the first retry in seconds
+    :param timer: Optional *StageTimer*, that receives the durations of the search and the download
+    :return: Light curves of all products, ordered by mission and product name
+    """
+    backend = default_backend() if backend is None else backend
+    timer = StageTimer() if timer is None else timer
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        with timer.stage("search"):
+            searches = [executor.submit(with_retries, lambda m=m: backend.search(target, m),
+                                        f"Search of {target} on {Mission(m).value}", retries, backoff)
+                        for m in missions]
+            products = sorted((p for search in searches for p in search.result()),
+                              key=lambda p: (p.mission, p.name))
+
+        if len(products) == 0:
+            raise FileNotFoundError(f"No light curve found for {target} on mission(s) "
+                                    f"{','.join(Mission(m).value for m in missions)}")
+
+        mprint(f"Found {len(products)} products for {target} on mission(s) "
+               f"{','.join(sorted(set(p.mission for p in products)))}", log)
+
+        with timer.stage("download"):
+            futures = {executor.submit(with_retries, lambda p=p: backend.fetch(p), f"Download of {p.name}",
+                                       retries, backoff): i for i, p in enumerate(products)}
+            light_curves = [None] * len(products)
+            for done, future in enumerate(as_completed(futures), start=1):
+                i = futures[future]
+                light_curves[i] = future.result()
+                mprint(f"Downloaded {done}/{len(products)}: {products[i].name}", log,
+                       {"done": done, "total": len(products), "product": products[i].name})
+
+    return light_curves
@@ -0,0 +1,128 @@
+import os
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import astropy.units as u
+from astropy.time import Time
+
+from smurfs.smurfs_common.preprocessing.calculators import mag_arrays, sigma_clip_mask
+from smurfs.smurfs_common.signal.lightcurve import LightCurve
+from smurfs.smurfs_common.support.mprint import mprint, log
+
+
+class StageTimer:
+    """
+    Measures the duration of the stages of the preprocessing. Durations of stages with the same name are added up.
+    """
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, perf_counter() - start)
+
+    def add(self, name: str, duration: float):
+        self.durations[name] = self.durations.get(name, 0) + duration
+
+    def report(self, title: str):
+        mprint(lambda: f"{title}: " + ", ".join(f"{name} {'%.2f' % duration}s"
+                                                for name, duration in self.durations.items()),
+               log, lambda: {"stages": dict(self.durations)})
+
+
+def _column(values) -> np.ndarray:
+    """
+    Returns a plain float array of a (possibly masked) column, masked values are NaN.
+    """
+    values = getattr(values, 'value', values)
+    if hasattr(values, 'filled'):
+        values = values.filled(np.nan)
+    return np.asarray(values, dtype=np.float64)
+
+
+def _time_column(time: Time, reference: Time) -> np.ndarray:
+    """
+    Returns the values of a time axis in the format and scale of *reference*. Sectors of different missions use
+    different formats (f.e. BKJD for Kepler and BTJD for TESS), so their raw values can't be combined.
+    """
+    return _column(getattr(time, reference.scale).to_value(reference.format))
+
+
+def prepare_sector(time: np.ndarray, flux: np.ndarray, flux_err: np.ndarray, sigma_clip: float = 4,
+                   iters: int = 1) -> Tuple[np.ndarray, Dict[str, float]]:
+    """
+    Converts a single sector to magnitudes, normalizes it around zero and sigma clips it.
+
+    :param time: Time axis
+    :param flux: Flux
+    :param flux_err: Uncertainty of the flux
+    :param sigma_clip: Sigma of the clipping
+    :param iters: Iterations of the clipping
+    :return: Array of shape (3, n) with time, magnitude and its uncertainty, as well as the durations of the stages
+    """
+    start = perf_counter()
+    magnitude, magnitude_err, valid = mag_arrays(flux, flux_err)
+    converted = perf_counter()
+
+    mask = sigma_clip_mask(magnitude, sigma_clip, iters)
+    data = np.vstack((time[valid][mask], magnitude[mask], magnitude_err[mask]))
+    return data, {"convert": converted - start, "clip": perf_counter() - converted}
+
+
+def preprocess_sectors(sectors: Sequence, sigma_clip: float = 4, iters: int = 1, workers: int = None,
+                       timer: StageTimer = None) -> LightCurve:
+    """
+    Converts, normalizes and sigma clips the light curves of several sectors (or quarters) in parallel threads and
+    concatenates them into a single light curve. Every sector is processed on plain arrays, and the result is written
+    into one contiguous buffer, sorted by the start of the sectors. All time axes are converted to the format and
+    scale of the first sector.
+
+    :param sectors: Light curves of the sectors, f.e. a *LightCurveCollection*
+    :param sigma_clip: Sigma of the clipping
+    :param iters: Iterations of the clipping
+    :param workers: Number of threads, defaults to the number of CPUs
+    :param timer: Optional *StageTimer*, that receives the durations of the stages
+    :return: Light curve in magnitudes
+    """
+    timer = StageTimer() if timer is None else timer
+    sectors = list(sectors)
+    if len(sectors) == 0:
+        raise ValueError("No light curves to preprocess")
+
+    first = sectors[0]
+    with timer.stage("extract"):
+        arrays = [(_time_column(lc.time, first.time), _column(lc.flux), _column(lc.flux_err)) for lc in sectors]
+
+    workers = os.cpu_count() if workers is None else workers
+    with timer.stage("sectors"), ThreadPoolExecutor(max_workers=max(1, min(workers, len(arrays)))) as executor:
+        results: List[Tuple[np.ndarray, Dict[str, float]]] = list(
+            executor.map(lambda a: prepare_sector(*a, sigma_clip=sigma_clip, iters=iters), arrays))
+
+    for _, durations in results:
+        for name, duration in durations.items():
+            timer.add(f"{name} (per sector)", duration)
+
+    with timer.stage("concatenate"):
+        parts = sorted((data for data, _ in results if data.shape[1] > 0), key=lambda data: data[0, 0])
+        if len(parts) == 0:
+            raise ValueError("No valid data points left after preprocessing")
+
+        data = np.empty((3, sum(i.shape[1] for i in parts)))
+        position = 0
+        for part in parts:
+            data[:, position:position + part.shape[1]] = part
+            position += part.shape[1]
+
+        lc = LightCurve(time=Time(data[0], format=first.time.format, scale=first.time.scale),
+                        flux=data[1] * u.mag, flux_err=data[2] * u.mag, meta=dict(first.meta))
+
+    mprint(f"Preprocessed {len(sectors)} light curves with {len(lc)} points", log)
+    return lc
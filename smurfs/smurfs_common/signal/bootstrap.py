@@ -0,0 +1,123 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from typing import Tuple
+
+import numpy as np
+from scipy.optimize import least_squares
+
+from smurfs.smurfs_common.signal.frequency_finder import sin_multiple, sin_multiple_jacobian, reference_epoch, \
+    to_epoch
+from smurfs.smurfs_common.support.mprint import mprint, info, log, warn
+
+
+class UncertaintyMethod(str, Enum):
+    BOOTSTRAP = "bootstrap"
+    MONTECARLO = "montecarlo"
+
+
+def _refit_samples(x: np.ndarray, model: np.ndarray, noise: np.ndarray, p0: np.ndarray, method: UncertaintyMethod,
+                   seeds: np.ndarray) -> np.ndarray:
+    """
+    Refits the multi-sine model for a number of noise realisations. Every realisation has its own seed, so the
+    result does not depend on how samples are distributed between workers. Fits are warm-started at the best fit,
+    using the analytic jacobian of the model.
+
+    :param x: Time axis, centered on the reference epoch
+    :param model: Best fit model of the light curve
+    :param noise: Residuals of the best fit (bootstrap), or the noise level per data point (monte carlo)
+    :param p0: Best fit parameters, phases relative to the reference epoch
+    :param method: Either bootstrap or monte carlo
+    :param seeds: Seed for every sample
+    :return: Array of shape (len(seeds), len(p0)). Failed fits are filled with nans
+    """
+    result = np.full((len(seeds), len(p0)), np.nan)
+    for i, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        if method == UncertaintyMethod.BOOTSTRAP:
+            y = model + noise[rng.integers(0, len(noise), len(noise))]
+        else:
+            y = model + rng.normal(0, noise)
+
+        try:
+            fit = least_squares(lambda p: sin_multiple(x, *p) - y, p0,
+                                jac=lambda p: sin_multiple_jacobian(x, *p), method='lm', x_scale='jac')
+        except (ValueError, RuntimeError):
+            continue
+        if fit.success:
+            p = fit.x.copy()
+            # A negative amplitude is equivalent to a phase shift of half a period
+            negative = p[0::3] < 0
+            p[0::3][negative] *= -1
+            p[2::3][negative] += 0.5
+            result[i] = p
+    return result
+
+
+def estimate_uncertainties(time: np.ndarray, flux: np.ndarray, params: np.ndarray, flux_err: np.ndarray = None,
+                           n_samples: int = 100, workers: int = None,
+                           method: UncertaintyMethod = UncertaintyMethod.BOOTSTRAP,
+                           seed: int = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Computes empirical uncertainties of a multi-sine model, by refitting it to residual bootstrap samples or
+    monte carlo noise realisations of the light curve. The refits are distributed on a process pool.
+
+    :param time: Time axis, days
+    :param flux: Flux axis, mag
+    :param params: Best fit parameters of the model, see *sin_multiple*
+    :param flux_err: Uncertainties of the flux. Only used for the monte carlo method, if not given the standard deviation of the residuals is used
+    :param n_samples: Number of samples
+    :param workers: Number of processes used. If None, the number of CPUs is used
+    :param method: 'bootstrap' resamples the residuals, 'montecarlo' adds gaussian noise to the model
+    :param seed: Seed of the random number generator, makes the result reproducible
+    :return: Uncertainties of amplitude, frequency and phase, each an array with an entry per frequency. The phase
+    uncertainty holds at the middle of the data set (see *reference_epoch*), like the analytic one
+    """
+    method = UncertaintyMethod(method)
+    time = np.asarray(time, dtype=float)
+    flux = np.asarray(flux, dtype=float)
+
+    # Fitting relative to the middle of the data set decorrelates frequency and phase
+    epoch = reference_epoch(time)
+    x = time - epoch
+    p0 = to_epoch(params, epoch)
+
+    model = sin_multiple(x, *p0)
+    residuals = flux - model
+
+    if method == UncertaintyMethod.BOOTSTRAP:
+        noise = residuals
+    elif flux_err is not None and np.all(np.isfinite(flux_err)) and np.all(np.asarray(flux_err) > 0):
+        noise = np.asarray(flux_err, dtype=float)
+    else:
+        noise = np.full(len(flux), np.std(residuals))
+
+    workers = os.cpu_count() if workers is None else workers
+    seeds = np.random.SeedSequence(seed).generate_state(n_samples, dtype=np.uint64)
+
+    mprint(f"Refitting {len(p0) // 3} frequencies on {n_samples} {method.value} samples with {workers} workers", info)
+
+    if workers == 1:
+        samples = _refit_samples(x, model, noise, p0, method, seeds)
+    else:
+        chunks = np.array_split(seeds, min(workers, n_samples))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_refit_samples, x, model, noise, p0, method, c) for c in chunks]
+            samples = np.concatenate([future.result() for future in futures])
+
+    failed = np.count_nonzero(np.isnan(samples[:, 0]))
+    if failed > 0:
+        mprint(f"{failed} of {n_samples} refits failed and are ignored", warn)
+
+    sigma_amp = np.nanstd(samples[:, 0::3], axis=0, ddof=1)
+    sigma_f = np.nanstd(samples[:, 1::3], axis=0, ddof=1)
+
+    # The spread of the phases is taken at the reference epoch, shifting them to epoch 0 would add the frequency
+    # jitter times the distance to it. Phases are only defined modulo 1, so the circular standard deviation is used
+    angles = 2 * np.pi * samples[:, 2::3]
+    valid = ~np.isnan(samples[:, 0])
+    resultant = np.hypot(np.cos(angles[valid]).mean(axis=0), np.sin(angles[valid]).mean(axis=0))
+    sigma_phi = np.sqrt(-2 * np.log(np.clip(resultant, 1e-300, 1))) / (2 * np.pi)
+
+    mprint(f"Median relative amplitude uncertainty: {'%.2e' % np.median(sigma_amp / p0[0::3])}", log)
+    return sigma_amp, sigma_f, sigma_phi
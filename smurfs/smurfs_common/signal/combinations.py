@@ -0,0 +1,182 @@
+from itertools import product
+from typing import Dict, List, Tuple
+
+import numpy as np
+from pandas import DataFrame as df
+
+from smurfs.smurfs_common.support.mprint import mprint, log
+
+combination_columns = ["Name", "ID", "Frequency", "Amplitude", "Solution", "Residual", "Independent", "Other_Solutions"]
+
+
+def _term(coefficient: int, f_id: int, first: bool) -> str:
+    """
+    Formats a single term of a combination, f.e. '2f1' or '-f3'.
+    """
+    sign = '-' if coefficient < 0 else ('' if first else '+')
+    n = abs(coefficient)
+    return f"{sign}{'' if n == 1 else n}f{f_id}"
+
+
+class CombinationFinder:
+    """
+    Searches combinations of frequencies, i.e. frequencies that can be explained by a linear combination of other
+    frequencies with higher amplitudes. The following combinations are considered:
+
+    - Harmonics: n*f_i, with 2 <= n <= *max_order*
+    - Pairs: n*f_i + m*f_j, with 1 <= |n|, |m| <= *max_order*
+    - Triples: +-f_i +- f_j +- f_k, where f_i and f_j are within the *triple_parents* frequencies with highest amplitude
+
+    Instead of building all combinations, the search solves for the missing frequency of a combination and looks it
+    up in a sorted frequency index, vectorized over all targets and parents. If a frequency has several solutions, the
+    one with the lowest sum of absolute coefficients is used, followed by the smallest residual. Remaining ties are
+    resolved in favour of the parents with higher amplitudes, comparing the strongest parents first. Results are
+    cached between calls of *update*, so only frequencies that were added or refined, and the frequencies they could
+    be a parent of, are searched again.
+
+    :param tolerance: Maximum difference between a frequency and a combination, c/d
+    :param max_order: Maximum absolute coefficient of harmonics and pairs
+    :param triple_parents: Number of highest amplitude frequencies that are used for the first two terms of triples. 0 disables triples.
+    """
+
+    def __init__(self, tolerance: float = 0.002, max_order: int = 2, triple_parents: int = 30):
+        self.tolerance = tolerance
+        self.max_order = max_order
+        self.triple_parents = triple_parents
+
+        self._ids = np.empty(0, dtype=int)
+        self._f = np.empty(0)
+        self._a = np.empty(0)
+        self._solutions: Dict[int, List[Tuple[int, float, str, Tuple[float, ...]]]] = {}
+        self._frame = df([], columns=combination_columns)
+
+    @property
+    def frame(self) -> df:
+        """
+        Returns the combinations of the last call to *update*.
+        """
+        return self._frame
+
+    def _changed(self, ids: np.ndarray, f: np.ndarray, a: np.ndarray) -> Tuple[np.ndarray, float]:
+        """
+        Compares new values with the cached ones.
+
+        :return: Mask of frequencies that are new or changed, and the highest amplitude of all frequencies that changed or were removed
+        """
+        old = {i: (fi, ai) for i, fi, ai in zip(self._ids, self._f, self._a)}
+        changed = np.array([i not in old or abs(old[i][0] - fi) > self.tolerance / 10 or
+                            abs(old[i][1] - ai) > 1e-3 * abs(ai) for i, fi, ai in zip(ids, f, a)], dtype=bool)
+
+        current = set(ids.tolist())
+        amps = list(a[changed]) + [old[i][1] for i in ids[changed] if i in old]
+        amps += [ai for i, (_, ai) in old.items() if i not in current]
+        return changed, max(amps) if len(amps) > 0 else -np.inf
+
+    def _search(self, targets: np.ndarray, ids: np.ndarray, f: np.ndarray, a: np.ndarray) -> Dict[int, list]:
+        """
+        Searches all combinations for the given targets.
+
+        :param targets: Indices of the frequencies for which combinations are searched
+        :return: Dictionary of frequency ID -> list of (complexity, residual, solution, parent amplitudes), best first
+        """
+        solutions = {int(ids[k]): [] for k in targets}
+        if len(targets) == 0 or len(f) < 2:
+            return solutions
+
+        order = np.argsort(f)
+        f_sorted = f[order]
+        f_t = f[targets][:, None]
+        a_t = a[targets][:, None]
+        tol = self.tolerance
+
+        def lookup(needed: np.ndarray, scaled_tol: float):
+            # nearest neighbours in the sorted index, left and right of the insertion point
+            pos = np.searchsorted(f_sorted, needed)
+            for p in (pos - 1, pos):
+                in_range = (p >= 0) & (p < len(f))
+                j = order[np.clip(p, 0, len(f) - 1)]
+                yield j, in_range & (np.abs(f[j] - needed) <= scaled_tol)
+
+        def add(mask: np.ndarray, terms: List[Tuple[np.ndarray, np.ndarray]], values: np.ndarray):
+            terms = [(np.broadcast_to(c, mask.shape), np.broadcast_to(i, mask.shape)) for c, i in terms]
+            for t, r in zip(*np.nonzero(mask)):
+                parts = [(int(c[t, r]), int(i[t, r])) for c, i in terms]
+                text = "".join(_term(c, ids[i], n == 0) for n, (c, i) in enumerate(parts))
+                complexity = sum(abs(c) for c, _ in parts)
+                # amplitudes of the parents, strongest first and negated, so that they sort ascending
+                strength = tuple(sorted(-a[i] for i in {i for _, i in parts}))
+                solutions[int(ids[targets[t]])].append((complexity, float(f_t[t, 0] - values[t, r]), text, strength))
+
+        parents = np.arange(len(f))
+        is_parent = a[None, :] > a_t
+
+        # harmonics
+        for n in range(2, self.max_order + 1):
+            values = np.broadcast_to(n * f[None, :], is_parent.shape)
+            mask = is_parent & (np.abs(f_t - values) <= tol)
+            add(mask, [(n, parents[None, :])], values)
+
+        # pairs
+        for n1, n2 in product(range(1, self.max_order + 1),
+                              [i for i in range(-self.max_order, self.max_order + 1) if i != 0]):
+            needed = (f_t - n1 * f[None, :]) / n2
+            for j, close in lookup(needed, tol / abs(n2)):
+                valid = close & is_parent & (a[j] > a_t) & (j != parents[None, :])
+                if n2 > 0:
+                    # n1*f_i + n2*f_j and n2*f_j + n1*f_i are the same solution, only one of them is kept
+                    valid &= (n1 < n2) | ((n1 == n2) & (parents[None, :] < j))
+                values = n1 * f[None, :] + n2 * f[j]
+                add(valid, [(n1, parents[None, :]), (n2, j)], values)
+
+        # triples
+        if self.triple_parents > 0 and len(f) >= 3:
+            rank = np.empty(len(f), dtype=int)
+            rank[np.argsort(-a)] = np.arange(len(f))
+            top = np.argsort(-a)[:self.triple_parents]
+            pairs = np.array([(i, j) for i in top for j in top if rank[i] < rank[j]], dtype=int).reshape(-1, 2)
+            for s_i, s_j in product((1, -1), repeat=2):
+                if len(pairs) == 0:
+                    break
+                rest = f_t - s_i * f[pairs[:, 0]][None, :] - s_j * f[pairs[:, 1]][None, :]
+                for l, close in lookup(np.abs(rest), tol):
+                    valid = close & (a[pairs[:, 0]][None, :] > a_t) & (a[pairs[:, 1]][None, :] > a_t) & (a[l] > a_t)
+                    valid &= rank[l] > rank[pairs[:, 1]][None, :]
+                    s_l = np.where(rest >= 0, 1, -1)
+                    values = s_i * f[pairs[:, 0]][None, :] + s_j * f[pairs[:, 1]][None, :] + s_l * f[l]
+                    add(valid, [(s_i, pairs[:, 0][None, :]), (s_j, pairs[:, 1][None, :]), (s_l, l)], values)
+
+        for key in solutions:
+            solutions[key].sort(key=lambda s: (s[0], abs(s[1]), s[3]))
+        return solutions
+
+    def update(self, ids: List[int], frequencies: np.ndarray, amplitudes: np.ndarray) -> df:
+        """
+        Updates the combinations for a new set of frequencies. Only frequencies that are new or changed by more than
+        a tenth of the tolerance, and frequencies with lower amplitudes than those, are searched again.
+
+        :param ids: IDs of the frequencies
+        :param frequencies: Frequencies, c/d
+        :param amplitudes: Amplitudes of the frequencies
+        :return: Dataframe with the columns Name, ID, Frequency, Amplitude, Solution, Residual, Independent and Other_Solutions
+        """
+        ids = np.asarray(ids, dtype=int)
+        f = np.asarray(frequencies, dtype=float)
+        a = np.asarray(amplitudes, dtype=float)
+
+        changed, max_amp = self._changed(ids, f, a)
+        targets = np.flatnonzero(changed | (a < max_amp))
+
+        if len(targets) > 0 or len(ids) != len(self._ids):
+            mprint(f"Searching combinations for {len(targets)} of {len(ids)} frequencies", log)
+            solutions = {int(i): s for i, s in self._solutions.items() if i in set(ids.tolist())}
+            solutions.update(self._search(targets, ids, f, a))
+
+            self._ids, self._f, self._a, self._solutions = ids, f, a, solutions
+            rows = []
+            for i, fi, ai in zip(ids, f, a):
+                s = solutions[int(i)]
+                rows.append([f"f{i}", int(i), fi, ai, s[0][2] if s else "", s[0][1] if s else np.nan, len(s) == 0,
+                             ", ".join(j[2] for j in s[1:])])
+            self._frame = df(rows, columns=combination_columns)
+
+        return self._frame
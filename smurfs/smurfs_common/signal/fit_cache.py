@@ -0,0 +1,140 @@
+import hashlib
+import json
+import sqlite3
+from importlib.metadata import version, PackageNotFoundError
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+
+from smurfs.smurfs_common.support.options import FitMethod
+
+# Part of every key. Increase it if a change of the fitting code changes its results, to invalidate all stored fits
+FIT_CACHE_VERSION = 1
+
+_schema = """
+CREATE TABLE IF NOT EXISTS fits (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fits_last_used ON fits(last_used);
+"""
+
+
+def _library_version() -> Optional[str]:
+    try:
+        return version("smurfs")
+    except PackageNotFoundError:
+        return None
+
+
+class FitCache:
+    """
+    Persistent cache of fit results in a SQLite file. Reruns of a target (f.e. with other stopping criteria, or
+    continuing a saved run) repeat the fits of the first frequencies on identical light curves, these are then read
+    from the cache. Keys are hashes of the light curve, the initial values, the fit mode and the version of the
+    fitting code.
+
+    The cache is bounded: once the stored results exceed *max_size*, the least recently used ones are removed. It can
+    be shared by several threads and processes.
+
+    :param path: Path of the database file, it is created if it doesn't exist
+    :param max_size: Maximum size of the stored results in MB
+    """
+
+    def __init__(self, path: Union[str, Path], max_size: float = 256):
+        self.path = Path(path)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_schema)
+        self._lock = Lock()
+
+    def __enter__(self) -> 'FitCache':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    @staticmethod
+    def key(kind: str, mode: Union[FitMethod, str], *arrays: np.ndarray, **parameters: Any) -> str:
+        """
+        Computes the key of a fit.
+
+        :param kind: Kind of the fit, f.e. 'prewhitening' or 'improve'
+        :param mode: Fit mode
+        :param arrays: Arrays the fit depends on, f.e. time and flux of the light curve
+        :param parameters: Further values the fit depends on, f.e. the initial values. Need to be JSON serializable
+        :return: Hex digest of the key
+        """
+        digest = hashlib.sha256(json.dumps({
+            "kind": kind,
+            "mode": FitMethod(mode).value,
+            "version": FIT_CACHE_VERSION,
+            "smurfs": _library_version(),
+            "parameters": parameters,
+        }, sort_keys=True, default=float).encode())
+        for array in arrays:
+            digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the stored result of a fit, or None if it isn't cached.
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT value FROM fits WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE fits SET last_used = ? WHERE key = ?", (time(), key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """
+        Stores the result of a fit, and removes the least recently used results if the cache is full.
+
+        :param key: Key, see *key*
+        :param value: JSON serializable result
+        """
+        data = json.dumps(value, default=float)
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO fits (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                                     (key, data, len(data), time()))
+            self._evict()
+
+    def _evict(self):
+        excess = self._size() - self.max_size * 1024 ** 2
+        if excess <= 0:
+            return
+
+        removed = []
+        for key, size in self._connection.execute("SELECT key, size FROM fits ORDER BY last_used"):
+            if excess <= 0:
+                break
+            removed.append((key,))
+            excess -= size
+        self._connection.executemany("DELETE FROM fits WHERE key = ?", removed)
+
+    def _size(self) -> int:
+        return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM fits").fetchone()[0]
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM fits")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM fits").fetchone()[0]
+            return {"entries": entries, "size": self._size(), "max_size": int(self.max_size * 1024 ** 2),
+                    "hits": self.hits, "misses": self.misses}
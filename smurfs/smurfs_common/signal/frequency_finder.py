@@ -3,18 +3,28 @@ import numpy as np
 from astropy.time import Time
 from scipy.optimize import curve_fit
 from uncertainties import ufloat, unumpy as unp
-import matplotlib.pyplot as pl
-from matplotlib.axes import Axes
 from uncertainties.core import AffineScalarFunc
-from lmfit import Model
-from typing import Union, List, Tuple
+from typing import Union, List, Tuple, Callable, TYPE_CHECKING
 from pandas import DataFrame as df
 import astropy.units as u
 from uncertainties.core import Variable
 
+from smurfs.smurfs_common.signal import kernels
+from smurfs.smurfs_common.signal.fit_cache import FitCache
 from smurfs.smurfs_common.signal.periodogram import Periodogram
 from smurfs.smurfs_common.signal.lightcurve import LightCurve
+from smurfs.smurfs_common.signal.significance import Significance, FapMethod, standard_power, fap_baluev, \
+    fap_bootstrap, bootstrap_max_power
+from smurfs.smurfs_common.support.limits import FitTimeout, RunLimits, time_budget
 from smurfs.smurfs_common.support.mprint import *
+from smurfs.smurfs_common.support.options import FitMethod, StopReason
+
+if TYPE_CHECKING:
+    from lmfit import Parameters
+    from matplotlib.axes import Axes
+
+# Columns of *FFinder.fits*
+fit_columns = ['name', 'frequency', 'fitter', 'nfev']
 
 
 def sin(x: np.ndarray, amp: float, f: float, phase: float) -> np.ndarray:
@@ -38,11 +48,101 @@ def sin_multiple(x: np.ndarray, *params) -> np.ndarray:
     :param x: Time axis
     :param params: Params, see *sin* for signature
     """
-    y = np.zeros(len(x))
-    for i in range(0, len(params), 3):
-        y += sin(x, params[i], params[i + 1], params[i + 2])
+    if isinstance(x, Time):
+        x = x.jd
+    return kernels.sin_sum(x, params)
+
+
+def sin_multiple_jacobian(x: np.ndarray, *params) -> np.ndarray:
+    """
+    Analytic jacobian of *sin_multiple* with respect to its parameters
+
+    :param x: Time axis
+    :param params: Params, see *sin* for signature
+    :return: Jacobian of shape (len(x), len(params))
+    """
+    if isinstance(x, Time):
+        x = x.jd
+    x = np.asarray(x, dtype=float)
+    p = np.asarray(params, dtype=float).reshape(-1, 3)
+    arg = 2. * np.pi * (np.outer(x, p[:, 1]) + p[:, 2])
+    a_cos = p[:, 0] * np.cos(arg) * 2. * np.pi
+
+    jac = np.empty((len(x), len(params)))
+    jac[:, 0::3] = np.sin(arg)
+    jac[:, 1::3] = a_cos * x[:, None]
+    jac[:, 2::3] = a_cos
+    return jac
+
+
+def linear_sin_fit(x: np.ndarray, y: np.ndarray, frequencies: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Closed form least squares fit of sinuses with fixed frequencies (and an offset) to a light curve. As the model
+    is linear in a*sin + b*cos, amplitudes and phases follow from a single linear solve.
+
+    :param x: Time axis, days
+    :param y: Flux axis
+    :param frequencies: Fixed frequencies, c/d
+    :return: Amplitudes and phases (normed to 1) for every frequency, see *sin* for the convention
+    """
+    if isinstance(x, Time):
+        x = x.jd
+    x = np.asarray(x, dtype=float)
+    arg = 2. * np.pi * np.outer(x, np.atleast_1d(frequencies))
+
+    design = np.hstack((np.sin(arg), np.cos(arg), np.ones((len(x), 1))))
+    coeff, *_ = np.linalg.lstsq(design, np.asarray(y, dtype=float), rcond=None)
+
+    n = arg.shape[1]
+    a, b = coeff[:n], coeff[n:2 * n]
+    return np.hypot(a, b), (np.arctan2(b, a) / (2. * np.pi)) % 1
+
+
+def reference_epoch(time: np.ndarray, weights: np.ndarray = None) -> float:
+    """
+    Reference epoch of the fits. On raw time stamps (f.e. BJD around 2,458,000 d) frequency and phase are strongly
+    correlated, fitting relative to the middle of the data set decorrelates them and speeds up the convergence.
+
+    :param time: Time axis, days
+    :param weights: Optional weights of the data points. If given, the weighted mean time is used instead of the
+    middle of the time span
+    :return: Reference epoch, days
+    """
+    time = np.asarray(time, dtype=float)
+    if weights is not None:
+        return float(np.average(time, weights=weights))
+    return float((time[0] + time[-1]) / 2)
 
-    return y
+
+def to_epoch(params: np.ndarray, epoch: float) -> np.ndarray:
+    """
+    Shifts the phases of a parameter array (amp, f, phase, amp, f, phase, ...) from epoch 0 to the given epoch.
+    """
+    params = np.array(params, dtype=float)
+    params[2::3] = (params[2::3] + params[1::3] * epoch) % 1
+    return params
+
+
+def from_epoch(params: np.ndarray, epoch: float) -> np.ndarray:
+    """
+    Shifts the phases of a parameter array from the given epoch back to epoch 0.
+    """
+    params = np.array(params, dtype=float)
+    params[2::3] = (params[2::3] - params[1::3] * epoch) % 1
+    return params
+
+
+def phase_at_epoch(phase: Union[float, Variable], f: Union[float, Variable], epoch: float) -> Union[float, Variable]:
+    """
+    Converts a phase relative to epoch 0 (the origin of the time axis) to a phase relative to *epoch*, such that
+    sin(x, amp, f, phase) equals sin(x - epoch, amp, f, phase_at_epoch(phase, f, epoch)).
+
+    :param phase: Phase relative to epoch 0, normed to 1
+    :param f: Frequency, c/d
+    :param epoch: New reference epoch, days
+    :return: Phase relative to *epoch*
+    """
+    return (phase + f * epoch) % 1
 
 
 def m_od_uncertainty(lc: LightCurve, a: float) -> Tuple:
@@ -82,26 +182,55 @@ class Frequency:
     :param f_min: Lower end of the frequency range considered. If None, it uses 0
     :param f_max: Upper end of the frequency range considered. If None, it uses the Nyquist frequency
     :param rm_ranges: Ranges of frequencies, that should be ignored (List of tuples, that contain a f_min -> f_max range. These areas are ignored)
+    :param significance: Criterion that defines if a frequency is significant. Either 'snr' or 'fap'
+    :param fap_threshold: Frequencies with a false alarm probability below this value are significant, if significance is 'fap'
+    :param fap_null: Bootstrap distribution of the highest noise peak (see *bootstrap_max_power*). If None, the analytic approximation of Baluev (2008) is used for the false alarm probability
+    :param pdg: Periodogram of the light curve. If None, it is computed from the light curve
+    :param peak_index: Index of the peak in the periodogram, that is used as the guess. If None, the peak with maximum power is used
+    :param lc: Light curve of *time* and *flux*. If given, it is used as it is instead of creating a copy of the data
+    :param center_time: If set, fits are performed relative to the middle of the light curve (see *reference_epoch*). Phases are always relative to epoch 0
+    :param fit_time: Time budget of the fit in seconds. If it is exceeded, the closed form fit *linear_fit* is used instead
+    :param fit_cache: Optional *FitCache*. The result of *pre_whiten* is read from it if the same fit was done before
     """
 
     def __init__(self, time: np.ndarray, flux: np.ndarray, window_size: float, snr: float, flux_err: np.ndarray = None,
-                 f_min: float = None, f_max: float = None, rm_ranges: List[Tuple[float]] = None,fit_fun : callable = None):
-        if flux_err is None:
+                 f_min: float = None, f_max: float = None, rm_ranges: List[Tuple[float]] = None,fit_fun : callable = None,
+                 significance: Significance = Significance.SNR, fap_threshold: float = 0.01,
+                 fap_null: np.ndarray = None, pdg: Periodogram = None, peak_index: int = None,
+                 lc: LightCurve = None, center_time: bool = True, fit_time: float = None,
+                 fit_cache: FitCache = None):
+        if lc is not None:
+            self._lc = lc
+        elif flux_err is None:
             self._lc = LightCurve(lk.LightCurve(time, flux))
         else:
             self._lc = LightCurve(lk.LightCurve(time, flux, flux_err=flux_err))
 
         self.flux_error = flux_err
-        self.pdg: Periodogram = Periodogram.from_lightcurve(self.lc, f_min, f_max, remove_ranges=rm_ranges)
+        if pdg is None:
+            self.pdg: Periodogram = Periodogram.from_lightcurve(self.lc, f_min, f_max, remove_ranges=rm_ranges)
+        else:
+            self.pdg: Periodogram = pdg
+        self._peak = int(np.nanargmax(self.pdg.power)) if peak_index is None else peak_index
 
         self.ws = window_size * self.pdg.frequency.unit
+        self.epoch = reference_epoch(self.lc.time.value) if center_time else 0.
+        # Fitter that was used for this frequency, and its number of function evaluations
+        self.fitter = None
+        self.nfev = 0
+        self._fit_time = fit_time
+        self._fit_cache = fit_cache
 
         self.find_adjacent_minima()
 
         self._amp = np.nan
         self._f = np.nan
         self._phase = np.nan
-        self._significant = self.snr > snr
+        self._fap_null = fap_null
+        if significance == Significance.FAP:
+            self._significant = self.fap < fap_threshold
+        else:
+            self._significant = self.snr > snr
         self._label = ""
         self._fit_fun = fit_fun
         self._other_params = None
@@ -172,6 +301,20 @@ class Frequency:
         """
         return self._lc
 
+    @property
+    def f_guess(self) -> u.Quantity:
+        """
+        Returns the frequency of the peak, that is used as the guess for the fit
+        """
+        return self.pdg.frequency[self._peak]
+
+    @property
+    def amp_guess(self) -> u.Quantity:
+        """
+        Returns the amplitude of the peak, that is used as the guess for the fit
+        """
+        return self.pdg.power[self._peak]
+
     @property
     def snr(self) -> float:
         """
@@ -180,38 +323,75 @@ class Frequency:
 
         :return: Signal to noise ratio of the peak
         """
-        self.snr_mask = self.pdg.frequency[self.lower_m] - self.ws / 2 < self.pdg.frequency  # mask lower window
-        self.snr_mask = np.logical_and(self.snr_mask, self.pdg.frequency < self.pdg.frequency[
-            self.upper_m] + self.ws / 2)  # mask upper window
-        outside = np.mean(self.pdg.power[self.snr_mask])
-        return (self.pdg.max_power / outside).value  # No quantitiy needed here
+        frequency = self.pdg.frequency.value
+        outside = kernels.window_mean(frequency, self.pdg.power.value, frequency[self.lower_m] - self.ws.value / 2,
+                                      frequency[self.upper_m] + self.ws.value / 2)
+        return self.amp_guess.value / outside
+
+    @property
+    def snr_mask(self) -> slice:
+        """
+        Returns the slice of the periodogram, that is used for the noise in *snr*
+        """
+        frequency = self.pdg.frequency.value
+        return slice(np.searchsorted(frequency, frequency[self.lower_m] - self.ws.value / 2, side='right'),
+                     np.searchsorted(frequency, frequency[self.upper_m] + self.ws.value / 2, side='left'))
+
+    @property
+    def z(self) -> float:
+        """
+        Returns the 'standard' normalized power of the peak, i.e. the fraction of the variance of the light curve
+        explained by it.
+        """
+        return float(standard_power(self.amp_guess.value, np.var(self.lc.flux.value)))
+
+    @property
+    def fap(self) -> float:
+        """
+        Computes the false alarm probability of the peak, i.e. the probability that noise produces a peak at least
+        this high anywhere in the considered frequency range. Uses the bootstrap distribution if one was provided,
+        otherwise the analytic approximation of Baluev (2008).
+
+        :return: False alarm probability of the peak
+        """
+        if self._fap_null is not None:
+            return float(fap_bootstrap(self.z, self._fap_null))
+        return float(fap_baluev(self.z, self.pdg.frequency[-1].value, self.lc.time.value))
 
     def scipy_fit(self) -> Tuple[Variable,Variable,Variable,Tuple[float,float,float]]:
         """
         Performs a scipy fit on the light curve of the object. Limits are 50% up and down from the initial guess.
+        The phase starts at the closed form solution at the guessed frequency (see *linear_sin_fit*) and may vary by
+        half a cycle around it.
         Computes uncertainties using the provided covariance matrix from curve_fit.
 
         :return: values for amplitude,frequency, phase (in this order) including their uncertainties, as well as the param object
         """
 
-        f_guess = self.pdg.frequency_at_max_power.value
-        amp_guess = self.pdg.max_power.value
+        f_guess = self.f_guess.value
+        amp_guess = self.amp_guess.value
+        x = self.lc.time.value - self.epoch
+        y = self.lc.flux.value
+        ph_guess = linear_sin_fit(x, y, np.array([f_guess]))[1][0]
 
         arr = [amp_guess,  # amplitude
                f_guess,  # frequency
-               0  # phase --> set to center
+               ph_guess  # phase
                ]
-        limits = [[0.5 * amp_guess, 0.5 * f_guess, 0], [1.5 * amp_guess, 1.5 * f_guess, 1]]
+        limits = [[0.5 * amp_guess, 0.5 * f_guess, ph_guess - 0.5], [1.5 * amp_guess, 1.5 * f_guess, ph_guess + 0.5]]
+        model = time_budget(sin, self._fit_time)
         try:
-            popt, pcov = curve_fit(sin, self.lc.time, self.lc.flux, p0=arr, bounds=limits)
+            popt, pcov, infodict, _, _ = curve_fit(model, x, y, p0=arr, bounds=limits, full_output=True)
         except RuntimeError:
             try:
-                popt, pcov = curve_fit(sin, self.lc.time, self.lc.flux, p0=arr, bounds=limits,
-                                       maxfev=400 * (len(self.lc.time) + 1))
+                popt, pcov, infodict, _, _ = curve_fit(model, x, y, p0=arr, bounds=limits,
+                                                       maxfev=400 * (len(self.lc.time) + 1), full_output=True)
             except RuntimeError:
                 raise RuntimeError(
-                    ctext(f"Failed to find a good fit for frequency {self.pdg.frequency_at_max_power}. Consider"
+                    ctext(f"Failed to find a good fit for frequency {self.f_guess}. Consider"
                           f" using the 'lmfit' fitting method.", error))
+        self.nfev = int(infodict['nfev'])
+        popt = from_epoch(popt, self.epoch)
         perr = np.sqrt(np.diag(pcov))
 
         return ufloat(popt[0], perr[0]), ufloat(popt[1], perr[0]), ufloat(popt[2], perr[0]), popt
@@ -225,25 +405,32 @@ class Frequency:
         :return: values for amplitude,frequency, phase (in this order) including their uncertainties, as well as the param object
         """
 
-        f_guess = self.pdg.frequency_at_max_power.value
-        amp_guess = self.pdg.max_power.value
+        from lmfit import Model
 
-        model = Model(sin)
+        f_guess = self.f_guess.value
+        amp_guess = self.amp_guess.value
+
+        function = time_budget(sin, self._fit_time)
+        model = Model(function)
         model.set_param_hint('amp', value=amp_guess, min=0.8 * amp_guess, max=1.2 * amp_guess)
         #model.set_param_hint('f', value=f_guess, min=0.5 * f_guess, max=1.5 * f_guess)
         model.set_param_hint('f', value=f_guess,vary=False)
         model.set_param_hint('phase', value=0.5, min=0, max=1)
 
-        result = model.fit(self.lc.flux, x=self.lc.time)
+        x = self.lc.time.value - self.epoch
+        y = self.lc.flux.value
+        result = model.fit(y, x=x)
+        nfev = result.nfev
 
         # after first fit, vary only phase
         ph_list = [0.5,0.3,0.7]
         for i in ph_list:
-            model = Model(sin)
+            model = Model(function)
             model.set_param_hint('amp', value=result.values['amp'], vary=False)
             model.set_param_hint('f', value=result.values['f'], vary=False)
             model.set_param_hint('phase', value=i, min=0, max=1)
-            result = model.fit(self.lc.flux, x=self.lc.time)
+            result = model.fit(y, x=x)
+            nfev += result.nfev
 
             a, f, ph = result.values['amp'], result.values['f'], result.values['phase']
             if np.abs(ph-i) > 10**-2:
@@ -254,6 +441,9 @@ class Frequency:
         if np.abs(ph-ph_list[-1]) < 10**-3:
             mprint(f"Phase is very close to initial value of fit!",warn)
 
+        self.nfev = nfev
+        ph = phase_at_epoch(ph, f, -self.epoch)
+
         if self.flux_error is None or True:
             sigma_amp, sigma_f, sigma_phi = m_od_uncertainty(self.lc, a)
             return ufloat(a, sigma_amp), ufloat(f, sigma_f), ufloat(ph, sigma_phi), [a, f, ph]
@@ -261,21 +451,100 @@ class Frequency:
             # todo incorporate flux error into fit
             return ufloat(a, 0), ufloat(f, 0), ufloat(ph, 0), [a, f, ph]
 
+    def linear_fit(self) -> Tuple[Variable, Variable, Variable, List[float]]:
+        """
+        Closed form fit of amplitude and phase at the frequency of the peak, see *linear_sin_fit*. It is used if a
+        fit exceeds its time budget.
+
+        :return: values for amplitude,frequency, phase (in this order) including their uncertainties, as well as the param object
+        """
+        f = self.f_guess.value
+        amps, phases = linear_sin_fit(self.lc.time.value - self.epoch, self.lc.flux.value, np.array([f]))
+        a, ph = amps[0], phase_at_epoch(phases[0], f, -self.epoch)
+        sigma_amp, sigma_f, sigma_phi = m_od_uncertainty(self.lc, a)
+        return ufloat(a, sigma_amp), ufloat(f, sigma_f), ufloat(ph, sigma_phi), [a, f, ph]
+
+    def _linear_converged(self, param: List[float]) -> bool:
+        """
+        Checks if the closed form fit at the frequency of the peak is good enough, i.e. if a Gauss-Newton step in
+        frequency is smaller than a hundredth of the frequency resolution 1/T. This is a tenth of the grid spacing of
+        the periodogram, so peaks between two grid points are fitted further.
+        """
+        a, f, ph = param
+        x = self.lc.time.value - self.epoch
+        residual = self.lc.flux.value - sin(x, a, f, phase_at_epoch(ph, f, self.epoch))
+        jac_f = sin_multiple_jacobian(x, a, f, phase_at_epoch(ph, f, self.epoch))[:, 1]
+        step = np.dot(jac_f, residual) / np.dot(jac_f, jac_f)
+
+        return bool(np.abs(step) < 0.01 / (x[-1] - x[0]))
+
+    def _scipy_jacobian_fit(self, param: List[float]) -> Union[List[float], None]:
+        """
+        Unbounded fit with the analytic jacobian, starting at the closed form fit.
+
+        :return: Parameters relative to epoch 0, or None if the fit didn't converge
+        """
+        x = self.lc.time.value - self.epoch
+        p0 = to_epoch(param, self.epoch)
+        try:
+            popt, pcov, infodict, _, _ = curve_fit(time_budget(sin_multiple, self._fit_time), x, self.lc.flux.value,
+                                                   p0=p0, jac=sin_multiple_jacobian, full_output=True)
+        except RuntimeError:
+            return None
+        self.nfev += int(infodict['nfev'])
+
+        a, f, ph = popt
+        if a < 0:
+            a, ph = -a, ph + 0.5
+        frequency = self.pdg.frequency.value
+        if not (np.all(np.isfinite(pcov)) and frequency[self.lower_m] <= f <= frequency[self.upper_m]):
+            return None
+        return list(from_epoch([a, f, ph], self.epoch))
+
+    def auto_fit(self) -> Tuple[Variable, Variable, Variable, List[float]]:
+        """
+        Fits the frequency with a chain of fitters of increasing cost, and escalates only if a fitter doesn't
+        converge: the closed form fit at the frequency of the peak (see *linear_fit*), an unbounded scipy fit using the
+        analytic jacobian and finally *lmfit_fit*. The used fitter is stored in *fitter*. Uncertainties are computed
+        according to Montgomery & O'Donoghue (1999).
+
+        :return: values for amplitude,frequency, phase (in this order) including their uncertainties, as well as the param object
+        """
+        _, _, _, param = self.linear_fit()
+        self.nfev = 1
+        if self._linear_converged(param):
+            self.fitter = "linear"
+        else:
+            param = self._scipy_jacobian_fit(param)
+            if param is not None:
+                self.fitter = "scipy"
+            else:
+                mprint(f"Fit of {self.f_guess.round(3)} did not converge with scipy, using lmfit", log)
+                nfev = self.nfev
+                amp, f, phase, param = self.lmfit_fit()
+                self.nfev += nfev
+                self.fitter = "lmfit"
+                return amp, f, phase, param
+
+        a, f, ph = param
+        sigma_amp, sigma_f, sigma_phi = m_od_uncertainty(self.lc, a)
+        return ufloat(a, sigma_amp), ufloat(f, sigma_f), ufloat(ph, sigma_phi), [a, f, ph]
+
     def pre_whiten(self, mode: str = 'lmfit') -> LightCurve:
         """
         'Pre whitens' a given light curve. As an estimate, the method always uses the frequency with maximum power.
         It then performs the fit according to the mode parameter, and returns a Lightcurve object with the reduced
         light curve
 
-        :param mode:'scipy' or 'lmfit'
+        :param mode:'scipy', 'lmfit' or 'auto', see *auto_fit*
         :return: Pre-whitened lightcurve object
         """
         if self._fit_fun is not None:
             kwargs = {
                 'lc':self.lc,
                 'pdg':self.pdg,
-                'f_guess':self.pdg.frequency_at_max_power.value,
-                'amp_guess':self.pdg.max_power.value
+                'f_guess':self.f_guess.value,
+                'amp_guess':self.amp_guess.value
             }
             ret_dict = self._fit_fun(kwargs)
             if not isinstance(ret_dict,dict) or not all(i in ret_dict.keys() for i in ['Amplitude','Frequency','Phase','LC']):
@@ -291,17 +560,50 @@ class Frequency:
                     continue
                 self._other_params[key] = val
             lc = ret_dict['LC']
+            self.fitter = "custom"
             return lc
-        if mode == 'scipy':
-            self.amp, self.f, self.phase, param = self.scipy_fit()
-        elif mode == 'lmfit':
-            self.amp, self.f, self.phase, param = self.lmfit_fit()
-        else:
-            raise ValueError("Unknown fit mode")
 
-        return LightCurve(lk.LightCurve(self.lc.time.value, self.lc.flux.value - sin(self.lc.time.value, *param)))
+        key = None
+        if self._fit_cache is not None:
+            frequency = self.pdg.frequency.value
+            key = self._fit_cache.key("prewhitening", mode, self.lc.time.value, self.lc.flux.value,
+                                      f_guess=self.f_guess.value, amp_guess=self.amp_guess.value,
+                                      window=[frequency[self.lower_m], frequency[self.upper_m]], epoch=self.epoch,
+                                      fit_time=self._fit_time)
+            stored = self._fit_cache.get(key)
+            if stored is not None:
+                self.amp, self.f, self.phase = (ufloat(*stored[name]) for name in ['amp', 'f', 'phase'])
+                self.fitter, self.nfev = stored['fitter'], 0
+                param = [stored[name][0] for name in ['amp', 'f', 'phase']]
+                return self.lc.share(flux=self.lc.flux.value - sin(self.lc.time.value, *param))
 
-    def plot(self, ax: Axes = None, show=False, use_guess=False) -> Union[None, Axes]:
+        try:
+            if mode == 'scipy':
+                self.amp, self.f, self.phase, param = self.scipy_fit()
+                self.fitter = "scipy"
+            elif mode == 'lmfit':
+                self.amp, self.f, self.phase, param = self.lmfit_fit()
+                self.fitter = "lmfit"
+            elif mode == 'auto':
+                self.amp, self.f, self.phase, param = self.auto_fit()
+            else:
+                raise ValueError("Unknown fit mode")
+        except FitTimeout:
+            mprint(f"Fit of {self.f_guess.round(3)} exceeded its time budget of {self._fit_time}s, using the "
+                   f"closed form fit.", warn)
+            self.amp, self.f, self.phase, param = self.linear_fit()
+            self.fitter = "linear"
+            # the result depends on the speed of the machine, so it isn't cached
+            key = None
+
+        if key is not None:
+            self._fit_cache.put(key, {**{name: [value.nominal_value, value.std_dev] for name, value in
+                                         [('amp', self.amp), ('f', self.f), ('phase', self.phase)]},
+                                      'fitter': self.fitter, 'nfev': self.nfev})
+
+        return self.lc.share(flux=self.lc.flux.value - sin(self.lc.time.value, *param))
+
+    def plot(self, ax: 'Axes' = None, show=False, use_guess=False) -> Union[None, 'Axes']:
         """
         Plots the periodogramm. If a fit was already performed, it uses the fit _result by default. This
         can be overwritten by setting use_guess to True
@@ -311,23 +613,25 @@ class Frequency:
         :param use_guess: Uses the guess
         :return: Axis object if plot was not shown
         """
-        ax: Axes = self.pdg.plot(ax=ax, ylabel='Amplitude', color='k')
-        pwr = self.pdg.max_power / self.snr
+        ax: 'Axes' = self.pdg.plot(ax=ax, ylabel='Amplitude', color='k')
+        pwr = self.amp_guess / self.snr
 
         if isinstance(self._f, AffineScalarFunc) and not use_guess:
             f = self._f.nominal_value
-            f_str = f'Fit: {self._f} {self.pdg.frequency_at_max_power.unit}'
+            f_str = f'Fit: {self._f} {self.f_guess.unit}'
             color = 'red'
         else:
-            f = self.pdg.frequency_at_max_power.value
-            f_str = f"Guess: {'%.2f' % f} {self.pdg.frequency_at_max_power.unit}"
+            f = self.f_guess.value
+            f_str = f"Guess: {'%.2f' % f} {self.f_guess.unit}"
             color = 'k'
 
         ax.set_xlim(self.pdg.frequency[self.snr_mask][0].value * 0.2, self.pdg.frequency[self.snr_mask][-1].value * 2)
         ax.fill_between(self.pdg.frequency[self.snr_mask].value, 0, pwr, facecolor='grey', alpha=0.5, label='Window')
         ax.axvline(x=f, color=color, linestyle='dashed', label=f_str)
-        pl.legend()
+        ax.legend()
         if show:
+            import matplotlib.pyplot as pl
+
             pl.show()
         else:
             return ax
@@ -336,33 +640,7 @@ class Frequency:
         """
         Finds the adjacent minima to the guessed frequency, and sets them within the class.
         """
-
-        def checkMinima(yData: np.ndarray, counter: int) -> bool:
-            return yData[counter] < yData[counter + 1] and yData[counter] < yData[counter - 1]
-
-        max_indx = int(np.argmin(np.abs(self.pdg.frequency - self.pdg.frequency_at_max_power)))
-
-        counter = 1
-        lowerMinima = -1
-        upperMinima = -1
-
-        while lowerMinima == -1 or upperMinima == -1:
-            negCounter = max_indx - counter
-            posCounter = max_indx + counter
-
-            if negCounter - 1 < 0:
-                lowerMinima = 0
-            elif checkMinima(self.pdg.power, negCounter):
-                lowerMinima = negCounter
-
-            if posCounter + 1 >= len(self.pdg.frequency):
-                upperMinima = len(self.pdg.frequency) - 1
-            elif checkMinima(self.pdg.power, posCounter):
-                upperMinima = posCounter
-
-            counter += 1
-
-        self.lower_m, self.upper_m = lowerMinima, upperMinima
+        self.lower_m, self.upper_m = kernels.adjacent_minima(self.pdg.power.value, self._peak)
 
 
 class FFinder:
@@ -385,14 +663,32 @@ class FFinder:
         self._spectral_window = None
         self.rm_ranges = None
 
-        self.columns = ['f_obj', 'frequency', 'amp', 'phase', 'snr', 'res_noise', 'significant']
+        self.columns = ['f_obj', 'frequency', 'amp', 'phase', 'snr', 'fap', 'res_noise', 'significant']
+        self._fap_null = None
+        self._center_time = True
+        self._fit_time = None
+        # Parameters of the combined lmfit fit, see *_lmfit_parameters*
+        self._lmfit_params = None
+        self._fit_cache = None
+        # Reason why the last run stopped, see *StopReason*
+        self.stop_reason = None
+        # Number of function evaluations of the pre-whitening fits and of the combined fits of all frequencies
+        self.nfev = {"prewhitening": 0, "improve": 0}
+        # Fitter and number of function evaluations of every extracted frequency, see *fit_columns*
+        self.fits = []
         self.result = df([], columns=self.columns)
 
         mprint(f"Periodogramm from {self.pdg.frequency[0].round(2)} to "
                f"{self.pdg.frequency[-1].round(2)}", log)
 
     def run(self, snr: float = 4, window_size: float = 2, skip_similar: bool = False, similar_chancel=True,
-            extend_frequencies: int = 0, improve_fit=True, mode='lmfit',frequency_detection=None, fit_fun : callable = None) -> df:
+            extend_frequencies: int = 0, improve_fit=True, mode='lmfit',frequency_detection=None, fit_fun : callable = None,
+            significance: Significance = Significance.SNR, fap_threshold: float = 0.01,
+            fap_method: FapMethod = FapMethod.BALUEV, fap_bootstraps: int = 1000, batch_size: int = 1,
+            batch_separation: float = 2.5,
+            progress: Callable[[Periodogram, List['Frequency']], None] = None, center_time: bool = True,
+            max_frequencies: int = None, max_wall_time: float = None, max_memory: float = None,
+            fit_time: float = None, fit_cache: FitCache = None) -> df:
         """
         Starts the frequency extraction from a light curve. In general, it always uses the frequency of maximum power
         and removes it from the light curve. In general, this process is repeated until we reach a frequency that
@@ -401,15 +697,39 @@ class FFinder:
         If similar_chancel is set, the process also stops after 10 frequencies with a standard deviation of 0.05
         were found in a row.
 
+        The run also stops gracefully if one of the limits *max_frequencies*, *max_wall_time* or *max_memory* is
+        reached, keeping all frequencies found so far. The reason for stopping is stored in *stop_reason*.
+
+        If *batch_size* is larger than 1, up to *batch_size* significant peaks are removed in a single iteration. Next
+        to the peak of maximum power, the highest peaks that are separated by more than *batch_separation*/T (T being
+        the length of the data set) from all other peaks of the batch are used. They are fitted jointly to the light
+        curve, which reduces the number of iterations for spectra with many high amplitude peaks. After the joint fit,
+        every peak of the batch is checked again for significance on the light curve without the stronger peaks of the
+        batch, as it would be in single pre-whitening. The batch ends before the first peak that is no longer
+        significant.
+
         :param snr: Lower bound Signal to noise ratio
         :param window_size: Window size, to compute the SNR
         :param skip_similar: If this is set and 10 frequencies with a standard deviation of 0.05 were found in a row, that region will be ignored for all further analysis.
         :param similar_chancel: If this is set and *skip_similar* is **False**, the run chancels after 10 frequencies with a standard deviation of 0.05 were found in a row.
         :param extend_frequencies: Defines the number of insignificant frequencies, the analysis extends to.
         :param improve_fit: If this is set, the combination of frequencies are fitted to the data set to improve the parameters
-        :param mode: Fitting mode. Can be either 'lmfit' or 'scipy'
+        :param mode: Fitting mode. Can be either 'lmfit', 'scipy' or 'auto'. 'auto' escalates from a closed form fit over scipy to lmfit only if a fit doesn't converge, see *Frequency.auto_fit*. The used fitters are stored in *fits*
         :param frequency_detection: If this value is not None and the ratio between the amplitude of the found frequency and the amplitude of the frequency in the original spectrum exceeds this value, this frequency is ignored.
-        :return: Pandas dataframe, consisting of the results for the analysis. Consists of a *Frequency* object, frequency, amplitude, phase, snr, residual noise and a significance flag.
+        :param significance: Criterion for the significance of a frequency. 'snr' uses the signal to noise ratio, 'fap' the false alarm probability of the peak
+        :param fap_threshold: Frequencies with a false alarm probability below this value are significant, if significance is 'fap'
+        :param fap_method: Method used for the false alarm probability. 'baluev' uses the analytic approximation by Baluev (2008), 'bootstrap' a distribution of noise periodograms computed once at the start of the run
+        :param fap_bootstraps: Number of noise periodograms used for the 'bootstrap' method
+        :param batch_size: Maximum number of peaks removed per iteration. Not used with custom fit functions or *frequency_detection*. Batches are fitted jointly with the fitter given by *mode*, see *_fit_batch*
+        :param batch_separation: Minimum separation of peaks in a batch, in units of the frequency resolution 1/T
+        :param progress: Optional callback, called with the current residual periodogram and the list of frequencies found so far at the start of every iteration and once with the final residual periodogram
+        :param center_time: If set, all fits are performed relative to the middle of the light curve, which decorrelates frequency and phase. Phases are always given relative to epoch 0, see *phase_at_epoch*
+        :param max_frequencies: Maximum number of extracted frequencies
+        :param max_wall_time: Maximum duration of the extraction in seconds
+        :param max_memory: Maximum resident memory of the process in MB
+        :param fit_time: Time budget of every fit in seconds. Single fits that exceed it fall back to the closed form fit, combined fits are skipped
+        :param fit_cache: Optional *FitCache*, which stores the results of all fits. Fits that were done before (f.e. by an earlier run with other stopping criteria) are read from it
+        :return: Pandas dataframe, consisting of the results for the analysis. Consists of a *Frequency* object, frequency, amplitude, phase, snr, false alarm probability, residual noise and a significance flag.
         """
         # todo incorporate flux error
 
@@ -442,9 +762,29 @@ class FFinder:
         mprint(f"Cancel after 10 similar: {similar_chancel_text}", log)
         mprint(f"Window size: {window_size}", log)
         mprint(f"Number of extended frequencies: {extend_frequencies}", log)
+        if batch_size > 1:
+            mprint(f"Batch size: {batch_size}, separation: {batch_separation}/T", log)
+        if significance == Significance.FAP:
+            mprint(f"Significance: false alarm probability < {fap_threshold} ({FapMethod(fap_method).value})", log)
+        else:
+            mprint(f"Significance: signal to noise ratio > {snr}", log)
         mprint(f"Nyquist frequency: {(self.nyquist * self.pdg.frequency.unit).round(2)}", info)
 
         lc: LightCurve = self.lc
+        limits = RunLimits(max_frequencies, max_wall_time, max_memory)
+        self._center_time = center_time
+        self._fit_time = fit_time
+        self._fit_cache = fit_cache
+        self._lmfit_params = None
+        self.stop_reason = None
+        self.nfev = {"prewhitening": 0, "improve": 0}
+        self.fits = []
+
+        if fap_method == FapMethod.BOOTSTRAP:
+            self._fap_null = bootstrap_max_power(self.lc.time.value, self.lc.flux.value, self.f_min, self.f_max,
+                                                 n_bootstraps=fap_bootstraps)
+        else:
+            self._fap_null = None
 
         result = []
         noise_list = []
@@ -454,13 +794,25 @@ class FFinder:
         mprint(f"List of frequencies, amplitudes, phases, S/N", state)
         try:
             while True:
+                self.stop_reason = limits.exceeded(len(result))
+                if self.stop_reason is not None:
+                    mprint(f"Stopping extraction after {len(result)} frequencies, limit '{self.stop_reason.value}' "
+                           f"reached.", warn)
+                    break
+
                 f = Frequency(lc.time, lc.flux, window_size, snr, f_min=self.f_min, f_max=self.f_max,
-                              rm_ranges=self.rm_ranges,fit_fun= single_fit)
+                              rm_ranges=self.rm_ranges,fit_fun= single_fit, significance=significance,
+                              fap_threshold=fap_threshold, fap_null=self._fap_null, lc=lc,
+                              center_time=center_time, fit_time=fit_time, fit_cache=fit_cache)
+
+                if progress is not None:
+                    progress(f.pdg, result)
 
                 # check significance of frequency
                 if not f._significant:
                     if extensions >= extend_frequencies:
                         mprint(f"Stopping extraction after {len(result)} frequencies.", warn)
+                        self.stop_reason = StopReason.INSIGNIFICANT
                         break
                     else:
                         mprint(f"Found insignificant frequency, extending extraction ... ", warn)
@@ -468,7 +820,31 @@ class FFinder:
                 else:
                     extensions = 0
 
-                lc = f.pre_whiten(mode)
+                if batch_size > 1 and f._significant and single_fit is None and frequency_detection is None:
+                    batch = self._batch_candidates(f, batch_size, batch_separation, window_size, snr,
+                                                   significance, fap_threshold)
+                else:
+                    batch = [f]
+
+                remaining = limits.remaining_frequencies(len(result))
+                if remaining is not None:
+                    batch = batch[:remaining]
+
+                while len(batch) > 1:
+                    res_lc = self._fit_batch(batch, f.lc, mode)
+                    accepted = self._significant_batch(batch, window_size, snr, significance, fap_threshold)
+                    if len(accepted) == len(batch):
+                        batch = accepted
+                        lc = res_lc
+                        mprint(f"Removed {len(batch)} frequencies in one iteration", log)
+                        break
+                    mprint(f"{len(batch) - len(accepted)} frequencies of the batch are insignificant after removing "
+                           f"the stronger ones, fitting the remaining {len(accepted)}", log)
+                    batch = accepted
+
+                if len(batch) == 1:
+                    lc = f.pre_whiten(mode)
+                    self.nfev["prewhitening"] += f.nfev
                 res_noise = np.mean(lc.flux)
 
 
@@ -479,17 +855,26 @@ class FFinder:
                             self.rm_ranges = [(self.pdg.frequency[f.lower_m].value,self.pdg.frequency[f.upper_m].value)]
                         else:
                             self.rm_ranges.append((self.pdg.frequency[f.lower_m].value,self.pdg.frequency[f.upper_m].value))
-                        mprint(f"{f.f} {f_u}   {f.amp} {a_u}   {f.phase}  can't be detected in original periodogram. "
-                               f"Skipping the range between {'%.3f'%self.pdg.frequency[f.lower_m].value} "
-                               f"and {'%.3f'%self.pdg.frequency[f.upper_m].value}",warn)
+                        mprint(lambda: f"{f.f} {f_u}   {f.amp} {a_u}   {f.phase}  can't be detected in original "
+                                       f"periodogram. Skipping the range between "
+                                       f"{'%.3f'%self.pdg.frequency[f.lower_m].value} and "
+                                       f"{'%.3f'%self.pdg.frequency[f.upper_m].value}", warn)
                         continue
 
-                f._label = f"F{len(result)}"
+                # Formatting uncertainties is expensive, so the messages are only built if they are printed or logged
+                print_state = menabled(state)
+                for b in batch:
+                    b._label = f"F{len(result)}"
 
-                mprint(f"F{len(result)}   {f.f} {f_u}   {f.amp} {a_u}   {f.phase}   {f.snr} ", state)
+                    if print_state:
+                        mprint(f"{b.label}   {b.f} {f_u}   {b.amp} {a_u}   {b.phase}   {b.snr} ", state,
+                               {"name": b.label, "frequency": float(unp.nominal_values(b.f)),
+                                "amp": float(unp.nominal_values(b.amp)),
+                                "phase": float(unp.nominal_values(b.phase)), "snr": float(b.snr)})
 
-                result.append(f)
-                noise_list.append(res_noise)
+                    result.append(b)
+                    noise_list.append(res_noise)
+                    self.fits.append([b.label, float(unp.nominal_values(b.f)), b.fitter, b.nfev])
 
                 if improve_fit and multiple_fit is None:
                     result = self._improve_fit(result, mode=mode,fit_fun=multiple_fit)
@@ -511,28 +896,223 @@ class FFinder:
                             self.rm_ranges.append((f_list.mean() - 10 * stdDev, f_list.mean() + 10 * stdDev))
                     elif stdDev < 0.05 and similar_chancel:
                         mprint(f"Last 10 frequencies had a std dev of {'%.2f' % stdDev}. Stopping run.", warn)
+                        self.stop_reason = StopReason.SIMILAR
                         break
         except KeyboardInterrupt:
+            self.stop_reason = StopReason.INTERRUPTED
             raise KeyboardInterrupt
         finally:
             mprint(f"Total frequencies: {len(result)}", info)
+            mprint(f"Function evaluations: {self.nfev['prewhitening']} for pre-whitening, {self.nfev['improve']} for "
+                   f"improving the fit", log, lambda: dict(self.nfev))
+            if fit_cache is not None:
+                stats = fit_cache.stats()
+                mprint(f"Fit cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries "
+                       f"({'%.1f' % (stats['size'] / 1024 ** 2)} of {'%.0f' % (stats['max_size'] / 1024 ** 2)} MB)",
+                       log, stats)
+            if len(self.fits) > 0 and menabled(log):
+                fitters = df(self.fits, columns=fit_columns).fitter.value_counts()
+                mprint(f"Fitters: {', '.join(f'{name} {count}' for name, count in fitters.items())}", log,
+                       lambda: {str(name): int(count) for name, count in fitters.items()})
             self.res_lc = lc
             self.res_pdg = Periodogram.from_lightcurve(lc, self.f_min, self.f_max)
             if fit_fun is None:
-                self.result = df([[i, i.f, i.amp, i.phase, i.snr, j, i.significant] for i, j in zip(result, noise_list)]
+                self.result = df([[i, i.f, i.amp, i.phase, i.snr, k, j, i.significant]
+                                  for i, j, k in zip(result, noise_list, self._fap(result))]
                                  , columns=self.columns)
             else:
                 data_list = []
                 key_list = []
-                for i,j in zip(result,noise_list):
-                    data_list.append([i,i.f,i.amp,i.phase,i.snr,j,i.significant] + list(i.other_params.values()))
+                for i,j,k in zip(result,noise_list,self._fap(result)):
+                    data_list.append([i,i.f,i.amp,i.phase,i.snr,k,j,i.significant] + list(i.other_params.values()))
                     key_list = list(i.other_params.keys())
                 self.result = df(data_list
                                  , columns=self.columns + key_list)
 
+        if progress is not None:
+            progress(self.res_pdg, result)
+
         return self.result
 
-    def plot(self, ax: Axes = None, show=False, plot_insignificant=False, **kwargs):
+    def _batch_candidates(self, f: Frequency, batch_size: int, batch_separation: float, window_size: float,
+                          snr: float, significance: Significance, fap_threshold: float) -> List[Frequency]:
+        """
+        Finds the peaks that are removed together with a given frequency. Candidates are the local maxima of its
+        periodogram in order of decreasing amplitude, that are separated from all peaks of the batch by more than
+        *batch_separation*/T. The search stops at the first insignificant candidate.
+
+        :param f: Frequency of maximum power
+        :return: List of frequencies of the batch, starting with *f*
+        """
+        power = f.pdg.power.value
+        frequency = f.pdg.frequency.value
+        time = f.lc.time.value
+        min_distance = batch_separation / (time[-1] - time[0])
+
+        peaks = np.flatnonzero((power[1:-1] > power[:-2]) & (power[1:-1] >= power[2:])) + 1
+        peaks = peaks[np.argsort(power[peaks])[::-1]]
+
+        batch = [f]
+        accepted = [frequency[f._peak]]
+        for i in peaks:
+            if len(batch) >= batch_size:
+                break
+            if np.any(np.abs(frequency[i] - np.array(accepted)) <= min_distance):
+                continue
+
+            candidate = Frequency(f.lc.time, f.lc.flux, window_size, snr, f_min=self.f_min, f_max=self.f_max,
+                                  rm_ranges=self.rm_ranges, significance=significance, fap_threshold=fap_threshold,
+                                  fap_null=self._fap_null, pdg=f.pdg, peak_index=int(i), lc=f.lc)
+            if not candidate.significant:
+                break
+
+            batch.append(candidate)
+            accepted.append(frequency[i])
+
+        return batch
+
+    def _fit_batch(self, batch: List[Frequency], lc: LightCurve, mode: str = 'lmfit') -> LightCurve:
+        """
+        Fits a batch of frequencies jointly to a light curve. Initial values are computed in closed form for the
+        frequencies of the peaks. 'scipy' and 'auto' continue with *scipy.optimize.curve_fit* and the analytic jacobian,
+        'auto' falls back to lmfit if that fit doesn't converge. 'lmfit' fits all parameters of the batch with lmfit,
+        keeping every frequency between the minima adjacent to its peak. If a fit fails or exceeds its time budget, the
+        closed form solution is used. Uncertainties are computed according to Montgomery & O'Donoghue (1999).
+
+        :param batch: List of frequencies, see *_batch_candidates*
+        :param lc: Light curve, from which the batch is removed
+        :param mode: 'scipy', 'lmfit' or 'auto'
+        :return: Pre-whitened light curve
+        """
+        x = lc.time.value
+        y = lc.flux.value
+        epoch = self._epoch(x)
+        freqs = np.array([b.f_guess.value for b in batch])
+        amps, phases = linear_sin_fit(x - epoch, y, freqs)
+        p0 = np.column_stack((amps, freqs, phases)).flatten()
+
+        if mode not in ('scipy', 'lmfit', 'auto'):
+            raise ValueError("Unknown fit mode")
+
+        popt = None
+        nfev = 0
+        try:
+            if mode in ('scipy', 'auto'):
+                try:
+                    popt, pcov, infodict, _, _ = curve_fit(time_budget(sin_multiple, self._fit_time), x - epoch, y,
+                                                           p0=p0, jac=sin_multiple_jacobian, full_output=True)
+                    nfev = int(infodict['nfev'])
+                    if mode == 'auto' and not np.all(np.isfinite(pcov)):
+                        popt = None
+                except RuntimeError as e:
+                    if mode == 'scipy':
+                        mprint(f"Joint fit of {len(batch)} frequencies failed ({e}), using closed form solution.",
+                               warn)
+            if popt is None and mode in ('lmfit', 'auto'):
+                popt, lmfit_nfev = self._lmfit_batch(batch, x - epoch, y, p0)
+                nfev += lmfit_nfev
+        except FitTimeout as e:
+            mprint(f"Joint fit of {len(batch)} frequencies failed ({e}), using closed form solution.", warn)
+            popt = None
+
+        if popt is None:
+            popt = p0
+        self.nfev["prewhitening"] += nfev
+        popt = from_epoch(popt, epoch)
+
+        for b, (a, f, ph) in zip(batch, popt.reshape(-1, 3)):
+            b.fitter = "batch"
+            b.nfev = nfev
+            if a < 0:
+                a, ph = -a, ph + 0.5
+            sigma_amp, sigma_f, sigma_phi = m_od_uncertainty(lc, a)
+            b.amp = ufloat(a, sigma_amp)
+            b.f = ufloat(f, sigma_f)
+            b.phase = ufloat(ph % 1, sigma_phi)
+
+        return lc.share(flux=y - sin_multiple(x, *popt))
+
+    def _lmfit_batch(self, batch: List[Frequency], x: np.ndarray, y: np.ndarray,
+                     p0: np.ndarray) -> Tuple[np.ndarray, int]:
+        """
+        Joint lmfit fit of a batch, see *_fit_batch*. Amplitudes may vary by 50%, phases by half a cycle around the
+        initial values.
+
+        :param x: Time axis, relative to the reference epoch
+        :param p0: Initial values relative to the reference epoch
+        :return: Fitted parameters relative to the reference epoch and the number of function evaluations
+        """
+        from lmfit import Parameters, minimize
+
+        params = Parameters()
+        for i, (b, (a, f, ph)) in enumerate(zip(batch, p0.reshape(-1, 3))):
+            frequency = b.pdg.frequency.value
+            params.add(f"p{i}amp", value=a, min=0.5 * a, max=1.5 * a)
+            params.add(f"p{i}f", value=f, min=frequency[b.lower_m], max=frequency[b.upper_m])
+            params.add(f"p{i}phase", value=ph, min=ph - 0.5, max=ph + 0.5)
+        names = list(params)
+        function = time_budget(sin_multiple, self._fit_time)
+
+        def residual(p):
+            return function(x, *[p[name].value for name in names]) - y
+
+        fit_result = minimize(residual, params)
+        return np.array([fit_result.params[name].value for name in names]), fit_result.nfev
+
+    def _significant_batch(self, batch: List[Frequency], window_size: float, snr: float,
+                           significance: Significance, fap_threshold: float) -> List[Frequency]:
+        """
+        Checks the significance of every peak of a fitted batch again, on the light curve without the stronger peaks of
+        the batch. This is the light curve single pre-whitening would find the peak in. The first peak is the highest
+        peak of the iteration and was already checked.
+
+        :param batch: Fitted batch, see *_fit_batch*
+        :return: The batch up to the first peak that is no longer significant. Peaks after the first one are replaced
+        by *Frequency* objects of the checked light curves, carrying over the fit result.
+        """
+        first = batch[0]
+        time = first.lc.time.value
+        flux = first.lc.flux.value
+        accepted = [first]
+        for previous, b in zip(batch, batch[1:]):
+            flux = flux - sin(time, previous.amp.nominal_value, previous.f.nominal_value, previous.phase.nominal_value)
+            lc = first.lc.share(flux=flux)
+            pdg = Periodogram.from_lightcurve(lc, self.f_min, self.f_max, remove_ranges=self.rm_ranges)
+            peak = b.lower_m + int(np.argmax(pdg.power.value[b.lower_m:b.upper_m + 1]))
+            candidate = Frequency(time, flux, window_size, snr, f_min=self.f_min, f_max=self.f_max,
+                                  rm_ranges=self.rm_ranges, significance=significance, fap_threshold=fap_threshold,
+                                  fap_null=self._fap_null, pdg=pdg, peak_index=peak, lc=lc,
+                                  center_time=self._center_time, fit_time=self._fit_time)
+            if not candidate.significant:
+                break
+
+            candidate.amp, candidate.f, candidate.phase = b.amp, b.f, b.phase
+            candidate.fitter, candidate.nfev = b.fitter, b.nfev
+            accepted.append(candidate)
+        return accepted
+
+    def _epoch(self, time: np.ndarray) -> float:
+        """
+        Returns the reference epoch of the fits, see *reference_epoch*
+        """
+        return reference_epoch(time) if self._center_time else 0.
+
+    def _fap(self, result: List[Frequency]) -> np.ndarray:
+        """
+        Computes the false alarm probability for all found frequencies at once.
+
+        :param result: List of found frequencies
+        :return: False alarm probability for every frequency
+        """
+        if len(result) == 0:
+            return np.empty(0)
+
+        z = np.array([f.z for f in result])
+        if self._fap_null is not None:
+            return fap_bootstrap(z, self._fap_null)
+        return fap_baluev(z, self.pdg.frequency[-1].value, self.lc.time.value)
+
+    def plot(self, ax: 'Axes' = None, show=False, plot_insignificant=False, **kwargs):
         """
         Plots the periodogram of the data set, including the found frequencies.
 
@@ -547,7 +1127,7 @@ class FFinder:
         else:
             color = 'grey'
 
-        ax: Axes = self.pdg.plot(ax=ax, color=color, ylabel='Amplitude [mag]', **kwargs)
+        ax: 'Axes' = self.pdg.plot(ax=ax, color=color, ylabel='Amplitude [mag]', **kwargs)
 
         if plot_insignificant:
             frame = self.result
@@ -568,6 +1148,8 @@ class FFinder:
             ax.annotate(f'f{i[0] + 1}', (f, a))
 
         if show:
+            import matplotlib.pyplot as pl
+
             pl.show()
 
     def _scipy_fit(self, result: List[Frequency]) -> List[Frequency]:
@@ -586,11 +1168,16 @@ class FFinder:
 
             boundaries[0] += [r.amp.nominal_value * 0.5, r.f.nominal_value * 0.5, 0]
             boundaries[1] += [r.amp.nominal_value * 1.5, r.f.nominal_value * 1.5, 1]
+        x = self.lc.time.value
+        epoch = self._epoch(x)
         try:
-            popt, pcov = curve_fit(sin_multiple, self.lc.time, self.lc.flux, p0=arr)
+            popt, pcov, infodict, _, _ = curve_fit(time_budget(sin_multiple, self._fit_time), x - epoch,
+                                                   self.lc.flux.value, p0=to_epoch(arr, epoch), full_output=True)
         except RuntimeError:
             mprint(f"Failed to improve first {len(result)} frequencies. Skipping fit improvement.", warn)
             return result
+        self.nfev["improve"] += int(infodict['nfev'])
+        popt = from_epoch(popt, epoch)
         perr = np.sqrt(np.diag(pcov))
         for r, vals in zip(result,
                            [[ufloat(popt[i + j], perr[i + j]) for j in range(0, 3)] for i in range(0, len(popt), 3)]):
@@ -599,45 +1186,113 @@ class FFinder:
             r.phase = vals[2]
         return result
 
+    def _lmfit_parameters(self, result: List[Frequency], epoch: float) -> 'Parameters':
+        """
+        Returns the parameters of the combined lmfit fit. The *Parameters* object is kept between the iterations of a
+        run: parameters of new frequencies are added, the values and limits of known ones are updated in place.
+        Amplitudes and frequencies may vary by 20%, phases by half a cycle.
+
+        :param result: List of found frequencies
+        :param epoch: Reference epoch of the phases
+        :return: Parameters, named by the label of every frequency followed by 'amp', 'f' and 'phase'
+        """
+        from lmfit import Parameters
+
+        if self._lmfit_params is None:
+            self._lmfit_params = Parameters()
+        params = self._lmfit_params
+
+        labels = {f.label for f in result}
+        for name in [name for name in params if params[name].user_data not in labels]:
+            del params[name]
+
+        for f in result:
+            phase = phase_at_epoch(f.phase.nominal_value, f.f.nominal_value, epoch)
+            amp, frequency = f.amp.nominal_value, f.f.nominal_value
+            # phases near 0 would get an empty interval with relative limits, they may vary by half a cycle instead
+            for name, value, low, high in [('amp', amp, 0.8 * amp, 1.2 * amp),
+                                           ('f', frequency, 0.8 * frequency, 1.2 * frequency),
+                                           ('phase', phase, phase - 0.5, phase + 0.5)]:
+                if f.label + name not in params:
+                    params.add(f.label + name, value=value, min=low, max=high)
+                    params[f.label + name].user_data = f.label
+                else:
+                    params[f.label + name].set(value=value, min=low, max=high)
+        return params
+
     def _lmfit_fit(self, result: List[Frequency]) -> List[Frequency]:
         """
-        Performs a combination fit for all found frequencies using *lmfit*.
+        Performs a combination fit for all found frequencies using *lmfit*. The parameters are reused between
+        iterations (see *_lmfit_parameters*), and the model of all frequencies is evaluated at once by *sin_multiple*.
 
         :param result: List of found frequencies
         :return: List of improved frequencies
         """
-        models = []
+        from lmfit import minimize
+
+        x = self.lc.time.value
+        y = self.lc.flux.value
+        epoch = self._epoch(x)
+        function = time_budget(sin_multiple, self._fit_time)
+        params = self._lmfit_parameters(result, epoch)
+        names = [f.label + name for f in result for name in ['amp', 'f', 'phase']]
+
+        def residual(p):
+            return function(x - epoch, *[p[name].value for name in names]) - y
+
+        fit_result = minimize(residual, params)
+        self.nfev["improve"] += fit_result.nfev
+        values = fit_result.params.valuesdict()
+
         for f in result:
-            m = Model(sin, prefix=f._label)
+            sigma_amp, sigma_f, sigma_phi = m_od_uncertainty(self.lc, values[f.label + 'amp'])
+            f.amp = ufloat(values[f.label + 'amp'], sigma_amp)
+            f.f = ufloat(values[f.label + 'f'], sigma_f)
+            f.phase = ufloat(phase_at_epoch(values[f.label + 'phase'], values[f.label + 'f'], -epoch), sigma_phi)
+
+        return result
 
-            m.set_param_hint(f.label + 'amp', value=f.amp.nominal_value, min=0.8 * f.amp.nominal_value,
-                             max=1.2 * f.amp.nominal_value)
-            m.set_param_hint(f.label + 'f', value=f.f.nominal_value, min=0.8 * f.f.nominal_value,
-                             max=1.2 * f.f.nominal_value)
-            m.set_param_hint(f.label + 'phase', value=f.phase.nominal_value, min=0.8 * f.phase.nominal_value,
-                             max=1.2 * f.phase.nominal_value)
-            models.append(m)
+    def _auto_fit(self, result: List[Frequency]) -> List[Frequency]:
+        """
+        Performs a combination fit for all found frequencies using *scipy.optimize.curve_fit* and the analytic
+        jacobian. Falls back to *_lmfit_fit* if the fit doesn't converge.
 
-        model: Model = np.sum(models)
+        :param result: List of found frequencies
+        :return: List of improved frequencies
+        """
+        x = self.lc.time.value
+        epoch = self._epoch(x)
+        params = [[r.amp.nominal_value, r.f.nominal_value, r.phase.nominal_value] for r in result]
         try:
-            fit_result = model.fit(self.lc.flux.value, x=self.lc.time)
-        except AttributeError:
-            fit_result = model.fit(self.lc.flux, x=self.lc.time)
+            popt, pcov, infodict, _, _ = curve_fit(time_budget(sin_multiple, self._fit_time), x - epoch,
+                                                   self.lc.flux.value, p0=to_epoch(np.ravel(params), epoch),
+                                                   jac=sin_multiple_jacobian, full_output=True)
+            self.nfev["improve"] += int(infodict['nfev'])
+            converged = np.all(np.isfinite(pcov))
+        except RuntimeError:
+            converged = False
 
-        for f in result:
-            sigma_amp, sigma_f, sigma_phi = m_od_uncertainty(self.lc, fit_result.values[f._label + 'amp'])
-            f.amp = ufloat(fit_result.values[f.label + 'amp'], sigma_amp)
-            f.f = ufloat(fit_result.values[f.label + 'f'], sigma_f)
-            f.phase = ufloat(fit_result.values[f.label + 'phase'], sigma_phi)
+        if not converged:
+            mprint(f"Combined fit of {len(result)} frequencies did not converge with scipy, using lmfit", log)
+            return self._lmfit_fit(result)
 
+        popt = from_epoch(popt, epoch)
+        for r, (a, f, ph) in zip(result, popt.reshape(-1, 3)):
+            if a < 0:
+                a, ph = -a, ph + 0.5
+            sigma_amp, sigma_f, sigma_phi = m_od_uncertainty(self.lc, a)
+            r.amp = ufloat(a, sigma_amp)
+            r.f = ufloat(f, sigma_f)
+            r.phase = ufloat(ph % 1, sigma_phi)
         return result
 
     def _improve_fit(self, result: List[Frequency], mode='lmfit', fit_fun :callable = None) -> Union[List[Frequency],Tuple[List[Frequency],LightCurve]]:
         """
-        Performs a combination fit for all found frequencies.
+        Performs a combination fit for all found frequencies. If a *FitCache* is used, the result is read from it if
+        the same fit was done before.
 
         :param result: List of found frequencies
-        :param mode: Method used, either 'scipy' or 'lmfit'
+        :param mode: Method used, either 'scipy', 'lmfit' or 'auto'
         :return:
         """
         if fit_fun is not None:
@@ -646,12 +1301,36 @@ class FFinder:
                 raise ValueError("Improve fit must return a list of frequency objects!")
 
             return ret_val
-        if mode == 'scipy':
-            return self._scipy_fit(result)
-        elif mode == 'lmfit':
-            return self._lmfit_fit(result)
-        else:
-            raise ValueError(f"Fitting mode '{mode}' not available.")
+
+        key = None
+        if self._fit_cache is not None:
+            params = [[r.amp.nominal_value, r.f.nominal_value, r.phase.nominal_value] for r in result]
+            key = self._fit_cache.key("improve", mode, self.lc.time.value, self.lc.flux.value, np.ravel(params),
+                                      epoch=self._epoch(self.lc.time.value), fit_time=self._fit_time)
+            stored = self._fit_cache.get(key)
+            if stored is not None:
+                for r, (a, sigma_amp, f, sigma_f, ph, sigma_phi) in zip(result, stored['params']):
+                    r.amp, r.f, r.phase = ufloat(a, sigma_amp), ufloat(f, sigma_f), ufloat(ph, sigma_phi)
+                return result
+
+        try:
+            if mode == 'scipy':
+                result = self._scipy_fit(result)
+            elif mode == 'lmfit':
+                result = self._lmfit_fit(result)
+            elif mode == 'auto':
+                result = self._auto_fit(result)
+            else:
+                raise ValueError(f"Fitting mode '{mode}' not available.")
+        except FitTimeout:
+            mprint(f"Improving {len(result)} frequencies exceeded the time budget of {self._fit_time}s. Skipping fit "
+                   f"improvement.", warn)
+            return result
+
+        if key is not None:
+            self._fit_cache.put(key, {'params': [[r.amp.nominal_value, r.amp.std_dev, r.f.nominal_value, r.f.std_dev,
+                                                  r.phase.nominal_value, r.phase.std_dev] for r in result]})
+        return result
 
     def _res_lc_from_model(self, result: List[Frequency], use_insignificant=False) -> LightCurve:
         """
@@ -669,11 +1348,7 @@ class FFinder:
             params.append(f.f.nominal_value)
             params.append(f.phase.nominal_value)
 
-        try:
-            return LightCurve(lk.LightCurve(self.lc.time, self.lc.flux - sin_multiple(self.lc.time, *params)))
-        except u.UnitConversionError:
-            return LightCurve(
-                lk.LightCurve(self.lc.time, self.lc.flux - sin_multiple(self.lc.time, *params) * self.lc.flux.unit))
+        return self.lc.share(flux=self.lc.flux.value - sin_multiple(self.lc.time.value, *params))
 
     def improve_result(self,mode ='lmfit') -> df:
         """
@@ -687,6 +1362,7 @@ class FFinder:
         self.res_lc = self._res_lc_from_model(f_list)
         self.res_pdg = Periodogram.from_lightcurve(self.res_lc, self.f_min, self.f_max)
         self.result = df(
-            [[i, i.f, i.amp, i.phase, i.snr, j, i.significant] for i, j in zip(f_list, self.result.res_noise.tolist())]
+            [[i, i.f, i.amp, i.phase, i.snr, k, j, i.significant]
+             for i, j, k in zip(f_list, self.result.res_noise.tolist(), self.result.fap.tolist())]
             , columns=self.columns)
         return self.result
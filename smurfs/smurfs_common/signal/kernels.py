@@ -0,0 +1,327 @@
+from time import perf_counter
+from typing import Callable, Dict, Tuple, Union
+
+import numpy as np
+
+from smurfs.smurfs_common.support.options import KernelBackend
+from smurfs.smurfs_common.support.settings import Settings
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+prange = numba.prange if numba is not None else range
+
+
+def _sin_sum_numpy(x: np.ndarray, params: np.ndarray) -> np.ndarray:
+    y = np.zeros(len(x))
+    for i in range(0, len(params), 3):
+        y += params[i] * np.sin(2. * np.pi * (params[i + 1] * x + params[i + 2]))
+    return y
+
+
+def _sin_sum_loop(x: np.ndarray, params: np.ndarray) -> np.ndarray:
+    y = np.empty(len(x))
+    for j in range(len(x)):
+        value = 0.
+        for i in range(0, len(params), 3):
+            value += params[i] * np.sin(2. * np.pi * (params[i + 1] * x[j] + params[i + 2]))
+        y[j] = value
+    return y
+
+
+def _adjacent_minima(power: np.ndarray, peak: int) -> Tuple[int, int]:
+    lower = -1
+    upper = -1
+    counter = 1
+    while lower == -1 or upper == -1:
+        neg = peak - counter
+        pos = peak + counter
+
+        if neg - 1 < 0:
+            lower = 0
+        elif power[neg] < power[neg + 1] and power[neg] < power[neg - 1]:
+            lower = neg
+
+        if pos + 1 >= len(power):
+            upper = len(power) - 1
+        elif power[pos] < power[pos + 1] and power[pos] < power[pos - 1]:
+            upper = pos
+
+        counter += 1
+    return lower, upper
+
+
+def _window_mean(frequency: np.ndarray, power: np.ndarray, lower: float, upper: float) -> float:
+    start = np.searchsorted(frequency, lower, side='right')
+    stop = np.searchsorted(frequency, upper, side='left')
+    return np.mean(power[start:stop])
+
+
+def _lomb_scargle_numpy(time: np.ndarray, frequency: np.ndarray, w: np.ndarray, wy: np.ndarray,
+                        chunk_size: int) -> np.ndarray:
+    shared_weights = np.all(w == w[0])
+    p = np.empty((len(w), len(frequency)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for start in range(0, len(frequency), chunk_size):
+            arg = 2 * np.pi * np.outer(frequency[start:start + chunk_size], time)
+            cos, sin = np.cos(arg), np.sin(arg)
+
+            yc = wy @ cos.T
+            ys = wy @ sin.T
+            if shared_weights:
+                # all stars have the same weights, so these terms are computed once for all of them
+                c, s = cos @ w[0], sin @ w[0]
+                cc = (cos * cos) @ w[0] - c * c
+                ss = (sin * sin) @ w[0] - s * s
+                cs = (cos * sin) @ w[0] - c * s
+            else:
+                c, s = w @ cos.T, w @ sin.T
+                cc = w @ (cos * cos).T - c * c
+                ss = w @ (sin * sin).T - s * s
+                cs = w @ (cos * sin).T - c * s
+
+            # least squares fit of a floating mean sine for every star and frequency
+            p[:, start:start + chunk_size] = (ss * yc ** 2 - 2 * cs * yc * ys + cc * ys ** 2) / (cc * ss - cs ** 2)
+    return p
+
+
+def _lomb_scargle_loop(time: np.ndarray, frequency: np.ndarray, w: np.ndarray, wy: np.ndarray,
+                       chunk_size: int) -> np.ndarray:
+    n_stars, n_time = w.shape
+    p = np.empty((n_stars, len(frequency)))
+    for k in prange(len(frequency)):
+        omega = 2 * np.pi * frequency[k]
+        sums = np.zeros((7, n_stars))
+        for j in range(n_time):
+            cos = np.cos(omega * time[j])
+            sin = np.sin(omega * time[j])
+            for i in range(n_stars):
+                weight = w[i, j]
+                if weight == 0:
+                    continue
+                sums[0, i] += weight * cos
+                sums[1, i] += weight * sin
+                sums[2, i] += weight * cos * cos
+                sums[3, i] += weight * sin * sin
+                sums[4, i] += weight * cos * sin
+                sums[5, i] += wy[i, j] * cos
+                sums[6, i] += wy[i, j] * sin
+        for i in range(n_stars):
+            c, s = sums[0, i], sums[1, i]
+            cc = sums[2, i] - c * c
+            ss = sums[3, i] - s * s
+            cs = sums[4, i] - c * s
+            yc, ys = sums[5, i], sums[6, i]
+            p[i, k] = (ss * yc ** 2 - 2 * cs * yc * ys + cc * ys ** 2) / (cc * ss - cs ** 2)
+    return p
+
+
+_numpy_kernels: Dict[str, Callable] = {
+    "sin_sum": _sin_sum_numpy,
+    "adjacent_minima": _adjacent_minima,
+    "window_mean": _window_mean,
+    "lomb_scargle": _lomb_scargle_numpy,
+}
+
+_numba_kernels: Dict[str, Callable] = {}
+if numba is not None:
+    # compiled lazily on the first call, and cached on disk for later processes
+    _numba_kernels = {
+        "sin_sum": numba.njit(cache=True, error_model='numpy')(_sin_sum_loop),
+        "adjacent_minima": numba.njit(cache=True, error_model='numpy')(_adjacent_minima),
+        "window_mean": numba.njit(cache=True, error_model='numpy')(_window_mean),
+        "lomb_scargle": numba.njit(cache=True, error_model='numpy', parallel=True)(_lomb_scargle_loop),
+    }
+
+
+def _check(backend: KernelBackend):
+    if backend == KernelBackend.NUMBA and numba is None:
+        raise ImportError("The numba kernels need numba, install it with 'pip install numba'")
+
+
+def set_backend(backend: Union[KernelBackend, str]) -> KernelBackend:
+    """
+    Selects the default backend of the kernels, which is used by all threads that don't override it. Use
+    *Settings.context(kernels=...)* to select the backend only for the current thread.
+
+    :param backend: 'auto' uses numba if it is installed, 'numba' requires it, 'numpy' always uses the numpy kernels
+    :return: Previous default backend
+    """
+    backend = KernelBackend(backend)
+    _check(backend)
+    previous = KernelBackend(Settings._kernels)
+    Settings.kernels = backend.value
+    return previous
+
+
+def active_backend() -> KernelBackend:
+    """
+    Returns the backend that is used by the kernels in the current thread, either 'numba' or 'numpy'. The backend is
+    selected through *Settings.kernels*, which defaults to the SMURFS_KERNELS environment variable.
+    """
+    backend = KernelBackend(Settings.kernels)
+    _check(backend)
+    if backend != KernelBackend.NUMPY and numba is not None:
+        return KernelBackend.NUMBA
+    return KernelBackend.NUMPY
+
+
+def _kernel(name: str, backend: KernelBackend = None) -> Callable:
+    backend = active_backend() if backend is None else KernelBackend(backend)
+    return _numba_kernels[name] if backend == KernelBackend.NUMBA else _numpy_kernels[name]
+
+
+def sin_sum(x: np.ndarray, params: np.ndarray, backend: KernelBackend = None) -> np.ndarray:
+    """
+    Sum of sines, see *sin_multiple*.
+
+    :param x: Time axis, days
+    :param params: Flat array of amplitude, frequency and phase of every sine
+    :param backend: Overrides the selected backend
+    :return: Model at every time stamp
+    """
+    return _kernel("sin_sum", backend)(np.ascontiguousarray(x, dtype=np.float64),
+                                       np.ascontiguousarray(params, dtype=np.float64))
+
+
+def adjacent_minima(power: np.ndarray, peak: int, backend: KernelBackend = None) -> Tuple[int, int]:
+    """
+    Finds the local minima of a spectrum next to a peak, see *Frequency.find_adjacent_minima*.
+
+    :param power: Power of the spectrum
+    :param peak: Index of the peak
+    :param backend: Overrides the selected backend
+    :return: Index of the lower and upper minimum
+    """
+    lower, upper = _kernel("adjacent_minima", backend)(np.ascontiguousarray(power, dtype=np.float64), int(peak))
+    return int(lower), int(upper)
+
+
+def window_mean(frequency: np.ndarray, power: np.ndarray, lower: float, upper: float,
+                backend: KernelBackend = None) -> float:
+    """
+    Mean power of a sorted spectrum between two frequencies (both exclusive). The window is found through a binary
+    search instead of a mask over the whole spectrum.
+
+    :param frequency: Sorted frequency grid
+    :param power: Power of the spectrum
+    :param lower: Lower end of the window
+    :param upper: Upper end of the window
+    :param backend: Overrides the selected backend
+    :return: Mean power within the window
+    """
+    return float(_kernel("window_mean", backend)(np.ascontiguousarray(frequency, dtype=np.float64),
+                                                 np.ascontiguousarray(power, dtype=np.float64),
+                                                 float(lower), float(upper)))
+
+
+def lomb_scargle(time: np.ndarray, frequency: np.ndarray, w: np.ndarray, wy: np.ndarray, chunk_size: int,
+                 backend: KernelBackend = None) -> np.ndarray:
+    """
+    Exact (floating mean) Lomb-Scargle power of several light curves, used by *Periodogram.batch_from_flux* for
+    short frequency grids. The numpy kernel computes chunks of trigonometric matrices and multiplies them with the
+    data, the numba kernel computes every sine and cosine once and accumulates all sums in a single loop, in parallel
+    over the frequencies.
+
+    :param time: Common time array
+    :param frequency: Frequency grid
+    :param w: Weights, one row per star, rows sum up to one. Missing cadences have zero weight
+    :param wy: Weighted fluxes with the weighted mean removed
+    :param chunk_size: Number of frequencies per chunk of the numpy kernel
+    :param backend: Overrides the selected backend
+    :return: Power, one row per star
+    """
+    return _kernel("lomb_scargle", backend)(np.ascontiguousarray(time, dtype=np.float64),
+                                            np.ascontiguousarray(frequency, dtype=np.float64),
+                                            np.ascontiguousarray(w, dtype=np.float64),
+                                            np.ascontiguousarray(wy, dtype=np.float64), int(chunk_size))
+
+
+def _reference_minima(power, peak: int) -> Tuple[int, int]:
+    # loop of the original Frequency.find_adjacent_minima, which worked on the power as a Quantity
+    def check_minima(y, counter: int) -> bool:
+        return y[counter] < y[counter + 1] and y[counter] < y[counter - 1]
+
+    counter, lower, upper = 1, -1, -1
+    while lower == -1 or upper == -1:
+        neg, pos = peak - counter, peak + counter
+        if neg - 1 < 0:
+            lower = 0
+        elif check_minima(power, neg):
+            lower = neg
+        if pos + 1 >= len(power):
+            upper = len(power) - 1
+        elif check_minima(power, pos):
+            upper = pos
+        counter += 1
+    return lower, upper
+
+
+def benchmark(n_points: int = 20000, n_frequencies: int = 5000, n_sines: int = 20, repeat: int = 3,
+              seed: int = None) -> Dict[str, Dict[str, float]]:
+    """
+    Measures the duration of every kernel with every available backend on synthetic data, as well as the duration of
+    the implementation it replaced ('reference'): the loop over *sin* in *sin_multiple*, the loop and the mask over
+    the Quantity spectrum in *Frequency*, and astropy's exact Lomb-Scargle periodogram for every star. The speedup
+    of a backend is the reference duration divided by its duration. Every call is made once before the
+    measurement, so compilation isn't part of the result.
+
+    :param n_points: Number of time stamps
+    :param n_frequencies: Number of frequencies of the spectra
+    :param n_sines: Number of sines of the model
+    :param repeat: Number of measurements, the fastest one is kept
+    :param seed: Seed of the random number generator
+    :return: Duration in seconds, per kernel and backend (or 'reference')
+    """
+    from astropy.timeseries import LombScargle
+    from astropy.units import cds
+
+    rng = np.random.default_rng(seed)
+    time = np.sort(rng.uniform(0, 27, n_points))
+    params = np.column_stack((rng.uniform(0.1, 1, n_sines), rng.uniform(0.1, 20, n_sines),
+                              rng.uniform(0, 1, n_sines))).ravel()
+    frequency = np.linspace(0.01, 50, n_frequencies)
+    power = np.abs(rng.normal(size=n_frequencies))
+    peak = n_frequencies // 2
+    w = np.full((1, n_points), 1 / n_points)
+    y = rng.normal(size=n_points)
+    wy = w * (y - y.mean())
+    chunk_size = max(1, 2 ** 22 // n_points)
+
+    frequency_q = frequency * (1 / cds.d)
+    power_q = power * cds.ppm
+    lower, upper = 20 * (1 / cds.d), 30 * (1 / cds.d)
+
+    calls = {
+        "sin_sum": lambda b: sin_sum(time, params, b),
+        "adjacent_minima": lambda b: adjacent_minima(power, peak, b),
+        "window_mean": lambda b: window_mean(frequency, power, 20, 30, b),
+        "lomb_scargle": lambda b: lomb_scargle(time, frequency, w, wy, chunk_size, b),
+    }
+    references = {
+        "sin_sum": lambda: sum(params[i] * np.sin(2. * np.pi * (params[i + 1] * time + params[i + 2]))
+                               for i in range(0, len(params), 3)),
+        "adjacent_minima": lambda: _reference_minima(power_q, peak),
+        "window_mean": lambda: np.mean(power_q[np.logical_and(lower < frequency_q, frequency_q < upper)]),
+        "lomb_scargle": lambda: [LombScargle(time, y, normalization='psd').power(frequency, method='cython')
+                                 for _ in range(len(w))],
+    }
+    backends = [KernelBackend.NUMPY] + ([KernelBackend.NUMBA] if numba is not None else [])
+
+    def measure(call: Callable[[], object]) -> float:
+        call()
+        durations = []
+        for _ in range(repeat):
+            start = perf_counter()
+            call()
+            durations.append(perf_counter() - start)
+        return min(durations)
+
+    result = {}
+    for name, call in calls.items():
+        result[name] = {"reference": measure(references[name])}
+        for backend in backends:
+            result[name][backend.value] = measure(lambda: call(backend))
+    return result
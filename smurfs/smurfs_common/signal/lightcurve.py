@@ -1,5 +1,12 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
 import lightkurve as lk
-from matplotlib.axes import Axes
+from astropy import units as u
+from astropy.time import Time
+
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
 
 class LightCurve(lk.LightCurve):
     """
@@ -11,7 +18,7 @@ class LightCurve(lk.LightCurve):
      :param kwargs: Additional keyword arguments passed to the parent class.
      """
     def __init__(self, data=None, *args, **kwargs):
-        if isinstance(data, lk.LightCurve):
+        if isinstance(data, lk.LightCurve) and not args and not kwargs:
             # If data is already a LightCurve object, we initialize from its data
             super().__init__(time=data.time, flux=data.flux, flux_err=data.flux_err, meta=data.meta)
             # Copy over any additional attributes that might be specific to TESS
@@ -19,15 +26,41 @@ class LightCurve(lk.LightCurve):
                 if hasattr(data, attr):
                     setattr(self, attr, getattr(data, attr))
         else:
-            # Otherwise, initialize normally
+            # Otherwise, initialize normally (this includes copies made by astropy, f.e. through *copy*)
             super().__init__(data, *args, **kwargs)
 
+    def share(self, flux=None) -> 'LightCurve':
+        """
+        Returns a light curve that shares its data with this one instead of copying it. The shared columns are made
+        read only in both light curves, so they can't be changed in place by accident. Assigning a column
+        (f.e. lc.flux = ...) replaces it only in the light curve it is assigned to, so data is only copied when it is
+        written.
+
+        :param flux: Optional new flux of the returned light curve. Arrays without a unit get the unit of this flux
+        :return: Light curve sharing the time axis and all columns that are not replaced
+        """
+        if flux is not None:
+            flux = flux if isinstance(flux, u.Quantity) else u.Quantity(flux, self.flux.unit)
+
+        # lightkurve copies the columns passed to its constructor, so the columns are added to an empty light curve
+        lc = LightCurve(meta=self.meta.copy())
+        with lc._delay_required_column_checks():
+            for name, col in self.columns.items():
+                if name == 'flux' and flux is not None:
+                    col = flux
+                elif isinstance(col, Time):
+                    col.writeable = False
+                elif isinstance(col, np.ndarray):
+                    col.flags.writeable = False
+                lc.add_column(col, name=name, copy=False)
+        return lc
+
     def plot(self, **kwargs):
-        ax: Axes = super().plot(color='k', ylabel="Flux [mag]", normalize=False, **kwargs)
+        ax: 'Axes' = super().plot(color='k', ylabel="Flux [mag]", normalize=False, **kwargs)
         ax.set_ylim(ax.get_ylim()[::-1])
         return ax
 
     def scatter(self, **kwargs):
-        ax: Axes = super().scatter(color='k', ylabel="Flux [mag]", normalize=False, **kwargs)
+        ax: 'Axes' = super().scatter(color='k', ylabel="Flux [mag]", normalize=False, **kwargs)
         ax.set_ylim(ax.get_ylim()[::-1])
         return ax
\ No newline at end of file
@@ -1,10 +1,16 @@
+from math import factorial
+from typing import List, Sequence, Tuple, Union
+
 import numpy as np
 import lightkurve as lk
+from scipy import sparse
 from lightkurve.periodogram import Periodogram as lkPeriodogram
 from astropy.timeseries import LombScargle
 from astropy.units import cds
 from pandas import DataFrame as df
 
+from smurfs.smurfs_common.signal import kernels
+
 
 class Periodogram(lkPeriodogram):
     """
@@ -67,6 +73,83 @@ class Periodogram(lkPeriodogram):
 
         return Periodogram(f * (1 / cds.d), p * cds.ppm, nyquist=nyquist, targetid=lc.meta.get('targetid'))
 
+    @staticmethod
+    def batch_from_flux(time: np.ndarray, flux: np.ndarray, f_min=None, f_max=None,
+                        remove_ranges: list[tuple[float]] = None, samples_per_peak=10,
+                        targetids: Sequence = None, stacked: bool = False, chunk_size: int = None) \
+            -> Union[List['Periodogram'], Tuple[np.ndarray, np.ndarray]]:
+        """
+        Computes the amplitude spectra of many light curves that share the same time stamps, f.e. all targets of a
+        TESS sector and camera. The spectra are the same as the ones of *from_lightcurve*, which uses the fast
+        Lomb-Scargle method of astropy (Press & Rybicki 1989) for more than 200 frequencies. Its extirpolation onto
+        the FFT grid only depends on the time stamps, so it is computed once as a sparse matrix and applied to all
+        stars at once, as are the trigonometric sums of the weights. Short grids use the exact periodogram, see
+        *kernels.lomb_scargle*, like astropy does.
+
+        Missing cadences of single stars can be given as NaN. They get a weight of zero, so the spectrum equals the
+        one of the remaining cadences, up to the approximation of the fast method.
+
+        :param time: Common time array of all light curves
+        :param flux: 2-D array of fluxes, one row per star
+        :param f_min: Lower range for the periodograms
+        :param f_max: Upper range for the periodograms
+        :param remove_ranges: List of tuples, that represent areas in the periodograms that are removed
+        :param samples_per_peak: number of samples per peak
+        :param targetids: Optional target ids of the stars, used for the returned Periodogram objects
+        :param stacked: If True, returns the frequency grid and a 2-D array of amplitudes (stars x frequencies)
+        instead of Periodogram objects
+        :param chunk_size: Number of stars whose FFT grids are computed at once (number of frequencies per chunk
+        for the exact periodogram). By default chosen such that a chunk needs about 64 MB
+        :return: List of Periodogram objects, or frequency and amplitude arrays if stacked is True
+        """
+        time = np.asarray(time, dtype=float)
+        flux = np.atleast_2d(np.asarray(flux, dtype=float))
+        if flux.shape[1] != len(time):
+            raise ValueError(f"Flux needs one column per time stamp, got {flux.shape[1]} columns for {len(time)} "
+                             f"time stamps")
+
+        nyquist = 1 / (2 * np.median(np.diff(time)))
+        f_min = 0 if f_min is None else f_min
+        f_max = nyquist if f_max is None else f_max
+        f = LombScargle(time, flux[0]).autofrequency(samples_per_peak=samples_per_peak, nyquist_factor=1,
+                                                     minimum_frequency=f_min, maximum_frequency=f_max)
+
+        # weights per star, missing cadences get zero weight
+        finite = np.isfinite(flux)
+        n = finite.sum(axis=1)
+        w = finite / n[:, None]
+        y = np.where(finite, flux, 0)
+        y = np.where(finite, y - np.sum(w * y, axis=1, keepdims=True), 0)
+        wy = w * y
+
+        if len(f) > 200:
+            p = _fast_lomb_scargle(time, f[0], f[1] - f[0], len(f), w, wy, chunk_size)
+        else:
+            chunk_size = max(1, 2 ** 22 // len(time)) if chunk_size is None else chunk_size
+            p = kernels.lomb_scargle(time, f, w, wy, chunk_size)
+
+        # psd normalization of astropy, followed by the same normalization as in from_lightcurve
+        p = np.sqrt(4 / n[:, None]) * np.sqrt(0.5 * n[:, None] * p)
+
+        # removing first item
+        p = p[:, 1:]
+        f = f[1:]
+
+        if remove_ranges is not None:
+            mask = np.ones_like(f, dtype=bool)
+            for r in remove_ranges:
+                mask &= (f < r[0]) | (f > r[1])
+            f = f[mask]
+            p = p[:, mask]
+
+        if stacked:
+            return f, p
+
+        targetids = [None] * len(p) if targetids is None else targetids
+        frequency = f * (1 / cds.d)
+        return [Periodogram(frequency, i * cds.ppm, nyquist=nyquist, targetid=targetid)
+                for i, targetid in zip(p, targetids)]
+
     def plot(self, scale='linear', ax=None, xlabel=None, ylabel=None, title='', style='lightkurve', view=None,
              unit=None, color='k', **kwargs):
         """
@@ -84,4 +167,99 @@ class Periodogram(lkPeriodogram):
         :param file: File object
         """
         frame = df.from_dict({'Frequency': self.frequency.value, 'Power': self.power.value})
-        frame.to_csv(file, index=False)
\ No newline at end of file
+        frame.to_csv(file, index=False)
+
+
+def _extirpolation_matrix(time: np.ndarray, f0: float, df: float, n_fft: int, m: int = 4) -> sparse.csr_matrix:
+    """
+    Sparse matrix that spreads values at the time stamps onto the FFT grid of *astropy.timeseries*' trig_sum, using
+    Lagrange polynomial weights on the *m* nearest grid points (Press & Rybicki 1989). The phase shift of a non zero
+    lowest frequency is included, so the product with the values is the grid that is passed to the inverse FFT.
+    """
+    t0 = time.min()
+    x = ((time - t0) * n_fft * df) % n_fft
+    shift = np.exp(2j * np.pi * f0 * (time - t0)) if f0 > 0 else np.ones(len(time))
+
+    rows, cols, values = [], [], []
+    integers = x % 1 == 0
+    rows.append(np.flatnonzero(integers))
+    cols.append(x[integers].astype(int))
+    values.append(shift[integers])
+
+    index = np.flatnonzero(~integers)
+    x, shift = x[~integers], shift[~integers]
+    ilo = np.clip((x - m // 2).astype(int), 0, n_fft - m)
+    numerator = shift * np.prod(x - ilo - np.arange(m)[:, np.newaxis], 0)
+    denominator = factorial(m - 1)
+    for j in range(m):
+        if j > 0:
+            denominator *= j / (j - m)
+        ind = ilo + (m - 1 - j)
+        rows.append(index)
+        cols.append(ind)
+        values.append(numerator / (denominator * (x - ind)))
+
+    return sparse.csr_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+                             shape=(len(time), n_fft))
+
+
+def _trig_sums(time: np.ndarray, h: np.ndarray, f0: float, df: float, n: int, matrix: sparse.csr_matrix,
+               chunk_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sine and cosine sums of every row of *h* at the frequencies f0 + df * arange(n), computed like trig_sum of
+    *astropy.timeseries* with the extirpolation matrix of *_extirpolation_matrix*.
+    """
+    n_fft = matrix.shape[1]
+    matrix = matrix.T.tocsr()
+    t0 = time.min()
+    phase = np.exp(2j * np.pi * t0 * (f0 + df * np.arange(n))) if t0 != 0 else 1
+
+    s = np.empty((len(h), n))
+    c = np.empty((len(h), n))
+    for start in range(0, len(h), chunk_size):
+        grid = (matrix @ h[start:start + chunk_size].T).T
+        fft_grid = np.fft.ifft(grid, axis=1)[:, :n] * phase
+        c[start:start + chunk_size] = n_fft * fft_grid.real
+        s[start:start + chunk_size] = n_fft * fft_grid.imag
+    return s, c
+
+
+def _fast_lomb_scargle(time: np.ndarray, f0: float, df: float, n: int, w: np.ndarray, wy: np.ndarray,
+                       chunk_size: int = None, oversampling: int = 5) -> np.ndarray:
+    """
+    Floating mean Lomb-Scargle power of several light curves, following lombscargle_fast of *astropy.timeseries*
+    (Zechmeister & Kurster 2009, Press & Rybicki 1989). The sums of the weights are only computed once if all stars
+    have the same weights.
+
+    :param time: Common time array
+    :param f0: Lowest frequency of the grid
+    :param df: Step of the frequency grid
+    :param n: Number of frequencies
+    :param w: Weights, one row per star, rows sum up to one. Missing cadences have zero weight
+    :param wy: Weighted fluxes with the weighted mean removed
+    :param chunk_size: Number of stars whose FFT grids are computed at once
+    :param oversampling: Oversampling of the FFT grid, the same as in astropy
+    :return: Power, one row per star, without normalization
+    """
+    n_fft = 1 << int(n * oversampling - 1).bit_length()
+    chunk_size = max(1, 2 ** 22 // n_fft) if chunk_size is None else chunk_size
+    if np.all(w == w[0]):
+        w = w[:1]
+
+    matrix = _extirpolation_matrix(time, f0, df, n_fft)
+    sh, ch = _trig_sums(time, wy, f0, df, n, matrix, chunk_size)
+    s, c = _trig_sums(time, w, f0, df, n, matrix, chunk_size)
+    s2, c2 = _trig_sums(time, w, 2 * f0, 2 * df, n, _extirpolation_matrix(time, 2 * f0, 2 * df, n_fft), chunk_size)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tan_2omega_tau = (s2 - 2 * s * c) / (c2 - (c * c - s * s))
+        s2w = tan_2omega_tau / np.sqrt(1 + tan_2omega_tau * tan_2omega_tau)
+        c2w = 1 / np.sqrt(1 + tan_2omega_tau * tan_2omega_tau)
+        cw = np.sqrt(0.5) * np.sqrt(1 + c2w)
+        sw = np.sqrt(0.5) * np.sign(s2w) * np.sqrt(1 - c2w)
+
+        yc = ch * cw + sh * sw
+        ys = sh * cw - ch * sw
+        cc = 0.5 * (1 + c2 * c2w + s2 * s2w) - (c * cw + s * sw) ** 2
+        ss = 0.5 * (1 - c2 * c2w - s2 * s2w) - (s * cw - c * sw) ** 2
+        return yc * yc / cc + ys * ys / ss
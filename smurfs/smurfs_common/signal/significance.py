@@ -0,0 +1,93 @@
+import numpy as np
+from scipy.special import gammaln
+
+from smurfs.smurfs_common.support.mprint import mprint, log
+from smurfs.smurfs_common.support.options import Significance, FapMethod
+
+
+def standard_power(amp: np.ndarray, variance: float) -> np.ndarray:
+    """
+    Converts the amplitude of a peak in an amplitude spectrum (see *Periodogram.from_lightcurve*) into the
+    'standard' normalized Lomb-Scargle power, which is the fraction of the variance of the light curve that is
+    explained by a sinusoid at that frequency.
+
+    :param amp: Amplitude of the peak(s)
+    :param variance: Variance of the light curve the spectrum was computed from
+    :return: Normalized power, between 0 and 1
+    """
+    return np.clip(np.asarray(amp, dtype=float) ** 2 / (2 * variance), 0, 1)
+
+
+def fap_baluev(z: np.ndarray, f_max: float, time: np.ndarray) -> np.ndarray:
+    """
+    Computes the false alarm probability of the highest peak in a periodogram with the analytic approximation of
+    Baluev (2008), which bounds the probability that noise alone produces a peak of this height anywhere in the
+    frequency range. Vectorized over *z*.
+
+    :param z: 'Standard' normalized power of the peak(s), see *standard_power*
+    :param f_max: Upper end of the frequency range that was searched. It is used as given, astropy instead uses the
+                  last frequency of its grid, which gives slightly smaller probabilities
+    :param time: Time axis of the light curve
+    :return: False alarm probability for every peak
+    """
+    z = np.clip(np.asarray(z, dtype=float), 0, 1)
+    n = len(time)
+    n_h = n - 1
+    n_k = n - 3
+
+    gamma = np.sqrt(2 / n_h) * np.exp(gammaln(n_h / 2) - gammaln((n_h - 1) / 2))
+    w = f_max * np.sqrt(4 * np.pi * np.var(time))
+    tau = gamma * w * (1 - z) ** (0.5 * (n_k - 1)) * np.sqrt(0.5 * n_h * z)
+
+    fap_single = (1 - z) ** (0.5 * n_k)
+    return np.clip(-np.expm1(-tau) + fap_single * np.exp(-tau), 0, 1)
+
+
+def bootstrap_max_power(time: np.ndarray, flux: np.ndarray, f_min: float = None, f_max: float = None,
+                        n_bootstraps: int = 1000, samples_per_peak: int = 10, seed: int = None) -> np.ndarray:
+    """
+    Computes the distribution of the highest 'standard' normalized peak for white noise with the time sampling of the
+    light curve, by computing the periodogram of randomly permuted fluxes. As the normalized power does not depend
+    on the noise level, this distribution can be reused for every iteration of a run.
+
+    :param time: Time axis
+    :param flux: Flux axis
+    :param f_min: Lower end of the frequency range
+    :param f_max: Upper end of the frequency range
+    :param n_bootstraps: Number of permutations
+    :param samples_per_peak: Samples per peak of the frequency grid
+    :param seed: Seed of the random number generator
+    :return: Sorted array of the highest power of every permutation
+    """
+    from astropy.timeseries import LombScargle
+
+    time = np.asarray(time, dtype=float)
+    flux = np.asarray(flux, dtype=float)
+    nyquist = 1 / (2 * np.median(np.diff(time)))
+    f_min = 0 if f_min is None else f_min
+    f_max = nyquist if f_max is None else f_max
+
+    mprint(f"Computing {n_bootstraps} bootstrap periodograms for the false alarm probability", log)
+
+    rng = np.random.default_rng(seed)
+    null = np.empty(n_bootstraps)
+    for i in range(n_bootstraps):
+        ls = LombScargle(time, rng.permutation(flux), normalization='standard')
+        _, p = ls.autopower(minimum_frequency=f_min, maximum_frequency=f_max, samples_per_peak=samples_per_peak,
+                            nyquist_factor=1)
+        null[i] = np.amax(p[1:])
+
+    return np.sort(null)
+
+
+def fap_bootstrap(z: np.ndarray, null_max_power: np.ndarray) -> np.ndarray:
+    """
+    Computes the false alarm probability of peaks from a bootstrap distribution, as the fraction of noise
+    periodograms that have a higher peak. Vectorized over *z*.
+
+    :param z: 'Standard' normalized power of the peak(s), see *standard_power*
+    :param null_max_power: Sorted distribution of the highest peaks of noise, see *bootstrap_max_power*
+    :return: False alarm probability for every peak
+    """
+    n = len(null_max_power)
+    return (n - np.searchsorted(null_max_power, np.asarray(z, dtype=float), side='left')) / n
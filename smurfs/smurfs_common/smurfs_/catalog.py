@@ -0,0 +1,207 @@
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import List, Optional, Union
+
+import astropy.units as u
+import numpy as np
+import pandas as pd
+from pandas import DataFrame as df
+from uncertainties import unumpy as unp
+
+_schema = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    target TEXT NOT NULL,
+    label TEXT,
+    created TEXT NOT NULL,
+    result_path TEXT,
+    settings TEXT,
+    statistics TEXT,
+    n_frequencies INTEGER
+);
+CREATE TABLE IF NOT EXISTS frequencies (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    f_nr INTEGER NOT NULL,
+    name TEXT,
+    frequency REAL NOT NULL,
+    frequency_err REAL,
+    amp REAL,
+    amp_err REAL,
+    phase REAL,
+    phase_err REAL,
+    snr REAL,
+    fap REAL,
+    res_noise REAL,
+    significant INTEGER,
+    solution TEXT,
+    PRIMARY KEY (run_id, f_nr)
+);
+CREATE INDEX IF NOT EXISTS runs_target ON runs(target);
+CREATE INDEX IF NOT EXISTS frequencies_frequency ON frequencies(frequency);
+"""
+
+_frequency_columns = ['f_nr', 'name', 'frequency', 'frequency_err', 'amp', 'amp_err', 'phase', 'phase_err', 'snr',
+                      'fap', 'res_noise', 'significant', 'solution']
+
+
+def _plain(value):
+    """
+    Converts quantities and numpy scalars into python values for JSON.
+    """
+    if isinstance(value, u.Quantity):
+        value = value.value
+        return float(value) if np.ndim(value) == 0 else value.tolist()
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+def _row_json(frame: df) -> Optional[str]:
+    return json.dumps(frame.iloc[0].to_dict(), default=_plain) if len(frame) > 0 else None
+
+
+def _optional(value) -> Optional[float]:
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+class FrequencyCatalog:
+    """
+    SQLite catalog of analysis results. Every call to *add* stores the settings, statistics and found frequencies of
+    a *Smurfs* run. Frequencies are indexed, so cross target queries like *near* don't need to read the result files
+    of all runs.
+
+    The catalog can be shared by several threads of a process, and by several processes through the database file.
+
+    :param path: Path of the database file, it is created if it doesn't exist
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._connection = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA foreign_keys=ON")
+        self._connection.executescript(_schema)
+        self._lock = Lock()
+
+    def __enter__(self) -> 'FrequencyCatalog':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    def add(self, smurfs, result_path: Optional[Path] = None) -> int:
+        """
+        Stores the result of an analysis.
+
+        :param smurfs: *Smurfs* object, after *run* was called
+        :param result_path: Optional folder where the result was saved with *Smurfs.save*
+        :return: Id of the run in the catalog
+        """
+        frame = smurfs.result
+        solutions = {}
+        combinations = smurfs.combinations
+        if len(combinations) > 0:
+            solutions = {name: solution for name, solution, independent in
+                         combinations[['Name', 'Solution', 'Independent']].itertuples(index=False)
+                         if not independent}
+
+        rows = []
+        if len(frame) > 0:
+            values = {name: np.array(list(frame[name]), dtype=object) for name in ['frequency', 'amp', 'phase']}
+            nominal = {name: unp.nominal_values(v) for name, v in values.items()}
+            error = {name: unp.std_devs(v) for name, v in values.items()}
+            for i, (_, row) in enumerate(frame.iterrows()):
+                name = f"f{i + 1}"
+                rows.append((i, name, float(nominal['frequency'][i]), _optional(error['frequency'][i]),
+                             _optional(nominal['amp'][i]), _optional(error['amp'][i]),
+                             _optional(nominal['phase'][i]), _optional(error['phase'][i]),
+                             _optional(row.snr), _optional(row.fap), _optional(row.res_noise),
+                             int(bool(row.significant)), solutions.get(name)))
+
+        # Light curves without a target are stored under their label
+        target = smurfs.target_name if smurfs.target_name is not None else smurfs.label
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO runs (target, label, created, result_path, settings, statistics, n_frequencies) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (str(target), smurfs.label, datetime.now().isoformat(),
+                 str(result_path) if result_path is not None else None,
+                 _row_json(smurfs.settings), _row_json(smurfs.statistics), len(rows)))
+            run_id = cursor.lastrowid
+            self._connection.executemany(
+                f"INSERT INTO frequencies (run_id, {', '.join(_frequency_columns)}) "
+                f"VALUES ({', '.join('?' * (len(_frequency_columns) + 1))})",
+                [(run_id,) + row for row in rows])
+        return run_id
+
+    def _query(self, sql: str, parameters=()) -> df:
+        with self._lock:
+            return pd.read_sql_query(sql, self._connection, params=parameters)
+
+    def runs(self, target: Optional[str] = None) -> df:
+        """
+        Returns all runs, or the runs of a single target. Settings and statistics are JSON strings.
+        """
+        if target is None:
+            return self._query("SELECT * FROM runs ORDER BY id")
+        return self._query("SELECT * FROM runs WHERE target = ? ORDER BY id", (target,))
+
+    def frequencies(self, run_id: int) -> df:
+        """
+        Returns the frequencies of a run.
+        """
+        return self._query(f"SELECT {', '.join(_frequency_columns)} FROM frequencies WHERE run_id = ? ORDER BY f_nr",
+                           (run_id,))
+
+    def near(self, frequency: float, delta: float, significant_only: bool = True) -> df:
+        """
+        Returns all frequencies of all runs within *frequency* ± *delta*, together with their target.
+
+        :param frequency: Frequency in c/d
+        :param delta: Half width of the searched range in c/d
+        :param significant_only: Ignores frequencies that are not significant
+        :return: Dataframe with the run, target and the frequency columns, sorted by the distance to *frequency*
+        """
+        sql = (f"SELECT r.id AS run_id, r.target, r.label, {', '.join('f.' + i for i in _frequency_columns)} "
+               f"FROM frequencies f JOIN runs r ON r.id = f.run_id WHERE f.frequency BETWEEN ? AND ?")
+        if significant_only:
+            sql += " AND f.significant = 1"
+        sql += " ORDER BY abs(f.frequency - ?)"
+        return self._query(sql, (frequency - delta, frequency + delta, frequency))
+
+    def targets_near(self, frequency: float, delta: float, significant_only: bool = True) -> List[str]:
+        """
+        Returns all targets with a frequency within *frequency* ± *delta*.
+        """
+        return list(dict.fromkeys(self.near(frequency, delta, significant_only).target))
+
+    def shared_frequencies(self, delta: float, min_targets: int = 2, significant_only: bool = True) -> df:
+        """
+        Searches frequencies that appear in at least *min_targets* different targets within ± *delta*, f.e. signals
+        of the instrument or contamination by a neighbouring star.
+
+        :param delta: Half width of the range in c/d
+        :param min_targets: Minimum number of targets sharing a frequency
+        :param significant_only: Ignores frequencies that are not significant
+        :return: Dataframe with the frequency, the number of targets and the comma separated targets, sorted by the
+        number of targets
+        """
+        condition = "AND a.significant = 1 AND b.significant = 1" if significant_only else ""
+        frame = self._query(
+            f"SELECT a.frequency, COUNT(DISTINCT rb.target) AS n_targets, GROUP_CONCAT(DISTINCT rb.target) AS targets "
+            f"FROM frequencies a JOIN frequencies b ON b.frequency BETWEEN a.frequency - ? AND a.frequency + ? "
+            f"JOIN runs rb ON rb.id = b.run_id "
+            f"WHERE 1 {condition} GROUP BY a.run_id, a.f_nr HAVING n_targets >= ? "
+            f"ORDER BY n_targets DESC, a.frequency", (delta, delta, min_targets))
+
+        # every frequency of a group finds the same group, keep one per range
+        keep = []
+        for row in frame.itertuples(index=False):
+            if all(abs(row.frequency - i.frequency) > delta for i in keep):
+                keep.append(row)
+        return df(keep, columns=frame.columns)
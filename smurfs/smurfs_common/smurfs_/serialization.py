@@ -0,0 +1,221 @@
+import json
+from datetime import datetime
+from importlib.metadata import version, PackageNotFoundError
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from astropy import units as u
+from astropy.units import cds
+from pandas import DataFrame as df
+from uncertainties import ufloat
+from uncertainties import unumpy as unp
+
+from smurfs.smurfs_common.signal.combinations import CombinationFinder, combination_columns
+from smurfs.smurfs_common.signal.lightcurve import LightCurve
+from smurfs.smurfs_common.signal.periodogram import Periodogram
+from smurfs.smurfs_common.support.options import FluxType, Significance, StopReason
+
+FORMAT = "smurfs-state"
+FORMAT_VERSION = 1
+
+# Parameters of the analysis, stored in the manifest
+_parameters = ['snr', 'window_size', 'f_min', 'f_max', 'skip_similar', 'similar_chanel', 'extend_frequencies',
+               'fap_threshold']
+
+# Columns of the result with uncertainties are stored as nominal value and standard deviation
+_uncertain_columns = ['frequency', 'amp', 'phase']
+_plain_columns = ['snr', 'fap', 'res_noise', 'significant']
+
+# Additional numeric tables of a Smurfs object
+_tables = ['_sliding_result', '_sweep_result']
+
+
+def _json_value(value: Any) -> Any:
+    if hasattr(value, 'item'):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_json_value(i) for i in value]
+    return value
+
+
+def _library_version() -> Optional[str]:
+    try:
+        return version("smurfs")
+    except PackageNotFoundError:
+        return None
+
+
+class _StateWriter:
+    """
+    Writes arrays as .npy files into a folder and keeps track of them for the manifest.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.arrays: Dict[str, str] = {}
+
+    def array(self, name: str, values) -> str:
+        file = f"{name}.npy"
+        np.save(self.path / file, np.ascontiguousarray(values))
+        self.arrays[name] = file
+        return name
+
+    def table(self, name: str, frame: df) -> Dict[str, str]:
+        return {column: self.array(f"{name}.{column}", frame[column].to_numpy()) for column in frame.columns}
+
+
+def dump_state(smurfs, path: Path, spectra: bool = False):
+    """
+    Writes the state of an analysis into a folder: a JSON manifest with the parameters, the label and the
+    combinations, and one .npy file per array (light curves, result columns and other tables). Frequency objects,
+    astropy and lightkurve objects are not stored, which keeps the files small and independent of library versions.
+
+    :param smurfs: *Smurfs* object
+    :param path: Folder, it is created if it doesn't exist
+    :param spectra: If set, the periodogram is stored as well. Otherwise, it is recomputed when accessed
+    """
+    path.mkdir(parents=True, exist_ok=True)
+    writer = _StateWriter(path)
+
+    writer.array("lc.time", smurfs.lc.time.value.astype(np.float64))
+    writer.array("lc.flux", smurfs.lc.flux.value.astype(np.float64))
+    if smurfs.lc.flux_err is not None:
+        writer.array("lc.flux_err", smurfs.lc.flux_err.value.astype(np.float64))
+
+    res_lc = getattr(smurfs, 'res_lc', None)
+    if res_lc is not None:
+        writer.array("res_lc.time", res_lc.time.value.astype(np.float64))
+        writer.array("res_lc.flux", res_lc.flux.value.astype(np.float64))
+
+    if spectra:
+        writer.array("pdg.frequency", smurfs.pdg.frequency.value)
+        writer.array("pdg.power", smurfs.pdg.power.value)
+
+    result = smurfs.result
+    result_columns = {}
+    for column in _uncertain_columns:
+        values = np.array(list(result[column]), dtype=object)
+        result_columns[column] = writer.array(f"result.{column}", unp.nominal_values(values).astype(np.float64))
+        result_columns[f"{column}_err"] = writer.array(f"result.{column}_err",
+                                                       unp.std_devs(values).astype(np.float64))
+    for column in _plain_columns:
+        result_columns[column] = writer.array(f"result.{column}",
+                                              result[column].to_numpy(dtype=bool if column == 'significant' else float))
+
+    tables = {name: writer.table(name.strip('_'), getattr(smurfs, name)) for name in _tables
+              if getattr(smurfs, name, None) is not None}
+
+    stop_reason, nfev = smurfs._run_counters()
+
+    manifest = {
+        "format": FORMAT,
+        "version": FORMAT_VERSION,
+        "smurfs_version": _library_version(),
+        "created": datetime.now().isoformat(),
+        "label": smurfs.label,
+        "target_name": None if smurfs.target_name is None else str(smurfs.target_name),
+        "flux_type": FluxType(smurfs.flux_type).value,
+        "significance": Significance(smurfs.significance).value,
+        "parameters": {name: _json_value(getattr(smurfs, name)) for name in _parameters},
+        "notes": smurfs.notes,
+        "stop_reason": None if stop_reason is None else StopReason(stop_reason).value,
+        "nfev": nfev,
+        "combinations": [{k: _json_value(v) for k, v in row.items()}
+                         for row in smurfs.combinations.to_dict('records')],
+        "result": result_columns,
+        "tables": tables,
+        "arrays": writer.arrays,
+    }
+    (path / "manifest.json").write_text(json.dumps(manifest, indent=1))
+
+
+def load_state(cls, path: Path, quiet_flag: bool = False, printer=None):
+    """
+    Rebuilds a *Smurfs* object from a folder written by *dump_state*. Arrays are memory mapped, the light curves and
+    the periodogram are only created when they are accessed. The flux columns of the light curves are read only views
+    of the memory mapped files, only the time axis is converted into an astropy *Time*.
+
+    :param cls: *Smurfs* class
+    :param path: Folder of the state
+    :param quiet_flag: Quiets the object
+    :param printer: Optional *MPrinter* of the object
+    :return: *Smurfs* object
+    """
+    manifest = json.loads((path / "manifest.json").read_text())
+    if manifest.get("format") != FORMAT:
+        raise ValueError(f"'{path}' doesn't contain a SMURFS state")
+    if manifest["version"] > FORMAT_VERSION:
+        raise ValueError(f"State format version {manifest['version']} is newer than the supported version "
+                         f"{FORMAT_VERSION}, please update SMURFS")
+
+    arrays = manifest["arrays"]
+
+    def array(name: str) -> np.ndarray:
+        return np.load(path / arrays[name], mmap_mode='r')
+
+    def light_curve(prefix: str) -> Callable[[], LightCurve]:
+        def create():
+            lc = LightCurve(time=array(f"{prefix}.time"))
+            for column in ['flux', 'flux_err']:
+                if f"{prefix}.{column}" in arrays:
+                    lc.replace_column(column, u.Quantity(array(f"{prefix}.{column}"), copy=False), copy=False)
+            return lc
+
+        return create
+
+    obj = cls.__new__(cls)
+    obj._quiet = quiet_flag
+    obj._printer = printer
+
+    def periodogram() -> Periodogram:
+        if "pdg.frequency" in arrays:
+            frequency = array("pdg.frequency")
+            return Periodogram(u.Quantity(frequency, 1 / cds.d, copy=False),
+                               u.Quantity(array("pdg.power"), cds.ppm, copy=False),
+                               nyquist=1 / (2 * np.median(np.diff(array("lc.time")))))
+        return Periodogram.from_lightcurve(obj.lc)
+
+    obj._lazy = {"lc": light_curve("lc"), "pdg": periodogram, "original_lc": lambda: obj.lc.share()}
+    if "res_lc.time" in arrays:
+        obj._lazy["res_lc"] = light_curve("res_lc")
+
+    obj.label = manifest["label"]
+    obj.target_name = manifest["target_name"]
+    obj.flux_type = FluxType(manifest["flux_type"])
+    obj.significance = Significance(manifest["significance"])
+    for name, value in manifest["parameters"].items():
+        setattr(obj, name, value)
+    obj._notes = manifest["notes"]
+    # States written before the run counters were stored don't contain them
+    stop_reason = manifest.get("stop_reason")
+    obj._stop_reason = None if stop_reason is None else StopReason(stop_reason)
+    obj._nfev = manifest.get("nfev")
+    obj.validation_page = None
+
+    result = manifest["result"]
+    columns = {column: [ufloat(v, e) for v, e in zip(array(result[column]), array(result[f"{column}_err"]))]
+               for column in _uncertain_columns}
+    columns.update({column: array(result[column]) for column in _plain_columns})
+    n = len(columns['snr'])
+    obj._result = df({'f_obj': [None] * n, **columns},
+                     columns=['f_obj', 'frequency', 'amp', 'phase', 'snr', 'fap', 'res_noise', 'significant'])
+
+    obj._combinations = df(manifest["combinations"], columns=combination_columns)
+    obj._combination_finder = CombinationFinder()
+    obj._ff = None
+    obj._spectral_window = None
+
+    for name in _tables:
+        table = manifest["tables"].get(name.strip('_'))
+        setattr(obj, name, None if table is None else
+                df({column: array(file) for column, file in table.items()}))
+
+    return obj
+
+
+def is_state(path: Path) -> bool:
+    """
+    Returns True if *path* is a folder written by *dump_state*.
+    """
+    return (path / "manifest.json").is_file()
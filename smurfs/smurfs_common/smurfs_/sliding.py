@@ -0,0 +1,196 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Tuple, Dict, Any, Iterator
+
+import numpy as np
+from pandas import DataFrame as df
+from scipy.optimize import linear_sum_assignment
+from uncertainties import unumpy as unp
+
+from smurfs.smurfs_common.signal.lightcurve import LightCurve
+from smurfs.smurfs_common.support.mprint import mprint, info, log, warn
+
+sliding_columns = ['track', 'segment', 'time', 'frequency', 'frequency_err', 'amp', 'amp_err', 'phase', 'phase_err',
+                   'snr']
+
+
+def segment_bounds(time: np.ndarray, window: float, step: float, min_points: int = 100) -> List[Tuple[int, int, float]]:
+    """
+    Computes the segments of a light curve for a sliding window analysis. Segments that contain less than
+    *min_points* data points (f.e. because they fall into a gap) are ignored.
+
+    :param time: Sorted time axis, days
+    :param window: Length of a segment, days
+    :param step: Step between the start of two consecutive segments, days
+    :param min_points: Minimum number of points in a segment
+    :return: List of tuples, consisting of start index, stop index and mid time of a segment
+    """
+    if window <= 0 or step <= 0:
+        raise ValueError("window and step need to be larger than 0")
+
+    if time[-1] - time[0] < window:
+        raise ValueError(f"Window of {window} days is longer than the observation length of "
+                         f"{'%.2f' % (time[-1] - time[0])} days")
+
+    starts = np.arange(time[0], time[-1] - window + step / 2, step)
+    lower = np.searchsorted(time, starts, side='left')
+    upper = np.searchsorted(time, starts + window, side='right')
+
+    return [(int(lo), int(up), float(start + window / 2)) for lo, up, start in zip(lower, upper, starts)
+            if up - lo >= min_points]
+
+
+@contextmanager
+def share_light_curve(lc: LightCurve) -> Iterator[Tuple[str, Tuple[int, int]]]:
+    """
+    Copies time, flux and (if available) flux error of a light curve into shared memory, so that worker processes
+    can read it without pickling. The memory is released when the context is left.
+
+    :param lc: Light curve
+    :return: Name and shape of the shared memory block, see *read_shared_light_curve*
+    """
+    rows = [lc.time.value, lc.flux.value]
+    if lc.flux_err is not None and np.all(np.isfinite(lc.flux_err.value)):
+        rows.append(lc.flux_err.value)
+
+    shm = SharedMemory(create=True, size=len(rows) * len(rows[0]) * 8)
+    try:
+        data = np.ndarray((len(rows), len(rows[0])), dtype=np.float64, buffer=shm.buf)
+        data[:] = rows
+        shape = data.shape
+        del data
+        yield shm.name, shape
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def read_shared_light_curve(shm_name: str, shape: Tuple[int, int], start: int = 0, stop: int = None) -> LightCurve:
+    """
+    Reads (a segment of) a light curve shared with *share_light_curve*. Only the segment is copied.
+    """
+    shm = SharedMemory(name=shm_name)
+    try:
+        data = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        segment = data[:, start:stop].copy()
+        del data
+    finally:
+        shm.close()
+
+    if shape[0] == 3:
+        return LightCurve(time=segment[0], flux=segment[1], flux_err=segment[2])
+    return LightCurve(time=segment[0], flux=segment[1])
+
+
+def _run_segment(shm_name: str, shape: Tuple[int, int], start: int, stop: int, t_mid: float,
+                 run_kwargs: Dict[str, Any]) -> np.ndarray:
+    """
+    Runs the frequency extraction on a single segment. The base light curve is read from shared memory, only the
+    segment itself is copied into the worker process.
+
+    :return: Array of shape (n, 7), consisting of frequency, amplitude, phase (each followed by its uncertainty) and snr
+    """
+    from smurfs.smurfs_common.signal.frequency_finder import reference_epoch
+    from smurfs.smurfs_common.smurfs_.smurfs import Smurfs
+
+    lc = read_shared_light_curve(shm_name, shape, start, stop)
+    s = Smurfs.from_lightcurve(lc, label=f"Segment {'%.2f' % t_mid}", quiet_flag=True)
+    s.run(**run_kwargs)
+
+    frame = s.result[s.result.significant == True]
+    if len(frame) == 0:
+        return np.empty((0, 7))
+
+    f = frame.frequency.tolist()
+    amp = frame.amp.tolist()
+    phase = frame.phase.tolist()
+    # Phases are shifted to the middle of the segment, so they are comparable between segments. The phase uncertainty
+    # holds at the reference epoch of the fit, the frequency uncertainty only propagates over the distance to it
+    phase_mid = (unp.nominal_values(phase) + unp.nominal_values(f) * t_mid) % 1
+    epoch = reference_epoch(lc.time.value) if run_kwargs.get('center_time', True) else 0.
+    phase_mid_err = np.sqrt(unp.std_devs(phase) ** 2 + ((t_mid - epoch) * unp.std_devs(f)) ** 2)
+
+    return np.column_stack((unp.nominal_values(f), unp.std_devs(f), unp.nominal_values(amp), unp.std_devs(amp),
+                            phase_mid, phase_mid_err, frame.snr.to_numpy(dtype=float)))
+
+
+def match_tracks(segments: List[np.ndarray], tolerance: float) -> np.ndarray:
+    """
+    Matches the frequencies of consecutive segments into tracks. Every segment is assigned to the currently known
+    tracks by solving the assignment problem on the frequency distance to the last frequency of a track. Frequencies
+    further away than *tolerance* from every track start a new track.
+
+    :param segments: List of arrays, where the first column is the frequency of the segment
+    :param tolerance: Maximum frequency difference between two segments of the same track
+    :return: Track id for every row of the stacked segments
+    """
+    track_f = np.empty(0)
+    ids = []
+    for seg in segments:
+        seg_ids = np.full(len(seg), -1, dtype=int)
+        if len(seg) > 0 and len(track_f) > 0:
+            cost = np.abs(seg[:, 0][:, None] - track_f[None, :])
+            rows, cols = linear_sum_assignment(cost)
+            mask = cost[rows, cols] <= tolerance
+            seg_ids[rows[mask]] = cols[mask]
+
+        new = seg_ids == -1
+        seg_ids[new] = np.arange(len(track_f), len(track_f) + np.count_nonzero(new))
+        track_f = np.concatenate((track_f, np.empty(np.count_nonzero(new))))
+        track_f[seg_ids] = seg[:, 0]
+        ids.append(seg_ids)
+
+    return np.concatenate(ids) if len(ids) > 0 else np.empty(0, dtype=int)
+
+
+def run_sliding(lc: LightCurve, window: float, step: float, workers: int = None, tolerance: float = None,
+                min_points: int = 100, **run_kwargs) -> df:
+    """
+    Runs the frequency extraction on overlapping segments of a light curve in a process pool and matches the
+    found frequencies into tracks. See *Smurfs.run_sliding*.
+    """
+    time = np.ascontiguousarray(lc.time.value, dtype=np.float64)
+
+    segments = segment_bounds(time, window, step, min_points)
+    if len(segments) == 0:
+        raise ValueError(f"No segment with at least {min_points} points for a window of {window} days")
+
+    tolerance = 1.5 / window if tolerance is None else tolerance
+    workers = os.cpu_count() if workers is None else workers
+
+    mprint(f"Running sliding analysis on {len(segments)} segments of {window} days with {workers} workers", info)
+
+    with share_light_curve(lc) as (shm_name, shape), ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_segment, shm_name, shape, start, stop, t_mid, run_kwargs)
+                   for start, stop, t_mid in segments]
+        results = []
+        for i, ((start, stop, t_mid), future) in enumerate(zip(segments, futures)):
+            results.append(future.result())
+            mprint(f"Segment {i + 1}/{len(segments)} at {'%.2f' % t_mid}: {len(results[-1])} frequencies", log)
+
+    track_ids = match_tracks(results, tolerance)
+    stacked = np.concatenate(results) if len(results) > 0 else np.empty((0, 7))
+    if len(stacked) == 0:
+        mprint("No significant frequencies found in any segment", warn)
+
+    segment_ids = np.concatenate([np.full(len(r), i) for i, r in enumerate(results)])
+    t_mids = np.array([t_mid for _, _, t_mid in segments])[segment_ids]
+
+    frame = df({
+        'track': track_ids,
+        'segment': segment_ids,
+        'time': t_mids,
+        'frequency': stacked[:, 0],
+        'frequency_err': stacked[:, 1],
+        'amp': stacked[:, 2],
+        'amp_err': stacked[:, 3],
+        'phase': stacked[:, 4],
+        'phase_err': stacked[:, 5],
+        'snr': stacked[:, 6],
+    }, columns=sliding_columns)
+
+    frame = frame.sort_values(['track', 'segment']).reset_index(drop=True)
+    mprint(f"Found {frame.track.nunique()} tracks in {len(segments)} segments", info)
+    return frame
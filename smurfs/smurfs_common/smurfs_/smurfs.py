@@ -1,37 +1,43 @@
-import os
 import pickle
-from enum import Enum
+from contextlib import contextmanager
+from functools import wraps
 from pathlib import Path
-from typing import Union, Tuple, Callable
+from typing import Union, Tuple, Callable, Optional, Sequence
 
-import matplotlib
 import numpy as np
 import pandas as pd
-from matplotlib import pyplot as plt
 from pandas import DataFrame as df
 
-from smurfs.smurfs_common.preprocessing.dataloader import load_data, FluxType, Mission
-from smurfs.smurfs_common.signal.frequency_finder import FFinder
+from smurfs.smurfs_common.preprocessing.dataloader import load_data
+from smurfs.smurfs_common.signal.bootstrap import estimate_uncertainties, UncertaintyMethod
+from smurfs.smurfs_common.signal.combinations import CombinationFinder, combination_columns
+from smurfs.smurfs_common.signal.fit_cache import FitCache
+from smurfs.smurfs_common.signal.frequency_finder import FFinder, phase_at_epoch, fit_columns
 from smurfs.smurfs_common.signal.lightcurve import LightCurve
 from smurfs.smurfs_common.signal.periodogram import Periodogram
-from smurfs.smurfs_common.support.mprint import mprint, info, ctext, error, log
+from smurfs.smurfs_common.smurfs_.catalog import FrequencyCatalog
+from smurfs.smurfs_common.smurfs_.serialization import dump_state, load_state, is_state
+from smurfs.smurfs_common.smurfs_.sliding import run_sliding
+from smurfs.smurfs_common.smurfs_.sweep import run_sweep
+from smurfs.smurfs_common.support.mprint import mprint, info, ctext, error, log, MPrinter
+from smurfs.smurfs_common.support.options import FluxType, Mission, ImproveFitMode, FitMethod, Significance, \
+    FapMethod, StopReason
 from smurfs.smurfs_common.support.settings import Settings
 
-on_rtd = os.environ.get('READTHEDOCS') == 'True'
-if not on_rtd:
-    from pyfcomb import get_combinations
 from uncertainties import unumpy as unp
 
 
-class ImproveFitMode(str, Enum):
-    ALL = "all"
-    END = "end"
-    NONE = "none"
+def _in_context(method):
+    """
+    Runs a method of *Smurfs* with the settings and printer of the instance, see *Smurfs._context*.
+    """
 
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._context():
+            return method(self, *args, **kwargs)
 
-class FitMethod(str, Enum):
-    SCIPY = "scipy"
-    LMFIT = "lmfit"
+    return wrapper
 
 
 class Smurfs:
@@ -49,7 +55,7 @@ class Smurfs:
     - Use the 'result' property
 
     The class also has other interesting properties like 'combinations' (calculates all possible combinations
-    for the frequencies from the results, uses [pyfcomb](https://github.com/MarcoMuellner/pyfcomb) ), 'nyquist' (
+    for the frequencies from the results, see *CombinationFinder*), 'nyquist' (
     the nyquist frequency of the provided data) and more.
 
     You can also plot the results using the 'plot_lc' or 'plot_pdg' methods.
@@ -66,31 +72,127 @@ class Smurfs:
     :param flux_type: If you supply a target name that has been observed by TESS SC mode, you can choose either 'PCDSAP' or 'SAP' flux for that target.
     :param label: Optional label for the star. Results will be saved under this name
     :param quiet_flag: Quiets Smurfs (no more print message will be piped to stdout)
+    :param printer: Optional *MPrinter* that receives the messages of this instance, instead of the process wide one
+
+    Thread safety: The quiet flag and the printer are applied per instance and per thread, and plots are drawn on
+    *Figure* objects instead of the global pyplot state. Different *Smurfs* instances can therefore be used
+    concurrently in threads, f.e. with a *ThreadPoolExecutor*, where numpy and scipy release the GIL for most of
+    the work. A single instance must not be used by several threads at the same time.
     """
 
     def __init__(self, target: str, flux_type: FluxType = FluxType.PDCSAP, label: str = None,
                  quiet_flag: bool = False, mission: Mission = Mission.TESS, sigma_clip: float = 4, iters: int = 1,
-                 do_pca: bool = False, do_psf: bool = False, apply_file_correction: bool = False):
+                 do_pca: bool = False, do_psf: bool = False, apply_file_correction: bool = False,
+                 printer: Optional[MPrinter] = None):
+
+        self._quiet = quiet_flag
+        self._printer = printer
+
+        with self._context():
+            lc = load_data(target, flux_type,sigma_clip, iters, mission)
+            self._setup(lc, target, flux_type, label)
+
+    @classmethod
+    def from_lightcurve(cls, lc: LightCurve, label: str = None, quiet_flag: bool = False,
+                        printer: Optional[MPrinter] = None, periodogram: Optional[Periodogram] = None) -> 'Smurfs':
+        """
+        Creates a *Smurfs* object from an already loaded light curve, skipping the download and file reading steps.
+        The light curve is expected to be in magnitudes, normalized around zero.
+
+        :param lc: Light curve that is analysed
+        :param label: Optional label for the star. Results will be saved under this name. The light curve has no target,
+                      so *target_name* is None
+        :param quiet_flag: Quiets Smurfs (no more print message will be piped to stdout)
+        :param printer: Optional *MPrinter* that receives the messages of this instance
+        :param periodogram: Optional, already computed periodogram of *lc* over the full frequency range, f.e. from a cache
+        :return: *Smurfs* object
+        """
+        obj = cls.__new__(cls)
+        obj._quiet = quiet_flag
+        obj._printer = printer
 
-        Settings.quiet = quiet_flag
+        with obj._context():
+            obj._setup(lc if isinstance(lc, LightCurve) else LightCurve(lc), None, FluxType.PDCSAP, label,
+                       periodogram)
+        return obj
 
-        self.lc = load_data(target, flux_type,sigma_clip, iters, mission)
+    @contextmanager
+    def _context(self):
+        """
+        Applies the quiet flag and the printer of this instance to the current thread.
+        """
+        with Settings.context(quiet=getattr(self, '_quiet', None)), MPrinter.context(getattr(self, '_printer', None)):
+            yield
+
+    @classmethod
+    def load(cls, path: Path, quiet_flag: bool = False, printer: Optional[MPrinter] = None) -> 'Smurfs':
+        """
+        Loads an analysis stored with *save(store_obj=True)*. Arrays are memory mapped and the light curves and the
+        periodogram are only created when they are accessed. The fluxes of the light curves are read only views of the
+        memory mapped files. The *Frequency* objects of the result are not stored,
+        so *improve_result* needs a new *run*.
+
+        :param path: Result folder written by *save*, its state folder, or an 'obj.smurfs' file of older versions
+        :param quiet_flag: Quiets Smurfs (no more print message will be piped to stdout)
+        :param printer: Optional *MPrinter* that receives the messages of this instance
+        :return: *Smurfs* object
+        """
+        path = Path(path)
+        for candidate in [path, path / "state", path / "data" / "state"]:
+            if is_state(candidate):
+                return load_state(cls, candidate, quiet_flag, printer)
+
+        legacy = path if path.is_file() else path / "data" / "obj.smurfs"
+        if not legacy.is_file():
+            raise IOError(ctext(f"'{path}' doesn't contain a stored SMURFS object!", error))
+
+        with legacy.open("rb") as f:
+            obj = pickle.load(f)
+        obj._quiet = quiet_flag
+        obj._printer = printer
+        return obj
+
+    def __getattr__(self, name):
+        # Loaded objects create their light curves and periodogram on first access, see *load*
+        lazy = self.__dict__.get('_lazy')
+        if lazy is None or name not in lazy:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        value = lazy.pop(name)()
+        setattr(self, name, value)
+        return value
+
+    def __getstate__(self):
+        # Printers can hold queues or open files, pickled objects use the process wide printer
+        for name in list(self.__dict__.get('_lazy', {})):
+            getattr(self, name)
+        state = self.__dict__.copy()
+        state['_printer'] = None
+        state.pop('_lazy', None)
+        return state
+
+    def _setup(self, lc: LightCurve, target: str, flux_type: FluxType, label: str = None,
+               periodogram: Optional[Periodogram] = None):
+        """
+        Sets up the state of the object for a given light curve.
+        """
+        self.lc = lc
 
         if label is None:
             self.label = 'LC'
         else:
             self.label = label
 
-        self.pdg: Periodogram = Periodogram.from_lightcurve(self.lc)
-        self._result = df([], columns=['f_obj', 'frequency', 'amp', 'phase', 'snr', 'res_noise', 'significant'])
-        self._combinations = df([],
-                                columns=["Name", "ID", "Frequency", "Amplitude", "Solution", "Residual", "Independent",
-                                         "Other_Solutions"])
+        self.pdg: Periodogram = Periodogram.from_lightcurve(self.lc) if periodogram is None else periodogram
+        self._result = df([], columns=['f_obj', 'frequency', 'amp', 'phase', 'snr', 'fap', 'res_noise', 'significant'])
+        self._combinations = df([], columns=combination_columns)
+        self._combination_finder = CombinationFinder()
         self._ff: FFinder | None = None
         self._spectral_window = None
+        self._sliding_result = None
+        self._sweep_result = None
 
         # Original light curve to perform some processsing on that
-        self.original_lc = self.lc.copy()
+        self.original_lc = self.lc.share()
 
         # Target settings
         self.target_name = target
@@ -104,6 +206,8 @@ class Smurfs:
         self.skip_similar = None
         self.similar_chanel = None
         self.extend_frequencies = np.nan
+        self.significance = Significance.SNR
+        self.fap_threshold = np.nan
         self._notes = None
         self.validation_page = None
 
@@ -124,7 +228,8 @@ class Smurfs:
         - Independent: Flag if the frequency is independent according to the solver
         - Other_solutions: All other possible solutions for this frequency
 
-        Will be populated after *run* was called.
+        Will be populated after *run* was called. The search is cached between *run* and *improve_result*, so only
+        frequencies that changed are searched again.
         """
         return self._combinations
 
@@ -138,11 +243,36 @@ class Smurfs:
         - amp
         - phase
         - snr
+        - fap: False alarm probability of the peak
         - res_noise: Residual noise
         - significant: Flag that shows if a frequency is significant or not
+
+        Phases are relative to epoch 0 of the time axis, see *result_at_epoch*.
         """
         return self._result
 
+    def result_at_epoch(self, epoch: float) -> df:
+        """
+        Returns a copy of the result, where the phases are relative to *epoch* instead of epoch 0 of the time axis,
+        i.e. every sine is amp * sin(2 pi (f (t - epoch) + phase)).
+
+        :param epoch: Reference epoch, in the units of the time axis (days)
+        :return: Result dataframe, see *result*
+        """
+        frame = self._result.copy()
+        frame['phase'] = [phase_at_epoch(phase, f, epoch) for phase, f in zip(frame.phase, frame.frequency)]
+        return frame
+
+    @property
+    def fit_diagnostics(self) -> df:
+        """
+        Gives a pandas dataframe with the fitter and the number of function evaluations used to extract every
+        frequency. Fitters are 'linear' (closed form), 'scipy', 'lmfit', 'batch' (joint fit of a batch) and 'custom'.
+        """
+        if getattr(self, '_ff', None) is None:
+            return df([], columns=fit_columns)
+        return df(self._ff.fits, columns=fit_columns)
+
     @property
     def ff(self):
         """
@@ -163,9 +293,12 @@ class Smurfs:
                    'Skip similar frequency regions',
                    'Chancel run after 10 similar frequencies',
                    'Ignore unsignificant frequencies number',
+                   'Significance criterion',
+                   'False alarm probability threshold',
                    ]
         return df([[self.snr, self.window_size, self.f_min, self.f_max, self.skip_similar, self.similar_chanel
-                       , self.extend_frequencies]], columns=columns)
+                       , self.extend_frequencies, Significance(self.significance).value, self.fap_threshold]],
+                  columns=columns)
 
     @property
     def statistics(self):
@@ -174,8 +307,23 @@ class Smurfs:
         """
         columns = ['Duty cycle',
                    'Nyquist frequency',
-                   'Total number of found frequencies']
-        return df([[self.duty_cycle, self.nyquist, len(self._result)]], columns=columns)
+                   'Total number of found frequencies',
+                   'Function evaluations',
+                   'Stop reason']
+        stop_reason, nfev = self._run_counters()
+        nfev = sum(nfev.values()) if nfev is not None else np.nan
+        stop_reason = stop_reason.value if stop_reason is not None else None
+        return df([[self.duty_cycle, self.nyquist, len(self._result), nfev, stop_reason]], columns=columns)
+
+    def _run_counters(self) -> Tuple[Optional[StopReason], Optional[dict]]:
+        """
+        Returns the stop reason and the function evaluations of the last run, either from the *FFinder* object or,
+        for a loaded state, from the manifest.
+        """
+        ff = getattr(self, '_ff', None)
+        if ff is not None:
+            return ff.stop_reason, dict(ff.nfev)
+        return getattr(self, '_stop_reason', None), getattr(self, '_nfev', None)
 
     @property
     def obs_length(self) -> float:
@@ -216,8 +364,7 @@ class Smurfs:
         Computes the spectral window of a given dataset by transforming the light curve with constant flux.
         """
         if self._spectral_window is None:
-            spec_lc = self.lc.copy()
-            spec_lc.flux = np.zeros(len(self.lc.flux)) + 1
+            spec_lc = self.lc.share(flux=np.ones(len(self.lc.flux)))
             self._spectral_window = Periodogram.from_lightcurve(spec_lc)
         return self._spectral_window
 
@@ -235,11 +382,17 @@ class Smurfs:
     def notes(self, value):
         self._notes = value
 
+    @_in_context
     def run(self, snr: float = 4, window_size: float = 2, f_min: float = None, f_max: float = None,
             skip_similar: bool = False, similar_chancel: bool = True, extend_frequencies: int = 0,
             improve_fit: bool = True,
             mode: FitMethod = FitMethod.LMFIT, frequency_detection: float | None = None,
-            fit_fun: Union[Tuple[Callable, Callable], Callable, None] = None):
+            fit_fun: Union[Tuple[Callable, Callable], Callable, None] = None,
+            significance: Significance = Significance.SNR, fap_threshold: float = 0.01,
+            fap_method: FapMethod = FapMethod.BALUEV, fap_bootstraps: int = 1000, batch_size: int = 1,
+            batch_separation: float = 2.5, progress: Callable = None, center_time: bool = True,
+            max_frequencies: int = None, max_wall_time: float = None, max_memory: float = None,
+            fit_time: float = None, fit_cache: Optional[FitCache] = None):
         """
         Starts the frequency analysis by instantiating a *FrequencyFinder* object and running it. After finishing the
         run, combinations are computed. See *FrequencyFinder.run* for an explanation of the algorithm.
@@ -252,9 +405,22 @@ class Smurfs:
         :param similar_chancel: Flat that chancels the run after 10 frequencies found that are too similar.
         :param extend_frequencies: Extends the analysis by this number of insignificant frequencies.
         :param improve_fit: If this flag is set, all combined frequencies are re-fitted after every new frequency was found
-        :param mode: Fitting mode. You can choose between 'scipy' and 'lmfit'
+        :param mode: Fitting mode. You can choose between 'scipy', 'lmfit' and 'auto', which uses the cheapest fitter that converges (see *fit_diagnostics*)
         :param frequency_detection: If this value is not None and the ratio between the amplitude of the found frequency and the amplitude of the frequency in the original spectrum exceeds this value, this frequency is ignored.
         :param fit_fun: You can pass a function to smurfs to replace its default fit function. SMURFS will pass this function a kwargs object.
+        :param significance: Criterion for the significance of a frequency. 'snr' compares the signal to noise ratio with *snr*, 'fap' compares the false alarm probability of the peak with *fap_threshold*.
+        :param fap_threshold: Frequencies with a false alarm probability below this value are significant, if significance is 'fap'.
+        :param fap_method: Method for the false alarm probability. 'baluev' is an analytic approximation, 'bootstrap' uses *fap_bootstraps* periodograms of permuted fluxes.
+        :param fap_bootstraps: Number of periodograms used for the 'bootstrap' method.
+        :param batch_size: Maximum number of mutually resolved, significant peaks that are removed and fitted jointly per iteration. Batches are fitted jointly with the fitter given by *mode*, and every peak of a batch is checked again for significance after the stronger ones are removed.
+        :param batch_separation: Minimum separation of peaks in a batch, in units of the frequency resolution 1/T.
+        :param progress: Optional callback that receives the residual periodogram and the frequencies found so far in every iteration, see *FFinder.run*.
+        :param center_time: Performs all fits relative to the middle of the light curve, which speeds up their convergence. Phases of the result are always relative to epoch 0, see *result_at_epoch*.
+        :param max_frequencies: Stops the run after this number of frequencies.
+        :param max_wall_time: Stops the run after this duration in seconds.
+        :param max_memory: Stops the run if the process uses more than this amount of memory in MB.
+        :param fit_time: Time budget of every fit in seconds. Stalled fits fall back to a closed form fit (or are skipped when improving the fit).
+        :param fit_cache: Optional *FitCache*. Fits that were done before, f.e. by a run with other stopping criteria, are read from it. It is also used by *improve_result*.
         """
 
         if fit_fun is not None and not (callable(fit_fun) or (isinstance(fit_fun, tuple) and len(fit_fun) == 2)):
@@ -267,22 +433,104 @@ class Smurfs:
         self.skip_similar = skip_similar
         self.similar_chanel = similar_chancel
         self.extend_frequencies = 0
+        self.significance = significance
+        self.fap_threshold = fap_threshold if significance == Significance.FAP else np.nan
 
         self._ff = FFinder(self, f_min, f_max)
         self._result = self._ff.run(snr=snr, window_size=window_size, skip_similar=skip_similar,
                                     similar_chancel=similar_chancel
                                     , extend_frequencies=extend_frequencies, improve_fit=improve_fit, mode=mode
-                                    , frequency_detection=frequency_detection, fit_fun=fit_fun)
-        self._combinations = get_combinations((self._result[self._result.significant == True].index + 1).tolist(),
-                                              unp.nominal_values(
-                                                  self._result[self._result.significant == True].frequency.tolist())
-                                              , unp.nominal_values(
-                self._result[self._result.significant == True].amp.tolist()))
+                                    , frequency_detection=frequency_detection, fit_fun=fit_fun
+                                    , significance=significance, fap_threshold=fap_threshold, fap_method=fap_method
+                                    , fap_bootstraps=fap_bootstraps, batch_size=batch_size
+                                    , batch_separation=batch_separation, progress=progress
+                                    , center_time=center_time, max_frequencies=max_frequencies
+                                    , max_wall_time=max_wall_time, max_memory=max_memory, fit_time=fit_time
+                                    , fit_cache=fit_cache)
+        self._combinations = self._update_combinations()
 
         self.res_lc = self._ff.res_lc
 
+        if self._ff.stop_reason is not None:
+            mprint(f"{self.label} Stop reason: {self._ff.stop_reason.value}", log)
         mprint(f"{self.label} Analysis done!", info)
 
+    @_in_context
+    def run_sliding(self, window: float, step: float, workers: int = None, tolerance: float = None,
+                    min_points: int = 100, **kwargs) -> df:
+        """
+        Runs the frequency analysis on overlapping segments of the light curve, to track amplitude, phase and
+        frequency modulation over time. Every segment is analysed in a separate process, where the light curve is
+        shared between the processes through shared memory. The significant frequencies of consecutive segments are
+        then matched into tracks.
+
+        The result is a tidy dataframe, with one row per frequency and segment, consisting of the following columns:
+
+        - track: ID of the track the frequency belongs to
+        - segment: ID of the segment
+        - time: Mid time of the segment
+        - frequency, frequency_err
+        - amp, amp_err
+        - phase, phase_err: Phase, relative to the mid time of the segment
+        - snr
+
+        :param window: Length of a segment, days
+        :param step: Step between the start of two consecutive segments, days
+        :param workers: Number of processes used. If None, the number of CPUs is used
+        :param tolerance: Maximum frequency difference between two segments of the same track. Defaults to 1.5/window
+        :param min_points: Segments with less data points are ignored
+        :param kwargs: Parameters passed to *run* for every segment
+        :return: Dataframe of all tracks
+        """
+        self._sliding_result = run_sliding(self.lc, window, step, workers=workers, tolerance=tolerance,
+                                           min_points=min_points, **kwargs)
+        return self._sliding_result
+
+    @property
+    def sliding_result(self) -> df:
+        """
+        Gives the tracks of the last call to *run_sliding*. None if *run_sliding* was not called.
+        """
+        return self._sliding_result
+
+    @_in_context
+    def run_sweep(self, snr: Sequence[float], window_size: Union[Sequence[float], float] = 2,
+                  extend_frequencies: Union[Sequence[int], int] = 0, workers: int = None, **kwargs) -> df:
+        """
+        Runs the frequency analysis for a grid of signal to noise ratios, window sizes and numbers of extended
+        frequencies. The pre-whitening order doesn't depend on the SNR threshold and the number of extended
+        frequencies, they only decide when the run stops. Therefore only one extraction per window size is done,
+        with the lowest threshold and the most extended frequencies, and the results of all stricter settings are
+        derived from it. The extractions for different window sizes run in parallel processes.
+
+        The result is a tidy dataframe, with one row per setting and frequency, consisting of the following columns:
+
+        - window_size, snr_threshold, extend_frequencies: Setting of the row
+        - f_nr: Number of the frequency, in the order of extraction
+        - frequency, frequency_err
+        - amp, amp_err
+        - phase, phase_err
+        - snr, fap, res_noise
+        - significant: Significance of the frequency for the SNR threshold of the row
+
+        :param snr: Signal to noise ratios
+        :param window_size: Window sizes
+        :param extend_frequencies: Numbers of extended frequencies
+        :param workers: Number of processes used. If None, the number of CPUs is used
+        :param kwargs: Further parameters passed to *run*. *batch_size*, *frequency_detection* and *fit_fun* are not supported
+        :return: Dataframe of all settings
+        """
+        self._sweep_result = run_sweep(self.lc, snr, window_size, extend_frequencies, workers=workers, **kwargs)
+        return self._sweep_result
+
+    @property
+    def sweep_result(self) -> df:
+        """
+        Gives the result of the last call to *run_sweep*. None if *run_sweep* was not called.
+        """
+        return self._sweep_result
+
+    @_in_context
     def improve_result(self, mode: FitMethod = FitMethod.LMFIT):
         """
         Fits the combined found frequencies to the original light curve, hence improving the fit of the total model.
@@ -291,19 +539,68 @@ class Smurfs:
             raise AttributeError("You need to run the analysis before you can improve the fit.")
 
         self._result = self._ff.improve_result(mode)
-        self._combinations = get_combinations((self._result[self._result.significant == True].index + 1).tolist(),
-                                              unp.nominal_values(
-                                                  self._result[self._result.significant == True].frequency.tolist())
-                                              , unp.nominal_values(
-                self._result[self._result.significant == True].amp.tolist()))
+        self._combinations = self._update_combinations()
         self.res_lc = self._ff.res_lc
 
-    def save(self, path: Path, store_obj=False):
+    @_in_context
+    def estimate_uncertainties(self, n_samples: int = 100, workers: int = None,
+                               method: UncertaintyMethod = UncertaintyMethod.BOOTSTRAP, seed: int = None) -> df:
+        """
+        Computes empirical uncertainties for the significant frequencies found by *run*. The final multi-sine model
+        is refitted to *n_samples* realisations of the light curve, either by resampling the residuals of the model
+        (bootstrap) or by adding gaussian noise to it (montecarlo). The fits are distributed on a process pool and
+        are warm-started at the current result.
+
+        The uncertainties are added to the result as the columns 'frequency_bs_err', 'amp_bs_err' and
+        'phase_bs_err'. Insignificant frequencies are not part of the model and get nan.
+
+        :param n_samples: Number of samples
+        :param workers: Number of processes used. If None, the number of CPUs is used
+        :param method: 'bootstrap' or 'montecarlo'
+        :param seed: Seed of the random number generator, makes the result reproducible
+        :return: The result dataframe
+        """
+        if self._ff is None:
+            raise AttributeError("You need to run the analysis before you can estimate uncertainties.")
+
+        mask = (self._result.significant == True).to_numpy()
+        if not np.any(mask):
+            raise ValueError("No significant frequencies found, can't estimate uncertainties.")
+
+        frame = self._result[mask]
+        params = np.column_stack((unp.nominal_values(frame.amp.tolist()), unp.nominal_values(frame.frequency.tolist()),
+                                  unp.nominal_values(frame.phase.tolist()))).flatten()
+        flux_err = self.lc.flux_err.value if self.lc.flux_err is not None else None
+
+        sigma_amp, sigma_f, sigma_phi = estimate_uncertainties(self.lc.time.value, self.lc.flux.value, params, flux_err,
+                                                               n_samples=n_samples, workers=workers, method=method,
+                                                               seed=seed)
+
+        for column, values in [('frequency_bs_err', sigma_f), ('amp_bs_err', sigma_amp),
+                               ('phase_bs_err', sigma_phi)]:
+            self._result[column] = np.nan
+            self._result.loc[mask, column] = values
+
+        return self._result
+
+    def _update_combinations(self) -> df:
+        """
+        Searches combinations of the significant frequencies in the result.
+        """
+        frame = self._result[self._result.significant == True]
+        return self._combination_finder.update((frame.index + 1).tolist(), unp.nominal_values(frame.frequency.tolist()),
+                                               unp.nominal_values(frame.amp.tolist()))
+
+    @_in_context
+    def save(self, path: Path, store_obj=False, catalog: Optional[FrequencyCatalog] = None,
+             store_spectra: bool = False):
         """
         Saves the result of the analysis to a given folder.
 
         :param path: Path where the result is stored
-        :param store_obj: If this is set, the Smurfs object is stored, and can be later reloaded.
+        :param store_obj: If this is set, the state of the analysis is stored, and can be later reloaded with *load*.
+        :param catalog: Optional *FrequencyCatalog*, the result is additionally added to it
+        :param store_spectra: If this is set together with *store_obj*, the periodogram is stored as well, instead of being recomputed when loaded
         """
         if not path.exists():
             raise IOError(ctext(f"'{path}' does not exist!", error))
@@ -354,10 +651,13 @@ class Smurfs:
             (data_path / "notes.txt").write_text(self._notes)
 
         if store_obj:
-            with (data_path / "obj.smurfs").open("wb") as f:
-                pickle.dump(self, f)
+            dump_state(self, data_path / "state", store_spectra)
 
         # Save plots
+        # Figures are created without pyplot, which keeps global state and is not thread safe
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_pdf import PdfPages
+
         images = [(self.lc, "LC.pdf"),
                   (self.pdg, "PS.pdf")]
 
@@ -367,20 +667,22 @@ class Smurfs:
                        (self._ff, "PS_result.pdf")]
 
         for obj, name in images:
-            fig, ax = plt.subplots(figsize=(16, 10))
+            fig = Figure(figsize=(16, 10))
+            ax = fig.add_subplot()
             if isinstance(obj, LightCurve):
                 obj.scatter(ax=ax)
             else:
                 obj.plot(ax=ax, markersize=2)
-            plt.tight_layout()
+            fig.tight_layout()
             fig.savefig(plots_path / name)
-            plt.close(fig)
 
         if self.validation_page is not None:
             pdf_path = plots_path / "Validation_page.pdf"
-            with matplotlib.backends.backend_pdf.PdfPages(pdf_path) as pdf:
+            with PdfPages(pdf_path) as pdf:
                 for fig in self.validation_page:
                     pdf.savefig(fig)
-                    plt.close(fig)
+
+        if catalog is not None:
+            catalog.add(self, proj_path)
 
         mprint(f"{self.label} Data saved!", info)
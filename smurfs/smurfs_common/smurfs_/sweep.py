@@ -0,0 +1,115 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from pandas import DataFrame as df
+from uncertainties import unumpy as unp
+
+from smurfs.smurfs_common.signal.lightcurve import LightCurve
+from smurfs.smurfs_common.smurfs_.sliding import share_light_curve, read_shared_light_curve
+from smurfs.smurfs_common.support.mprint import mprint, info, log
+from smurfs.smurfs_common.support.options import Significance
+
+sweep_columns = ['window_size', 'snr_threshold', 'extend_frequencies', 'f_nr', 'frequency', 'frequency_err', 'amp',
+                 'amp_err', 'phase', 'phase_err', 'snr', 'fap', 'res_noise', 'significant']
+
+
+def trajectory_length(snr: np.ndarray, threshold: float, extend_frequencies: int) -> int:
+    """
+    Applies the stopping rule of *FFinder.run* to the SNRs of a recorded extraction. A stricter threshold (or fewer
+    extended frequencies) always stops at the same step or earlier, so the result of a stricter run is the beginning
+    of the recorded one.
+
+    :param snr: SNR of every extracted frequency, in the order of extraction
+    :param threshold: Lower bound signal to noise ratio
+    :param extend_frequencies: Number of insignificant frequencies the extraction is extended by
+    :return: Number of frequencies a run with these settings finds
+    """
+    extensions = 0
+    for i, value in enumerate(snr):
+        if value > threshold:
+            extensions = 0
+        elif extensions >= extend_frequencies:
+            return i
+        else:
+            extensions += 1
+    return len(snr)
+
+
+def _run_trajectory(shm_name: str, shape: Tuple[int, int], window_size: float, snrs: Sequence[float],
+                    extends: Sequence[int], run_kwargs: Dict[str, Any]) -> np.ndarray:
+    """
+    Runs a single extraction with the most permissive settings and derives the results of all thresholds from it.
+
+    :return: Array with one row per threshold and frequency, see *sweep_columns* (without window size)
+    """
+    from smurfs.smurfs_common.smurfs_.smurfs import Smurfs
+
+    lc = read_shared_light_curve(shm_name, shape)
+    s = Smurfs.from_lightcurve(lc, label=f"Window size {window_size}", quiet_flag=True)
+
+    # Refits change the parameters of earlier frequencies, so the parameters after every step are kept
+    improve_fit = run_kwargs.get('improve_fit', True)
+    snapshots = {}
+
+    def progress(_, result):
+        if improve_fit:
+            snapshots[len(result)] = [(i.f, i.amp, i.phase) for i in result]
+
+    s.run(snr=min(snrs), window_size=window_size, extend_frequencies=max(extends), progress=progress, **run_kwargs)
+
+    frame = s.result
+    snr = frame.snr.to_numpy(dtype=float)
+    final = list(zip(frame.frequency, frame.amp, frame.phase))
+
+    rows = []
+    for threshold in snrs:
+        for extend in extends:
+            n = trajectory_length(snr, threshold, extend)
+            if n == 0:
+                continue
+            values = np.array(snapshots[n] if improve_fit else final[:n], dtype=object)
+            rows.append(np.column_stack((
+                np.full(n, threshold), np.full(n, extend), np.arange(n),
+                unp.nominal_values(values[:, 0]), unp.std_devs(values[:, 0]),
+                unp.nominal_values(values[:, 1]), unp.std_devs(values[:, 1]),
+                unp.nominal_values(values[:, 2]), unp.std_devs(values[:, 2]),
+                snr[:n], frame.fap.to_numpy(dtype=float)[:n], frame.res_noise.to_numpy(dtype=float)[:n],
+                snr[:n] > threshold)))
+
+    return np.concatenate(rows).astype(float) if len(rows) > 0 else np.empty((0, len(sweep_columns) - 1))
+
+
+def run_sweep(lc: LightCurve, snr: Sequence[float], window_size: Sequence[float], extend_frequencies: Sequence[int],
+              workers: int = None, **run_kwargs) -> df:
+    """
+    Runs the frequency extraction for a grid of parameters. See *Smurfs.run_sweep*.
+    """
+    snr = sorted(set(np.atleast_1d(snr).tolist()))
+    window_size = sorted(set(np.atleast_1d(window_size).tolist()))
+    extend_frequencies = sorted(set(np.atleast_1d(extend_frequencies).astype(int).tolist()))
+
+    if run_kwargs.get('significance', Significance.SNR) != Significance.SNR:
+        raise ValueError("Sweeps derive results from SNR thresholds, significance needs to be 'snr'")
+    if run_kwargs.get('batch_size', 1) > 1 or run_kwargs.get('frequency_detection') is not None or \
+            run_kwargs.get('fit_fun') is not None:
+        raise ValueError("batch_size, frequency_detection and fit_fun depend on the threshold and can't be swept")
+
+    workers = os.cpu_count() if workers is None else workers
+    workers = min(workers, len(window_size))
+    mprint(f"Running sweep over {len(snr)} SNR thresholds, {len(extend_frequencies)} extensions and "
+           f"{len(window_size)} window sizes, with {len(window_size)} extractions on {workers} workers", info)
+
+    with share_light_curve(lc) as (shm_name, shape), ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_trajectory, shm_name, shape, ws, snr, extend_frequencies, run_kwargs)
+                   for ws in window_size]
+        results: List[np.ndarray] = []
+        for ws, future in zip(window_size, futures):
+            results.append(future.result())
+            mprint(f"Window size {ws}: done", log)
+
+    stacked = np.concatenate([np.column_stack((np.full(len(r), ws), r)) for ws, r in zip(window_size, results)])
+    frame = df(stacked, columns=sweep_columns)
+    frame = frame.astype({'extend_frequencies': int, 'f_nr': int, 'significant': bool})
+    return frame.sort_values(['window_size', 'snr_threshold', 'extend_frequencies', 'f_nr']).reset_index(drop=True)
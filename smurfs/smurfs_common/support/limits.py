@@ -0,0 +1,92 @@
+import os
+import sys
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Optional
+
+from smurfs.smurfs_common.support.options import StopReason
+
+
+class FitTimeout(Exception):
+    """
+    Raised by a model function wrapped with *time_budget*, once the fit exceeded its time budget.
+    """
+
+
+def memory_usage() -> float:
+    """
+    Returns the resident memory of the process in MB. Uses /proc on Linux, otherwise the peak memory of the process.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # bytes on macOS, kilobytes on Linux
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def time_budget(function: Callable, seconds: Optional[float]) -> Callable:
+    """
+    Wraps a model function, such that it raises *FitTimeout* when it is called more than *seconds* after wrapping.
+    The signature of the function is kept, so the wrapped function can be used with lmfit as well.
+
+    :param function: Model function
+    :param seconds: Time budget in seconds. If None, *function* is returned unchanged
+    :return: Wrapped function
+    """
+    if seconds is None:
+        return function
+
+    deadline = perf_counter() + seconds
+
+    @wraps(function)
+    def wrapped(*args, **kwargs):
+        if perf_counter() > deadline:
+            raise FitTimeout(f"Fit exceeded its time budget of {seconds}s")
+        return function(*args, **kwargs)
+
+    return wrapped
+
+
+class RunLimits:
+    """
+    Limits of an extraction run. The clock of the wall time starts with the creation of the object.
+
+    :param max_frequencies: Maximum number of extracted frequencies
+    :param max_wall_time: Maximum duration of the run in seconds
+    :param max_memory: Maximum resident memory of the process in MB
+    """
+
+    def __init__(self, max_frequencies: int = None, max_wall_time: float = None, max_memory: float = None):
+        self.max_frequencies = max_frequencies
+        self.max_wall_time = max_wall_time
+        self.max_memory = max_memory
+        self.start = perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return perf_counter() - self.start
+
+    def remaining_frequencies(self, found: int) -> Optional[int]:
+        """
+        Returns the number of frequencies that can still be extracted, or None if there is no limit.
+        """
+        return None if self.max_frequencies is None else max(0, self.max_frequencies - found)
+
+    def exceeded(self, found: int) -> Optional[StopReason]:
+        """
+        Checks all limits.
+
+        :param found: Number of frequencies found so far
+        :return: The first exceeded limit, None if the run can continue
+        """
+        if self.max_frequencies is not None and found >= self.max_frequencies:
+            return StopReason.MAX_FREQUENCIES
+        if self.max_wall_time is not None and self.elapsed > self.max_wall_time:
+            return StopReason.WALL_TIME
+        if self.max_memory is not None and memory_usage() > self.max_memory:
+            return StopReason.MEMORY
+        return None
@@ -1,7 +1,9 @@
 from enum import Enum
-from typing import Optional, Union, Dict, Any
+from typing import Optional, Union, Dict, Any, List
 from dataclasses import dataclass
 from datetime import datetime
+from threading import Lock, Timer
+from time import monotonic
 import multiprocessing as mp
 from queue import Empty
 
@@ -13,6 +15,13 @@ class LogLevel(Enum):
     ERROR = ('7;31;40', 'red')
     STATE = ('7;34;47', 'blue')
 
+    @property
+    def severity(self) -> int:
+        """
+        Severity used for level filtering. LOG is the most verbose level, ERROR the least verbose one.
+        """
+        return _severity[self]
+
     @classmethod
     def from_ansi(cls, ansi_code: str) -> 'LogLevel':
         for level in cls:
@@ -21,11 +30,22 @@ class LogLevel(Enum):
         return cls.LOG
 
 
+_severity = {
+    LogLevel.LOG: 10,
+    LogLevel.STATE: 20,
+    LogLevel.INFO: 20,
+    LogLevel.WARN: 30,
+    LogLevel.ERROR: 40,
+}
+
+
 @dataclass
 class LogMessage:
     text: str
     level: LogLevel
     timestamp: datetime = None
+    channel: Optional[int] = None
+    data: Optional[Dict[str, Any]] = None
 
     def __post_init__(self):
         if self.timestamp is None:
@@ -41,19 +61,65 @@ class LogMessage:
         return {
             "text": f"[{self.timestamp.strftime('%H:%M:%S')}] {self.text}",
             "color": self.level.value[1],
-            "timestamp": self.timestamp.isoformat()
+            "timestamp": self.timestamp.isoformat(),
+            "job": self.channel,
+            "data": self.data
         }
 
 
 class ProcessLogger:
-    def __init__(self, queue: mp.Queue):
+    """
+    Sends log messages to a queue, f.e. from an analysis process to the UI. Messages are sent in batches, as a list
+    of message dictionaries. A message is sent right away if the last batch is older than *flush_interval*, otherwise
+    it is delayed by at most *flush_interval*. Errors are always sent right away.
+
+    :param queue: Queue receiving lists of messages
+    :param channel: Optional channel of the messages, f.e. the id of a job
+    :param batch_size: Maximum number of messages per batch
+    :param flush_interval: Maximum delay of a message, in seconds
+    """
+
+    def __init__(self, queue: mp.Queue, channel: Optional[int] = None, batch_size: int = 50,
+                 flush_interval: float = 0.2):
         self.queue = queue
+        self.channel = channel
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._batch: List[Dict[str, Any]] = []
+        self._lock = Lock()
+        self._timer: Optional[Timer] = None
+        self._last_flush = -float('inf')
 
-    def log(self, text: str, level: Union[LogLevel, str] = LogLevel.LOG):
-        msg = LogMessage(text, level)
-        self.queue.put(msg.to_dict())
+    def log(self, text: str, level: Union[LogLevel, str] = LogLevel.LOG, data: Optional[Dict[str, Any]] = None):
+        msg = LogMessage(text, level, channel=self.channel, data=data)
+        with self._lock:
+            self._batch.append(msg.to_dict())
+            urgent = msg.level == LogLevel.ERROR or monotonic() - self._last_flush >= self.flush_interval
+            if urgent or len(self._batch) >= self.batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
 
     def log_error(self, text: str, exc_info: Optional[Exception] = None):
         self.log(text, LogLevel.ERROR)
         if exc_info:
-            self.log(str(exc_info), LogLevel.ERROR)
\ No newline at end of file
+            self.log(str(exc_info), LogLevel.ERROR)
+
+    def flush(self):
+        """
+        Sends all pending messages.
+        """
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._batch:
+            self.queue.put(self._batch)
+            self._batch = []
+        self._last_flush = monotonic()
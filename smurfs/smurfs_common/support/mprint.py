@@ -1,9 +1,15 @@
 # File: smurfs/smurfs_common/support/mprint.py
+import json
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Optional, Union, Callable, Dict, Any, TextIO
 from smurfs.smurfs_common.support.logging import LogLevel, ProcessLogger
 from smurfs.smurfs_common.support.settings import Settings
 
+_ansi = re.compile(r'\x1b\[[0-9;]*m')
 
 
 class LogType(Enum):
@@ -14,40 +20,121 @@ class LogType(Enum):
     STATE = ('7;34;47', LogLevel.STATE)
 
 
+_by_ansi = {i.value[0]: i.value[1] for i in LogType}
+
+_printer: ContextVar = ContextVar('smurfs_printer', default=None)
+
+
 class MPrinter:
+    """
+    Delivers messages to stdout, an optional *ProcessLogger* and an optional JSON-lines stream. Messages below
+    *Settings.level* are dropped, and messages are only built if at least one output receives them, so lazy
+    messages cost nothing in quiet runs.
+
+    There is one process wide printer, which can be replaced for the current thread with *MPrinter.context*.
+    """
     _instance = None
 
-    def __init__(self, logger: Optional[ProcessLogger] = None):
+    def __init__(self, logger: Optional[ProcessLogger] = None, json_stream: Optional[TextIO] = None):
         self.logger = logger
+        self.json_stream = json_stream
 
     @classmethod
     def initialize(cls, logger: ProcessLogger):
-        cls._instance = cls(logger)
+        cls._instance = cls(logger, cls.get_instance().json_stream)
+
+    @classmethod
+    def set_json_output(cls, stream: Optional[TextIO]):
+        """
+        Writes every message additionally as a JSON object per line into *stream*. None disables the output.
+        """
+        cls.get_instance().json_stream = stream
 
     @classmethod
     def get_instance(cls) -> 'MPrinter':
+        printer = _printer.get()
+        if printer is not None:
+            return printer
         if cls._instance is None:
             cls._instance = cls()
         return cls._instance
 
-    def print(self, text: str, type: str):
+    @staticmethod
+    @contextmanager
+    def context(printer: Optional['MPrinter']):
+        """
+        Uses *printer* for all messages of the current thread, until the context is left. None keeps the current
+        printer.
+        """
+        token = _printer.set(printer) if printer is not None else None
         try:
-            log_type = LogType[type.upper()]
-            ansi_code = log_type.value[0]
-            log_level = log_type.value[1]
-        except KeyError:
+            yield printer
+        finally:
+            if token is not None:
+                _printer.reset(token)
+
+    def enabled(self, level: LogLevel) -> bool:
+        """
+        Returns True if a message of this level reaches any output.
+        """
+        if level.severity < LogLevel[Settings.level.upper()].severity:
+            return False
+        return not Settings.quiet or self.logger is not None or self.json_stream is not None
+
+    def print(self, text: Union[str, Callable[[], str]], type: str,
+              data: Union[Dict[str, Any], Callable[[], Dict[str, Any]], None] = None):
+        log_level = _by_ansi.get(type)
+        if log_level is None:
+            try:
+                log_level = LogType[type.upper()].value[1]
+                ansi_code = LogType[type.upper()].value[0]
+            except KeyError:
+                log_level = LogLevel.LOG
+                ansi_code = type
+        else:
             ansi_code = type
-            log_level = LogLevel.LOG
+
+        if not self.enabled(log_level):
+            return
+
+        if callable(text):
+            text = text()
+        if callable(data):
+            data = data()
 
         if not Settings.quiet:
             print(f'\x1b[{ansi_code}m {text} \x1b[0m')
 
         if self.logger:
-            self.logger.log(text, log_level)
+            self.logger.log(text, log_level, data)
+
+        if self.json_stream is not None:
+            record = {"timestamp": datetime.now().isoformat(), "level": log_level.name.lower(),
+                      "message": _ansi.sub('', text).strip()}
+            if data:
+                record.update(data)
+            self.json_stream.write(json.dumps(record, default=str) + "\n")
+
+
+def mprint(text: Union[str, Callable[[], str]], type: str,
+           data: Union[Dict[str, Any], Callable[[], Dict[str, Any]], None] = None):
+    """
+    Prints a message. *text* (and *data*) can be callables, which are only called if the message is not filtered,
+    f.e. mprint(lambda: f"{expensive}", log).
+
+    :param text: Message, or a callable returning the message
+    :param type: Level of the message, one of log, info, warn, error and state
+    :param data: Optional structured fields of the message, added to the JSON-lines output and the process logger
+    """
+    MPrinter.get_instance().print(text, type, data)
+
 
+def menabled(type: str) -> bool:
+    """
+    Returns True if a message of this level would be printed or logged anywhere.
+    """
+    return MPrinter.get_instance().enabled(_by_ansi.get(type, LogLevel.LOG))
 
-def mprint(text: str, type: str):
-    MPrinter.get_instance().print(text, type)
 
 def ctext(text : str, type : str)->str:
     return f'\x1b[{type}m {text} \x1b[0m'
@@ -58,4 +145,4 @@ log = LogType.LOG.value[0]
 info = LogType.INFO.value[0]
 warn = LogType.WARN.value[0]
 error = LogType.ERROR.value[0]
-state = LogType.STATE.value[0]
\ No newline at end of file
+state = LogType.STATE.value[0]
@@ -0,0 +1,58 @@
+from enum import Enum
+
+
+class Mission(str, Enum):
+    KEPLER = "Kepler"
+    TESS = "TESS"
+    K2 = "K2"
+    all = "all"
+
+
+class FluxType(str, Enum):
+    PDCSAP = "PDCSAP"
+    SAP = "SAP"
+
+
+class ImproveFitMode(str, Enum):
+    ALL = "all"
+    END = "end"
+    NONE = "none"
+
+
+class FitMethod(str, Enum):
+    SCIPY = "scipy"
+    LMFIT = "lmfit"
+    AUTO = "auto"
+
+
+class Significance(str, Enum):
+    SNR = "snr"
+    FAP = "fap"
+
+
+class FapMethod(str, Enum):
+    BALUEV = "baluev"
+    BOOTSTRAP = "bootstrap"
+
+
+class Verbosity(str, Enum):
+    LOG = "log"
+    STATE = "state"
+    INFO = "info"
+    WARN = "warn"
+    ERROR = "error"
+
+
+class KernelBackend(str, Enum):
+    AUTO = "auto"
+    NUMBA = "numba"
+    NUMPY = "numpy"
+
+
+class StopReason(str, Enum):
+    INSIGNIFICANT = "insignificant"
+    SIMILAR = "similar"
+    MAX_FREQUENCIES = "max_frequencies"
+    WALL_TIME = "wall_time"
+    MEMORY = "memory"
+    INTERRUPTED = "interrupted"
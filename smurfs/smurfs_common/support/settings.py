@@ -1,4 +1,78 @@
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 quiet = False
 
-class Settings:
-    quiet = False
\ No newline at end of file
+# Default backend of the numerical kernels, one of 'auto', 'numba' and 'numpy'. 'auto' uses numba if it is installed
+kernels_env = "SMURFS_KERNELS"
+
+_unset = object()
+_quiet: ContextVar = ContextVar('smurfs_quiet', default=_unset)
+_level: ContextVar = ContextVar('smurfs_level', default=_unset)
+_kernels: ContextVar = ContextVar('smurfs_kernels', default=_unset)
+
+
+class _SettingsMeta(type):
+    """
+    Assigning a setting changes the process wide default. *Settings.context* overrides settings only for the
+    current thread (or asyncio task), which allows several analyses with different settings to run concurrently.
+    """
+
+    @property
+    def quiet(cls) -> bool:
+        value = _quiet.get()
+        return cls._quiet if value is _unset else value
+
+    @quiet.setter
+    def quiet(cls, value: bool):
+        cls._quiet = value
+
+    @property
+    def level(cls) -> str:
+        value = _level.get()
+        return cls._level if value is _unset else value
+
+    @level.setter
+    def level(cls, value: str):
+        cls._level = value
+
+    @property
+    def kernels(cls) -> str:
+        value = _kernels.get()
+        return cls._kernels if value is _unset else value
+
+    @kernels.setter
+    def kernels(cls, value: str):
+        cls._kernels = value
+
+
+class Settings(metaclass=_SettingsMeta):
+    _quiet = False
+    # Minimum level of printed and logged messages, one of 'log', 'state', 'info', 'warn' and 'error'
+    _level = "log"
+    # Backend of the numerical kernels, see *smurfs.smurfs_common.signal.kernels*
+    _kernels = os.environ.get(kernels_env, "auto")
+
+    @staticmethod
+    @contextmanager
+    def context(quiet: bool = None, level: str = None, kernels: str = None):
+        """
+        Overrides settings for the current thread, until the context is left. Settings that are None are not changed.
+
+        :param quiet: Quiets all messages to stdout
+        :param level: Minimum level of messages
+        :param kernels: Backend of the numerical kernels, one of 'auto', 'numba' and 'numpy'
+        """
+        tokens = []
+        if quiet is not None:
+            tokens.append((_quiet, _quiet.set(quiet)))
+        if level is not None:
+            tokens.append((_level, _level.set(level)))
+        if kernels is not None:
+            tokens.append((_kernels, _kernels.set(getattr(kernels, 'value', kernels))))
+        try:
+            yield
+        finally:
+            for var, token in reversed(tokens):
+                var.reset(token)
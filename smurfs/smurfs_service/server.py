@@ -0,0 +1,444 @@
+import hashlib
+import json
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from pathlib import Path
+from socketserver import ThreadingMixIn, UnixStreamServer
+from threading import Condition, Lock
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import astropy.units as u
+import numpy as np
+from uncertainties import unumpy as unp
+
+from smurfs.smurfs_common.preprocessing.dataloader import load_data
+from smurfs.smurfs_common.signal.lightcurve import LightCurve
+from smurfs.smurfs_common.signal.periodogram import Periodogram
+from smurfs.smurfs_common.smurfs_.smurfs import Smurfs
+from smurfs.smurfs_common.support.mprint import mprint, info, log, warn
+from smurfs.smurfs_common.support.options import FitMethod, FluxType, Mission, Significance, FapMethod
+from smurfs.smurfs_common.support.settings import Settings
+from smurfs.smurfs_service.cache import LRUCache
+
+# Parameters of Smurfs.run accepted by the service, with an optional conversion
+run_parameters = {
+    'snr': float,
+    'window_size': float,
+    'f_min': float,
+    'f_max': float,
+    'skip_similar': bool,
+    'similar_chancel': bool,
+    'extend_frequencies': int,
+    'improve_fit': bool,
+    'mode': FitMethod,
+    'frequency_detection': float,
+    'significance': Significance,
+    'fap_threshold': float,
+    'fap_method': FapMethod,
+    'fap_bootstraps': int,
+    'batch_size': int,
+    'batch_separation': float,
+    'max_frequencies': int,
+    'max_wall_time': float,
+    'max_memory': float,
+    'fit_time': float,
+}
+
+
+class JobState(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+def _clean(value: Any) -> Any:
+    """
+    Converts numpy types, arrays, quantities and non finite floats into values that can be written as strict JSON.
+    """
+    if isinstance(value, u.Quantity):
+        value = value.value
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(value, dict):
+        return {str(k): _clean(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value]
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(value) if np.isfinite(value) else None
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, np.generic):
+        return _clean(value.item())
+    return value
+
+
+def _frequency_records(frame) -> List[Dict[str, Any]]:
+    """
+    Converts the result dataframe of *Smurfs* into a list of dictionaries.
+    """
+    if len(frame) == 0:
+        return []
+
+    records = []
+    columns = {name: frame[name].to_numpy() for name in ['frequency', 'amp', 'phase']}
+    for i, (_, row) in enumerate(frame.iterrows()):
+        record = {"name": f"f{i + 1}"}
+        for name, values in columns.items():
+            record[name] = unp.nominal_values(values[i])
+            record[f"{name}_err"] = unp.std_devs(values[i])
+        record.update({"snr": row.snr, "fap": row.fap, "res_noise": row.res_noise, "significant": row.significant})
+        records.append(_clean(record))
+    return records
+
+
+class AnalysisJob:
+    """
+    A single analysis of the service. Events (found frequencies and the final result) are kept in a list, so any
+    number of clients can stream them, also after the job has finished.
+    """
+
+    def __init__(self, job_id: int, request: Dict[str, Any], run_kwargs: Dict[str, Any]):
+        self.id = job_id
+        self.request = request
+        self.run_kwargs = run_kwargs
+        self.state = JobState.QUEUED
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+        self._events: List[Dict[str, Any]] = []
+        self._cond = Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.state in (JobState.DONE, JobState.FAILED)
+
+    def emit(self, event: Dict[str, Any]):
+        with self._cond:
+            self._events.append(_clean(event))
+            self._cond.notify_all()
+
+    def start(self):
+        with self._cond:
+            self.state = JobState.RUNNING
+            self.started = time.time()
+            self._events.append({"event": "started", "id": self.id})
+            self._cond.notify_all()
+
+    def finish(self, state: JobState, result: Dict[str, Any] = None, error: str = None):
+        with self._cond:
+            self.state = state
+            self.finished = time.time()
+            self.result = _clean(result)
+            self.error = error
+            self._events.append(_clean({"event": state.value, "id": self.id, "result": self.result, "error": error}))
+            self._cond.notify_all()
+
+    def events(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yields all events of the job, blocking until new events arrive, until the job is finished.
+        """
+        i = 0
+        while True:
+            with self._cond:
+                while i >= len(self._events) and not self.done:
+                    self._cond.wait()
+                batch = self._events[i:]
+                i = len(self._events)
+                done = self.done
+            yield from batch
+            if done:
+                return
+
+    def summary(self, with_result: bool = True) -> Dict[str, Any]:
+        summary = {"id": self.id, "state": self.state.value, "target": self.request.get("target"),
+                   "submitted": self.submitted, "started": self.started, "finished": self.finished,
+                   "error": self.error}
+        if with_result:
+            summary["result"] = self.result
+        return _clean(summary)
+
+
+class AnalysisService:
+    """
+    Runs analyses on a thread pool and keeps light curves and periodograms in memory between jobs, so repeated
+    analyses of the same target (f.e. with different parameters) skip loading and the periodogram of the full
+    frequency range.
+
+    A job request is a dictionary with the following keys:
+
+    - target: Target name or file name, see *Smurfs*. Alternatively, *time* and *flux* (and optionally *flux_err*) can be given as lists
+    - label: Optional label of the result
+    - flux_type, mission, sigma_clip, iters: Optional parameters for loading the target
+    - run: Parameters of *Smurfs.run*, f.e. {"snr": 4, "window_size": 2}
+    - improve_result: Calls *Smurfs.improve_result* after the run
+    - save_path: Optional path, the result is saved there with *Smurfs.save*
+
+    :param workers: Number of concurrent analyses
+    :param cache_size: Number of light curves and periodograms kept in memory
+    :param max_history: Number of finished jobs that are kept
+    """
+
+    def __init__(self, workers: int = None, cache_size: int = 32, max_history: int = 1000):
+        self.workers = os.cpu_count() if workers is None else workers
+        self.max_history = max_history
+        self.light_curves = LRUCache(cache_size)
+        self.periodograms = LRUCache(cache_size)
+        self.started = time.time()
+
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='smurfs-job')
+        self._jobs: Dict[int, AnalysisJob] = {}
+        self._ids = count(1)
+        self._lock = Lock()
+        self._finished = deque(maxlen=10000)
+
+    def submit(self, request: Dict[str, Any]) -> AnalysisJob:
+        """
+        Validates a request and queues the analysis.
+
+        :param request: Job request, see *AnalysisService*
+        :return: The queued job
+        """
+        if not isinstance(request, dict):
+            raise ValueError("Request needs to be a JSON object")
+        if 'target' not in request and not ('time' in request and 'flux' in request):
+            raise ValueError("Request needs either 'target' or 'time' and 'flux'")
+
+        run_kwargs = {}
+        for key, value in request.get('run', {}).items():
+            if key not in run_parameters:
+                raise ValueError(f"Unknown run parameter '{key}'")
+            run_kwargs[key] = None if value is None else run_parameters[key](value)
+
+        with self._lock:
+            job = AnalysisJob(next(self._ids), request, run_kwargs)
+            self._jobs[job.id] = job
+            self._trim_history()
+
+        self._executor.submit(self._run, job)
+        return job
+
+    def job(self, job_id: int) -> Optional[AnalysisJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[AnalysisJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Returns queue, throughput and cache metrics of the service.
+        """
+        now = time.time()
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+            finished = list(self._finished)
+
+        recent = [(t, d, ok) for t, d, ok in finished if now - t <= 60]
+        return _clean({
+            "uptime": now - self.started,
+            "workers": self.workers,
+            "queued": states.count(JobState.QUEUED),
+            "running": states.count(JobState.RUNNING),
+            "completed": sum(1 for _, _, ok in finished if ok),
+            "failed": sum(1 for _, _, ok in finished if not ok),
+            "jobs_per_minute": len(recent),
+            "mean_duration": float(np.mean([d for _, d, _ in recent])) if recent else None,
+            "caches": {"light_curves": self.light_curves.stats(), "periodograms": self.periodograms.stats()},
+        })
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _light_curve(self, request: Dict[str, Any]) -> Tuple[Tuple, LightCurve]:
+        """
+        Returns the light curve of a request, and the key under which it is cached.
+        """
+        if 'time' in request and 'flux' in request:
+            arrays = [np.asarray(request[i], dtype=float) for i in ('time', 'flux', 'flux_err') if i in request]
+            digest = hashlib.sha1(b"".join(a.tobytes() for a in arrays)).hexdigest()
+            key = ('inline', digest)
+            if len(arrays) == 3:
+                return key, self.light_curves.get_or_compute(
+                    key, lambda: LightCurve(time=arrays[0], flux=arrays[1], flux_err=arrays[2]))
+            return key, self.light_curves.get_or_compute(key, lambda: LightCurve(time=arrays[0], flux=arrays[1]))
+
+        target = str(request['target'])
+        flux_type = FluxType(request.get('flux_type', FluxType.PDCSAP))
+        mission = Mission(request.get('mission', Mission.TESS))
+        sigma_clip = float(request.get('sigma_clip', 4))
+        iters = int(request.get('iters', 1))
+
+        # Files are cached with their modification time, so changed files are loaded again
+        path = Path(target)
+        mtime = path.stat().st_mtime if path.is_file() else None
+
+        key = (target, mtime, flux_type, mission, sigma_clip, iters)
+        return key, self.light_curves.get_or_compute(key, lambda: load_data(target, flux_type, sigma_clip, iters,
+                                                                            mission))
+
+    def _run(self, job: AnalysisJob):
+        job.start()
+        try:
+            with Settings.context(quiet=True):
+                key, lc = self._light_curve(job.request)
+                pdg = self.periodograms.get_or_compute(key, lambda: Periodogram.from_lightcurve(lc))
+
+            label = job.request.get('label', job.request.get('target', f"Job {job.id}"))
+            s = Smurfs.from_lightcurve(lc, label=label, quiet_flag=True, periodogram=pdg)
+
+            reported = 0
+
+            def progress(_, result):
+                nonlocal reported
+                for f in result[reported:]:
+                    job.emit({"event": "frequency", "name": f.label, "frequency": unp.nominal_values(f.f),
+                              "amp": unp.nominal_values(f.amp), "phase": unp.nominal_values(f.phase),
+                              "snr": f.snr, "significant": f.significant})
+                reported = len(result)
+
+            s.run(progress=progress, **job.run_kwargs)
+            if job.request.get('improve_result', False):
+                s.improve_result(job.run_kwargs.get('mode', FitMethod.LMFIT))
+            if job.request.get('save_path'):
+                s.save(Path(job.request['save_path']), job.request.get('store_object', False))
+
+            state, error = JobState.DONE, None
+            result = {
+                "label": s.label,
+                "frequencies": _frequency_records(s.result),
+                "combinations": s.combinations.to_dict('records'),
+                "statistics": s.statistics.to_dict('records')[0],
+            }
+            mprint(f"Job {job.id} ({label}) done with {len(s.result)} frequencies", log)
+        except Exception as e:
+            state, result, error = JobState.FAILED, None, f"{type(e).__name__}: {e}"
+            mprint(f"Job {job.id} failed: {e}", warn)
+
+        # The metrics are updated first, so they include the job as soon as its clients see it finishing
+        finished = time.time()
+        with self._lock:
+            self._finished.append((finished, finished - job.started, state == JobState.DONE))
+        job.finish(state, result, error)
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(len(finished) - self.max_history, 0)]:
+            del self._jobs[job_id]
+
+
+_job_path = re.compile(r'^/jobs/(\d+)(/stream)?$')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    JSON API of the service:
+
+    - POST /jobs: Submits a job, returns its id
+    - GET /jobs: Lists all jobs without results
+    - GET /jobs/<id>: State and result of a job
+    - GET /jobs/<id>/stream: Streams the events of a job as JSON lines, until the job is finished
+    - GET /metrics: Queue, throughput and cache metrics
+    """
+    service: AnalysisService = None
+
+    def address_string(self) -> str:
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format: str, *args):
+        mprint(lambda: f"{self.address_string()} {format % args}", log)
+
+    def _send_json(self, status: int, body: Any):
+        data = json.dumps(body, allow_nan=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            return self._send_json(200, self.service.metrics())
+        if self.path == '/jobs':
+            return self._send_json(200, [job.summary(with_result=False) for job in self.service.jobs()])
+
+        match = _job_path.match(self.path)
+        job = self.service.job(int(match.group(1))) if match else None
+        if job is None:
+            return self._send_json(404, {"error": f"Not found: {self.path}"})
+
+        if match.group(2) is None:
+            return self._send_json(200, job.summary())
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        for event in job.events():
+            self.wfile.write(json.dumps(event, allow_nan=False).encode() + b"\n")
+            self.wfile.flush()
+
+    def do_POST(self):
+        if self.path != '/jobs':
+            return self._send_json(404, {"error": f"Not found: {self.path}"})
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            job = self.service.submit(request)
+        except (ValueError, TypeError) as e:
+            return self._send_json(400, {"error": str(e)})
+        self._send_json(202, {"id": job.id, "state": job.state.value})
+
+
+class _UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service: AnalysisService, host: str = '127.0.0.1', port: int = 8765,
+                socket_path: Path = None):
+    """
+    Creates an HTTP server for the service, either on a TCP port or on a Unix socket.
+
+    :param service: Service that runs the analyses
+    :param host: Host of the TCP server
+    :param port: Port of the TCP server, 0 picks a free port
+    :param socket_path: If given, the server listens on this Unix socket instead of a TCP port
+    :return: Server object, start it with *serve_forever*
+    """
+    handler = type('Handler', (_Handler,), {'service': service})
+    if socket_path is not None:
+        socket_path = Path(socket_path)
+        if socket_path.exists():
+            socket_path.unlink()
+        return _UnixHTTPServer(str(socket_path), handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(host: str = '127.0.0.1', port: int = 8765, socket_path: Path = None, workers: int = None,
+          cache_size: int = 32):
+    """
+    Runs the analysis service until it is interrupted. See *AnalysisService* for the format of the requests.
+    """
+    service = AnalysisService(workers, cache_size)
+    server = make_server(service, host, port, socket_path)
+    address = socket_path if socket_path is not None else f"http://{host}:{server.server_address[1]}"
+    mprint(f"SMURFS service listening on {address} with {service.workers} workers", info)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        mprint("Shutting down ...", info)
+    finally:
+        server.server_close()
+        service.shutdown(wait=False)
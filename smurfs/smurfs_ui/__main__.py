@@ -1,8 +1,8 @@
 # File: smurfs/smurfs_ui/__main__.py
-from dash import Dash, callback, Input, Output, State, ALL, html, _dash_renderer
+from dash import Dash, callback, Input, Output, State, ALL, html, _dash_renderer, Patch, no_update, ctx
 import dash_mantine_components as dmc
 import multiprocessing as mp
-from queue import Empty
+import os
 import traceback
 from typing import Optional
 import webbrowser
@@ -16,15 +16,30 @@ from smurfs.smurfs_ui.ui_components.required_parameters import create_required_p
 from smurfs.smurfs_ui.ui_components.optional_parameters import create_optional_parameters
 from smurfs.smurfs_ui.ui_components.advanced_options import create_advanced_options
 from smurfs.smurfs_ui.ui_components.log_area import create_log_area
-from smurfs.smurfs_ui.process_manager import run_analysis_process
+from smurfs.smurfs_ui.ui_components.job_list import create_job_rows
+from smurfs.smurfs_ui.ui_components.progress_area import create_progress_area, create_progress_figure, \
+    create_progress_table
+from smurfs.smurfs_ui.progress import read_progress
+from smurfs.smurfs_ui.log_buffer import LogBuffer, next_poll_interval
+from smurfs.smurfs_ui.worker_pool import WorkerPool, JobStatus
+from smurfs.smurfs_common.support.logging import LogMessage, LogLevel
 from smurfs.smurfs_common.support.mprint import mprint, error as error_style
 
 # Set React version for Mantine
 _dash_renderer._set_react_version("18.2.0")
 
 
+def create_log_entry(msg: dict) -> dmc.Text:
+    text = msg["text"] if msg.get("job") is None else f"#{msg['job']} {msg['text']}"
+    return dmc.Text(
+        text,
+        c=msg["color"],
+        style={'padding': '2px 0'}
+    )
+
+
 class SMURFSApp:
-    def __init__(self):
+    def __init__(self, log_capacity: int = 5000, workers: int = 2):
         self.app = Dash(
             __name__,
             external_stylesheets=[
@@ -34,7 +49,8 @@ class SMURFSApp:
             suppress_callback_exceptions=True
         )
         self.log_queue = mp.Queue()
-        self.current_process = None
+        self.log_buffer = LogBuffer(log_capacity)
+        self.pool = WorkerPool(self.log_queue, workers)
         self.setup_layout()
         self.setup_callbacks()
 
@@ -78,7 +94,8 @@ class SMURFSApp:
                                     create_required_parameters(),
                                     create_optional_parameters()
                                 ], gutter="md"),
-                                create_advanced_options()
+                                create_advanced_options(),
+                                create_progress_area()
                             ], span=8),
                             # Right side - Log area
                             create_log_area()
@@ -157,15 +174,8 @@ class SMURFSApp:
 
                 value_dict = {**text_dict, **select_dict, **switch_dict}
 
-                # Start analysis process
-                if self.current_process and self.current_process.is_alive():
-                    self.current_process.terminate()
-
-                self.current_process = mp.Process(
-                    target=run_analysis_process,
-                    args=(value_dict, self.log_queue)
-                )
-                self.current_process.start()
+                # Queue the analysis, it starts as soon as a worker is idle
+                self.pool.submit(value_dict)
                 show_success_notification("Analysis started", "Check the log area for progress.")
 
             except Exception as e:
@@ -195,46 +205,106 @@ class SMURFSApp:
                 ), False  # Hide loader
 
         @self.app.callback(
-            [Output('log-messages', 'data'),
-             Output('log-area', 'children')],
+            [Output('log-cursor', 'data'),
+             Output('log-area', 'children'),
+             Output('log-interval', 'interval')],
             Input('log-interval', 'n_intervals'),
-            State('log-messages', 'data'),
+            [State('log-cursor', 'data'),
+             State('log-interval', 'interval')],
             prevent_initial_call=True
         )
-        def update_logs(n_intervals, current_messages):
-            if current_messages is None:
-                current_messages = []
+        def update_logs(n_intervals, cursor, interval):
+            self.log_buffer.drain(self.log_queue)
+            if cursor is None:
+                cursor = {"seq": -1, "rendered": 0}
 
-            try:
-                while True:  # Process all available messages
-                    msg = self.log_queue.get_nowait()
-                    current_messages.append(msg)
-            except Empty:
-                pass
+            messages, last_seq, missing = self.log_buffer.since(cursor["seq"])
+            new_interval = next_poll_interval(interval, len(messages) > 0)
+            if new_interval == interval:
+                new_interval = no_update
+
+            if not messages:
+                if new_interval is no_update:
+                    raise PreventUpdate
+                return no_update, no_update, new_interval
+
+            rendered = cursor["rendered"] + len(messages)
+            if missing or rendered > self.log_buffer.capacity:
+                # Start over with the newest half of the buffer, so that full re-renders stay rare
+                messages, last_seq, _ = self.log_buffer.since(-1, limit=max(self.log_buffer.capacity // 2, 1))
+                return ({"seq": last_seq, "rendered": len(messages)},
+                        [create_log_entry(msg) for msg in messages],
+                        new_interval)
+
+            # Only new messages are sent to the browser and appended to the existing entries
+            log_entries = Patch()
+            log_entries.extend([create_log_entry(msg) for msg in messages])
+            return {"seq": last_seq, "rendered": rendered}, log_entries, new_interval
 
-            if not current_messages:
+        @self.app.callback(
+            [Output('job-version', 'data'),
+             Output('job-list', 'children')],
+            Input('log-interval', 'n_intervals'),
+            State('job-version', 'data'),
+            prevent_initial_call=True
+        )
+        def update_jobs(n_intervals, version):
+            if version == self.pool.version:
                 raise PreventUpdate
+            return self.pool.version, create_job_rows(self.pool.jobs())
 
-            # Create log entries
-            log_entries = [
-                dmc.Text(
-                    msg["text"],
-                    c=msg["color"],
-                    style={'padding': '2px 0'}
-                ) for msg in current_messages
-            ]
+        @self.app.callback(
+            [Output('progress-state', 'data'),
+             Output('progress-graph', 'figure'),
+             Output('progress-table', 'data'),
+             Output('progress-text', 'children')],
+            Input('log-interval', 'n_intervals'),
+            State('progress-state', 'data'),
+            prevent_initial_call=True
+        )
+        def update_progress(n_intervals, progress_state):
+            # Shows the newest running job, or the newest job if none is running
+            jobs = [job for job in self.pool.jobs() if job.status != JobStatus.QUEUED]
+            running = [job for job in jobs if job.status == JobStatus.RUNNING]
+            if not jobs:
+                raise PreventUpdate
+            job = running[0] if running else jobs[0]
 
-            return current_messages, log_entries
+            snapshot = read_progress(self.pool.progress_path(job.id))
+            if snapshot is None:
+                raise PreventUpdate
+
+            new_state = {"job": job.id, "seq": snapshot.seq}
+            if new_state == progress_state:
+                raise PreventUpdate
+
+            text = f"Job #{job.id}: {snapshot.iteration} frequencies" + (" (finished)" if snapshot.finished else "")
+            return new_state, create_progress_figure(snapshot), create_progress_table(snapshot), text
+
+        @self.app.callback(
+            Input({"type": "cancel-job", "id": ALL}, "n_clicks"),
+            prevent_initial_call=True
+        )
+        def cancel_job(n_clicks):
+            # Re-rendered buttons trigger the callback as well, but without clicks
+            if not ctx.triggered_id or not ctx.triggered[0]["value"]:
+                raise PreventUpdate
+            job_id = ctx.triggered_id["id"]
+            if self.pool.cancel(job_id):
+                self.log_buffer.append(LogMessage("Analysis cancelled", LogLevel.WARN, channel=job_id).to_dict())
 
     def run(self, debug: bool = True, port: Optional[int] = 8050):
+        # With the debug reloader, only the serving child process needs workers
+        if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            self.pool.start()
         Timer(1, lambda: webbrowser.open_new_tab(f'http://127.0.0.1:{port}')).start()
         self.app.run_server(debug=debug, port=port)
 
 
-def main(port: Optional[int] = 8050):
+def main(port: Optional[int] = 8050, log_capacity: int = 5000, workers: int = 2):
     try:
         mp.set_start_method('spawn')
-        app = SMURFSApp()
+        app = SMURFSApp(log_capacity, workers)
         app.run(port=port)
     except RuntimeError:
         pass
@@ -0,0 +1,107 @@
+# File: smurfs/smurfs_ui/log_buffer.py
+from collections import deque
+from itertools import islice
+from queue import Empty
+from threading import Lock
+from typing import Any, Dict, List, Tuple
+
+
+class LogBuffer:
+    """Server side ring buffer for log messages.
+
+    Every message gets a sequence number, so clients only need to remember the
+    last number they have seen and receive new messages on the next poll.
+    Messages older than the newest *capacity* ones are dropped.
+
+    Args:
+        capacity: Maximum number of messages kept in memory.
+    """
+
+    def __init__(self, capacity: int = 5000):
+        if capacity < 1:
+            raise ValueError("capacity needs to be at least 1")
+        self.capacity = capacity
+        self._messages: deque = deque(maxlen=capacity)
+        self._next_seq = 0
+        self._lock = Lock()
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the newest message, -1 if no message was added yet."""
+        return self._next_seq - 1
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence number of the oldest message still in the buffer."""
+        with self._lock:
+            return self._next_seq - len(self._messages)
+
+    def append(self, msg: Dict[str, Any]) -> int:
+        """Adds a message and returns its sequence number."""
+        with self._lock:
+            seq = self._next_seq
+            self._messages.append((seq, msg))
+            self._next_seq += 1
+            return seq
+
+    def drain(self, queue, max_messages: int = None) -> int:
+        """Moves all pending messages from a queue into the buffer.
+
+        Queue items are either single messages or batches of messages, see
+        *ProcessLogger*.
+
+        Args:
+            queue: Queue filled by the analysis processes.
+            max_messages: Upper bound of messages moved in one call, None for no limit.
+
+        Returns:
+            Number of messages moved.
+        """
+        moved = 0
+        try:
+            while max_messages is None or moved < max_messages:
+                item = queue.get_nowait()
+                for msg in item if isinstance(item, list) else [item]:
+                    self.append(msg)
+                    moved += 1
+        except Empty:
+            pass
+        return moved
+
+    def since(self, seq: int, limit: int = None) -> Tuple[List[Dict[str, Any]], int, bool]:
+        """Returns all messages newer than *seq*.
+
+        Args:
+            seq: Last sequence number the client has seen, -1 for none.
+            limit: Maximum number of returned messages. If more are available, only the newest are returned.
+
+        Returns:
+            The new messages, the sequence number of the newest returned message and a flag that is True if
+            messages newer than *seq* are missing, because they were dropped or cut by *limit*.
+        """
+        with self._lock:
+            available = max(min(self._next_seq - 1 - seq, len(self._messages)), 0)
+            n = available if limit is None else min(available, max(limit, 0))
+            # Iterating from the right keeps a poll proportional to the number of new messages
+            messages = [msg for _, msg in islice(reversed(self._messages), n)][::-1]
+            return messages, self._next_seq - 1, n < self._next_seq - 1 - seq
+
+
+def next_poll_interval(current: int, active: bool, fastest: int = 100, slowest: int = 2000) -> int:
+    """Adapts the polling interval of the log area.
+
+    The interval drops to *fastest* as soon as messages arrive and doubles with
+    every idle poll, up to *slowest*.
+
+    Args:
+        current: Current interval in ms.
+        active: True if the last poll returned new messages.
+        fastest: Shortest interval in ms.
+        slowest: Longest interval in ms.
+
+    Returns:
+        Interval for the next poll in ms.
+    """
+    if active:
+        return fastest
+    return min(max(current or fastest, fastest) * 2, slowest)
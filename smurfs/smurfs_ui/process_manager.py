@@ -1,18 +1,22 @@
 # File: smurfs/smurfs_ui/process_manager.py
 import multiprocessing as mp
-from typing import Dict, Any
+from pathlib import Path
+from typing import Dict, Any, Optional
 import traceback
 from queue import Empty
 
 from smurfs.smurfs_common.support.logging import ProcessLogger
 from smurfs.smurfs_common.support.mprint import MPrinter, mprint, error, state
+from smurfs.smurfs_ui.progress import ProgressWriter
 
 class ProcessManagerObjects:
     process_logger : ProcessLogger | None = None
 
 
-def run_analysis_process(value_dict: Dict[str, Any], log_queue: mp.Queue):
-    ProcessManagerObjects.process_logger = ProcessLogger(log_queue)
+def run_analysis_process(value_dict: Dict[str, Any], log_queue: mp.Queue, job_id: Optional[int] = None,
+                         progress_path: Optional[Path] = None):
+    ProcessManagerObjects.process_logger = ProcessLogger(log_queue, job_id)
+    writer = ProgressWriter(progress_path) if progress_path is not None else None
     try:
         # Initialize the process logger
         MPrinter.initialize(ProcessManagerObjects.process_logger)
@@ -30,7 +34,7 @@ def run_analysis_process(value_dict: Dict[str, Any], log_queue: mp.Queue):
 
         # Create and run SMURFS
         smurfs = create_smurfs_instance(value_dict)
-        run_smurfs_analysis(smurfs, value_dict)
+        run_smurfs_analysis(smurfs, value_dict, writer.publish if writer is not None else None)
 
         ProcessManagerObjects.process_logger.log("Analysis completed successfully", "INFO")
         return True
@@ -42,4 +46,9 @@ def run_analysis_process(value_dict: Dict[str, Any], log_queue: mp.Queue):
 
         print(f"Error occurred during analysis: {str(e)}")
         print(tb)
-        return False
\ No newline at end of file
+        return False
+
+    finally:
+        if writer is not None:
+            writer.finish()
+        ProcessManagerObjects.process_logger.flush()
\ No newline at end of file
@@ -0,0 +1,151 @@
+# File: smurfs/smurfs_ui/progress.py
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+# Header of a progress file: sequence number, frequencies found, spectrum points, table rows, capacity of the
+# spectrum, capacity of the table, finished flag, reserved
+_HEADER = 8
+_SEQ, _ITERATION, _POINTS, _ROWS, _CAP_POINTS, _CAP_ROWS, _FINISHED = range(7)
+
+progress_columns = ["frequency", "amp", "phase", "snr"]
+
+
+def _nominal(value: Any) -> float:
+    value = getattr(value, "nominal_value", value)
+    return float(getattr(value, "value", value))
+
+
+@dataclass
+class ProgressSnapshot:
+    seq: int
+    iteration: int
+    frequency: np.ndarray
+    power: np.ndarray
+    table: np.ndarray
+    finished: bool
+
+
+class ProgressWriter:
+    """Publishes the progress of an analysis into a memory mapped file.
+
+    The file holds the current residual periodogram and the table of found
+    frequencies. Readers in other processes map the same file, so no arrays
+    are pickled through queues. A sequence number that is odd while the
+    writer updates the file lets readers detect torn reads.
+
+    Args:
+        path: Path of the progress file.
+        max_rows: Maximum number of rows of the frequency table. Only the newest rows are kept.
+    """
+
+    def __init__(self, path: Path, max_rows: int = 1000):
+        self.path = Path(path)
+        self.max_rows = max_rows
+        self._map: Optional[np.memmap] = None
+
+    def _allocate(self, n_points: int):
+        # A new file replaces the old one atomically, readers that still map the old file keep a consistent copy
+        size = _HEADER + 2 * n_points + 4 * self.max_rows
+        tmp = self.path.with_suffix(".tmp")
+        new_map = np.memmap(tmp, dtype=np.float64, mode="w+", shape=(size,))
+        new_map[_CAP_POINTS] = n_points
+        new_map[_CAP_ROWS] = self.max_rows
+        if self._map is not None:
+            new_map[_SEQ] = self._map[_SEQ]
+        new_map.flush()
+        os.replace(tmp, self.path)
+        self._map = new_map
+
+    def publish(self, pdg, result: List):
+        """Writes the current state of an analysis.
+
+        Args:
+            pdg: Current residual periodogram.
+            result: List of *Frequency* objects found so far.
+        """
+        frequency = np.asarray(pdg.frequency.value, dtype=np.float64)
+        power = np.asarray(pdg.power.value, dtype=np.float64)
+        table = np.array([[_nominal(i.f), _nominal(i.amp), _nominal(i.phase), _nominal(i.snr)]
+                          for i in result[-self.max_rows:]], dtype=np.float64).reshape(-1, 4)
+
+        if self._map is None or len(frequency) > self._map[_CAP_POINTS]:
+            self._allocate(len(frequency))
+
+        m = self._map
+        cap = int(m[_CAP_POINTS])
+        m[_SEQ] += 1
+        m[_ITERATION] = len(result)
+        m[_POINTS] = len(frequency)
+        m[_ROWS] = len(table)
+        m[_HEADER:_HEADER + len(frequency)] = frequency
+        m[_HEADER + cap:_HEADER + cap + len(power)] = power
+        m[_HEADER + 2 * cap:_HEADER + 2 * cap + table.size] = table.ravel()
+        m[_SEQ] += 1
+
+    def finish(self):
+        """Marks the analysis as finished."""
+        if self._map is not None:
+            self._map[_SEQ] += 1
+            self._map[_FINISHED] = 1
+            self._map[_SEQ] += 1
+            self._map.flush()
+
+
+def read_progress(path: Path, retries: int = 5) -> Optional[ProgressSnapshot]:
+    """Reads the latest consistent state of a progress file.
+
+    Args:
+        path: Path of the progress file.
+        retries: Number of attempts if the writer updates the file during the read.
+
+    Returns:
+        The snapshot, or None if the file doesn't exist yet or no consistent state could be read.
+    """
+    try:
+        m = np.memmap(path, dtype=np.float64, mode="r")
+    except (OSError, ValueError):
+        return None
+
+    for _ in range(retries):
+        seq = m[_SEQ]
+        if seq % 2 == 1:
+            time.sleep(0.001)
+            continue
+
+        header = np.array(m[:_HEADER])
+        cap = int(header[_CAP_POINTS])
+        n_points = int(header[_POINTS])
+        n_rows = int(header[_ROWS])
+        frequency = np.array(m[_HEADER:_HEADER + n_points])
+        power = np.array(m[_HEADER + cap:_HEADER + cap + n_points])
+        table = np.array(m[_HEADER + 2 * cap:_HEADER + 2 * cap + 4 * n_rows]).reshape(-1, 4)
+
+        if m[_SEQ] == seq:
+            return ProgressSnapshot(int(seq), int(header[_ITERATION]), frequency, power, table,
+                                    bool(header[_FINISHED]))
+    return None
+
+
+def downsample_peaks(x: np.ndarray, y: np.ndarray, n_bins: int = 2000) -> Tuple[np.ndarray, np.ndarray]:
+    """Reduces a spectrum to *n_bins* points, keeping the highest point of every bin so that peaks stay visible.
+
+    Args:
+        x: Frequency axis.
+        y: Amplitude axis.
+        n_bins: Number of points of the result.
+
+    Returns:
+        Downsampled frequency and amplitude.
+    """
+    if len(y) <= n_bins:
+        return x, y
+
+    size = int(np.ceil(len(y) / n_bins))
+    padded = np.concatenate((y, np.full((-len(y)) % size, -np.inf))).reshape(-1, size)
+    idx = np.argmax(padded, axis=1) + np.arange(padded.shape[0]) * size
+    return x[idx], y[idx]
@@ -1,6 +1,6 @@
 # File: smurfs/smurfs_ui/smurfs_helper.py
 from pathlib import Path
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Optional, Tuple, Callable
 from smurfs.smurfs_common.preprocessing.dataloader import FluxType, Mission
 from smurfs.smurfs_common.smurfs_.smurfs import Smurfs, FitMethod, ImproveFitMode
 from smurfs.smurfs_common.support.mprint import mprint, state as state_style, info as info_style, warn as warn_style
@@ -90,12 +90,13 @@ def _safe_int(value: Any, default: int = 0) -> Optional[int]:
         return default
 
 
-def run_smurfs_analysis(smurfs: Smurfs, values: Dict[str, Any]) -> None:
+def run_smurfs_analysis(smurfs: Smurfs, values: Dict[str, Any], progress: Optional[Callable] = None) -> None:
     """Run SMURFS analysis with the given parameters.
 
     Args:
         smurfs: Configured SMURFS instance
         values: Dictionary of input values
+        progress: Optional callback receiving the residual periodogram and found frequencies of every iteration
     """
     mprint("Starting SMURFS analysis...", state_style)
     advanced_options = values.get("advanced-options", [])
@@ -138,7 +139,8 @@ def run_smurfs_analysis(smurfs: Smurfs, values: Dict[str, Any]) -> None:
         extend_frequencies=extend_frequencies,
         improve_fit=improve_fit,
         mode=fit_method,
-        frequency_detection=frequency_detection
+        frequency_detection=frequency_detection,
+        progress=progress
     )
 
     if improve_fit:
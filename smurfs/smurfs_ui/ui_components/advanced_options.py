@@ -1,7 +1,7 @@
 # File: smurfs/smurfs_ui/ui_components/advanced_options.py
 import dash_mantine_components as dmc
 from dash import html
-from smurfs.smurfs_common.smurfs_.smurfs import FitMethod
+from smurfs.smurfs_common.support.options import FitMethod
 from smurfs.smurfs_ui.common_ui import create_input_with_validation
 
 
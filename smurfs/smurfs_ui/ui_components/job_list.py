@@ -0,0 +1,59 @@
+# File: smurfs/smurfs_ui/ui_components/job_list.py
+from typing import List
+
+import dash_mantine_components as dmc
+from dash import dcc, html
+
+from smurfs.smurfs_ui.worker_pool import Job, JobStatus
+
+status_colors = {
+    JobStatus.QUEUED: "gray",
+    JobStatus.RUNNING: "blue",
+    JobStatus.DONE: "green",
+    JobStatus.FAILED: "red",
+    JobStatus.CANCELLED: "orange",
+}
+
+
+def create_job_row(job: Job) -> dmc.Group:
+    """Create a row with the state of a job and a button to cancel it."""
+    return dmc.Group([
+        dmc.Text(f"#{job.id}", fw=500, size="sm"),
+        dmc.Text(job.label, size="sm", truncate="end", style={"flex": 1}),
+        dmc.Badge(job.status.value, color=status_colors[job.status], variant="light"),
+        dmc.Button(
+            "Cancel",
+            id={"type": "cancel-job", "id": job.id},
+            size="compact-xs",
+            color="red",
+            variant="subtle",
+            disabled=job.status.finished
+        )
+    ], gap="xs", wrap="nowrap")
+
+
+def create_job_rows(jobs: List[Job]) -> list:
+    if not jobs:
+        return [dmc.Text("No analyses submitted yet", c="dimmed", size="sm")]
+    return [create_job_row(job) for job in jobs]
+
+
+def create_job_list():
+    return dmc.Paper(
+        children=[
+            dcc.Store(id='job-version', storage_type='memory', data=-1),
+            dmc.Group([
+                html.I(className="fas fa-tasks"),
+                dmc.Title("Jobs", order=4),
+            ], gap="xs", mb="md"),
+            dmc.ScrollArea(
+                dmc.Stack(id="job-list", children=create_job_rows([]), gap=4),
+                style={"maxHeight": "200px"}
+            )
+        ],
+        p="md",
+        radius="md",
+        withBorder=True,
+        shadow="sm",
+        mb="md"
+    )
@@ -2,12 +2,17 @@
 import dash_mantine_components as dmc
 from dash import dcc, html
 
+from smurfs.smurfs_ui.ui_components.job_list import create_job_list
+
 
 def create_log_area():
     return dmc.GridCol([
-        dcc.Store(id='log-messages', storage_type='memory', data=[]),
+        # Only the position in the server side log buffer is kept in the browser, see LogBuffer
+        dcc.Store(id='log-cursor', storage_type='memory', data={"seq": -1, "rendered": 0}),
         dcc.Interval(id='log-interval', interval=100),
 
+        create_job_list(),
+
         dmc.Paper(
             children=[
                 dmc.Group([
@@ -1,6 +1,6 @@
 # File: smurfs/smurfs_ui/ui_components/optional_parameters.py
 import dash_mantine_components as dmc
-from smurfs.smurfs_common.preprocessing.dataloader import FluxType, Mission
+from smurfs.smurfs_common.support.options import FluxType, Mission
 from smurfs.smurfs_ui.common_ui import create_input_with_validation, create_card_with_icon
 
 
@@ -0,0 +1,70 @@
+# File: smurfs/smurfs_ui/ui_components/progress_area.py
+from typing import Optional
+
+import dash_mantine_components as dmc
+from dash import dcc, html
+
+from smurfs.smurfs_ui.progress import ProgressSnapshot, downsample_peaks, progress_columns
+
+# Number of points of the spectrum that are sent to the browser
+max_plot_points = 2000
+
+# Number of found frequencies shown in the table, newest first
+max_table_rows = 25
+
+
+def create_progress_figure(snapshot: Optional[ProgressSnapshot] = None) -> dict:
+    """Create the figure of the residual spectrum, downsampled on the server."""
+    data = []
+    if snapshot is not None and len(snapshot.frequency) > 0:
+        x, y = downsample_peaks(snapshot.frequency, snapshot.power, max_plot_points)
+        data.append({"x": x, "y": y, "type": "scattergl", "mode": "lines", "name": "Residual",
+                     "line": {"color": "black", "width": 1}})
+        if len(snapshot.table) > 0:
+            data.append({"x": snapshot.table[:, 0], "y": snapshot.table[:, 1], "type": "scattergl",
+                         "mode": "markers", "name": "Found", "marker": {"color": "red", "size": 6}})
+
+    return {
+        "data": data,
+        "layout": {
+            "margin": {"l": 50, "r": 10, "t": 10, "b": 40},
+            "xaxis": {"title": "Frequency [c/d]"},
+            "yaxis": {"title": "Amplitude [mag]"},
+            "showlegend": False,
+            "uirevision": "progress",
+        }
+    }
+
+
+def create_progress_table(snapshot: Optional[ProgressSnapshot] = None) -> dict:
+    """Create the table data of the newest found frequencies."""
+    body = []
+    if snapshot is not None:
+        first = len(snapshot.table)
+        for i, row in list(enumerate(snapshot.table))[::-1][:max_table_rows]:
+            body.append([f"f{i + 1 + snapshot.iteration - first}"] + [f"{value:.4f}" for value in row])
+    return {"head": ["Name"] + progress_columns, "body": body}
+
+
+def create_progress_area():
+    return dmc.Paper(
+        children=[
+            dcc.Store(id='progress-state', storage_type='memory', data=None),
+            dmc.Group([
+                html.I(className="fas fa-chart-area"),
+                dmc.Title("Live Progress", order=4),
+                dmc.Text(id="progress-text", c="dimmed", size="sm", ml="auto"),
+            ], gap="xs", mb="md"),
+            dcc.Graph(id="progress-graph", figure=create_progress_figure(), config={"displayModeBar": False},
+                      style={"height": "300px"}),
+            dmc.ScrollArea(
+                dmc.Table(id="progress-table", data=create_progress_table(), striped=True),
+                style={"maxHeight": "250px"}
+            )
+        ],
+        p="md",
+        radius="md",
+        withBorder=True,
+        shadow="sm",
+        mt="md"
+    )
@@ -0,0 +1,267 @@
+# File: smurfs/smurfs_ui/worker_pool.py
+import atexit
+import multiprocessing as mp
+import shutil
+import tempfile
+from collections import deque
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from enum import Enum
+from itertools import count
+from pathlib import Path
+from queue import Empty
+from threading import RLock, Thread
+from typing import Any, Dict, List, Optional
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    @property
+    def finished(self) -> bool:
+        return self in (JobStatus.DONE, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+@dataclass
+class Job:
+    id: int
+    values: Dict[str, Any]
+    status: JobStatus = JobStatus.QUEUED
+    worker: Optional[int] = None
+    submitted: datetime = field(default_factory=datetime.now)
+    started: Optional[datetime] = None
+    finished: Optional[datetime] = None
+
+    @property
+    def label(self) -> str:
+        return str(self.values.get("target", ""))
+
+
+def _warm_up():
+    """Imports the analysis stack, so that jobs don't pay the import cost."""
+    import lmfit  # noqa: F401
+    import matplotlib.pyplot  # noqa: F401
+    from smurfs.smurfs_ui import smurfs_helper  # noqa: F401
+
+
+def _worker_main(key: int, inbox: mp.Queue, events: mp.Queue, log_queue: mp.Queue):
+    """Main loop of a worker process. Runs jobs from its inbox until it receives None."""
+    from smurfs.smurfs_ui.process_manager import run_analysis_process
+
+    _warm_up()
+    events.put(("ready", key, None, None))
+
+    while True:
+        job = inbox.get()
+        if job is None:
+            break
+        job_id, values, progress_path = job
+        ok = run_analysis_process(values, log_queue, job_id, progress_path)
+        events.put(("finished", key, job_id, ok))
+
+
+class _Worker:
+    def __init__(self, ctx, key: int, events: mp.Queue, log_queue: mp.Queue):
+        self.key = key
+        self.inbox = ctx.Queue()
+        self.ready = False
+        self.job: Optional[int] = None
+        self.process = ctx.Process(target=_worker_main, args=(key, self.inbox, events, log_queue),
+                                   name=f"smurfs-worker-{key}")
+        self.process.start()
+
+
+class WorkerPool:
+    """Persistent pool of analysis processes.
+
+    Workers are started once with the 'spawn' method and import the analysis
+    stack before they accept jobs. Submitted jobs wait in a queue until a
+    worker is idle. Every job logs into its own channel of the shared log
+    queue. Cancelling a running job terminates its worker, which is replaced
+    by a fresh one. The live progress of a job is published into a file in a
+    temporary directory, see *ProgressWriter*.
+
+    Args:
+        log_queue: Queue that receives the log messages of all jobs.
+        n_workers: Number of concurrent analyses.
+        max_history: Number of finished jobs that are remembered.
+    """
+
+    def __init__(self, log_queue: mp.Queue, n_workers: int = 2, max_history: int = 50):
+        if n_workers < 1:
+            raise ValueError("n_workers needs to be at least 1")
+        self.n_workers = n_workers
+        self.max_history = max_history
+        self.version = 0
+
+        self._ctx = mp.get_context("spawn")
+        self._log_queue = log_queue
+        self._events = self._ctx.Queue()
+        self._workers: Dict[int, _Worker] = {}
+        self._jobs: Dict[int, Job] = {}
+        self._pending: deque = deque()
+        self._job_ids = count(1)
+        self._worker_keys = count()
+        self._lock = RLock()
+        self._thread: Optional[Thread] = None
+        self._running = False
+        self._progress_dir: Optional[Path] = None
+
+    def start(self):
+        """Starts the workers. Called automatically by the first *submit*."""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._progress_dir = Path(tempfile.mkdtemp(prefix="smurfs-progress-"))
+            for _ in range(self.n_workers):
+                self._spawn()
+            self._thread = Thread(target=self._listen, name="smurfs-worker-pool", daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def submit(self, values: Dict[str, Any]) -> int:
+        """Queues an analysis.
+
+        Args:
+            values: Input values of the analysis, see *run_analysis_process*.
+
+        Returns:
+            Id of the job.
+        """
+        self.start()
+        with self._lock:
+            job = Job(next(self._job_ids), values)
+            self._jobs[job.id] = job
+            self._pending.append(job.id)
+            self._trim_history()
+            self._dispatch()
+            self._changed()
+            return job.id
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancels a queued or running job.
+
+        Returns:
+            True if the job was cancelled, False if it was unknown or already finished.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status.finished:
+                return False
+
+            if job.status == JobStatus.QUEUED:
+                self._pending.remove(job_id)
+            else:
+                worker = self._workers.pop(job.worker)
+                worker.process.terminate()
+                worker.process.join(5)
+                self._spawn()
+
+            job.status = JobStatus.CANCELLED
+            job.finished = datetime.now()
+            self._dispatch()
+            self._changed()
+            return True
+
+    def progress_path(self, job_id: int) -> Optional[Path]:
+        """Returns the path of the progress file of a job, see *read_progress*."""
+        if self._progress_dir is None:
+            return None
+        return self._progress_dir / f"job_{job_id}.progress"
+
+    def jobs(self) -> List[Job]:
+        """Returns a snapshot of all known jobs, newest first."""
+        with self._lock:
+            return [replace(job) for job in sorted(self._jobs.values(), key=lambda j: j.id, reverse=True)]
+
+    def shutdown(self, timeout: float = 5):
+        """Stops all workers. Running jobs are terminated."""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            workers = list(self._workers.values())
+            self._workers.clear()
+
+        for worker in workers:
+            if worker.job is None:
+                worker.inbox.put(None)
+            else:
+                worker.process.terminate()
+        for worker in workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+        if self._progress_dir is not None:
+            shutil.rmtree(self._progress_dir, ignore_errors=True)
+
+    def _spawn(self):
+        key = next(self._worker_keys)
+        self._workers[key] = _Worker(self._ctx, key, self._events, self._log_queue)
+
+    def _dispatch(self):
+        # Needs to be called with the lock held
+        for worker in self._workers.values():
+            if not self._pending:
+                break
+            if worker.ready and worker.job is None:
+                job = self._jobs[self._pending.popleft()]
+                job.status = JobStatus.RUNNING
+                job.worker = worker.key
+                job.started = datetime.now()
+                worker.job = job.id
+                worker.inbox.put((job.id, job.values, self.progress_path(job.id)))
+
+    def _finish(self, job_id: int, status: JobStatus):
+        job = self._jobs.get(job_id)
+        if job is not None and not job.status.finished:
+            job.status = status
+            job.finished = datetime.now()
+
+    def _listen(self):
+        while self._running:
+            try:
+                event, key, job_id, ok = self._events.get(timeout=0.5)
+            except Empty:
+                self._check_workers()
+                continue
+
+            with self._lock:
+                worker = self._workers.get(key)
+                if worker is None:
+                    # Event of a worker that was terminated in the meantime
+                    continue
+                if event == "ready":
+                    worker.ready = True
+                elif event == "finished":
+                    worker.job = None
+                    self._finish(job_id, JobStatus.DONE if ok else JobStatus.FAILED)
+                self._dispatch()
+                self._changed()
+
+    def _check_workers(self):
+        # Replaces workers that died without being cancelled, f.e. because they ran out of memory
+        with self._lock:
+            for key, worker in list(self._workers.items()):
+                if self._running and not worker.process.is_alive():
+                    del self._workers[key]
+                    if worker.job is not None:
+                        self._finish(worker.job, JobStatus.FAILED)
+                    self._spawn()
+                    self._changed()
+            self._dispatch()
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in sorted(self._jobs.items()) if job.status.finished]
+        for job_id in finished[:max(len(finished) - self.max_history, 0)]:
+            del self._jobs[job_id]
+            self.progress_path(job_id).unlink(missing_ok=True)
+
+    def _changed(self):
+        self.version += 1
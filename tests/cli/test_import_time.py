@@ -0,0 +1,35 @@
+import subprocess
+import sys
+
+import pytest
+
+heavy_modules = ['matplotlib', 'lightkurve', 'lmfit', 'pandas', 'scipy', 'astropy', 'astroquery']
+
+# Cumulative import time of the CLI in microseconds. Generous on purpose, the heavy modules alone take seconds.
+max_import_time = 1_500_000
+
+
+@pytest.fixture(scope='module')
+def import_times():
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'smurfs.smurfs_cli', '--help'],
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+
+    # Lines have the format 'import time: self | cumulative | name', nested imports are indented
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(cumulative), len(name) - len(name.lstrip()) == 1)
+    return times
+
+
+@pytest.mark.parametrize('module', heavy_modules)
+def test_help_does_not_import_heavy_modules(import_times, module):
+    assert module not in import_times
+
+
+def test_help_import_time(import_times):
+    total = sum(t for t, top_level in import_times.values() if top_level)
+    assert total < max_import_time
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from astropy.time import Time
+from lightkurve import LightCurve
+
+from smurfs.smurfs_common.preprocessing.dataloader import load_data_from_target_name
+from smurfs.smurfs_common.preprocessing.download import MirrorBackend, fetch_light_curves, Product, StorageBackend
+from smurfs.smurfs_common.support.options import Mission, FluxType
+
+
+# Time formats of the products of the missions
+time_formats = {"Kepler": "bkjd", "TESS": "btjd"}
+
+
+def read_text(path):
+    data = np.loadtxt(path)
+    time = Time(data[0], format=time_formats[path.parent.parent.name], scale='tdb')
+    return LightCurve(time=time, flux=data[1], flux_err=data[2])
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    rng = np.random.default_rng(1)
+    for mission, starts in [("TESS", [0, 30]), ("Kepler", [100])]:
+        folder = tmp_path / mission / "TIC_123"
+        folder.mkdir(parents=True)
+        for start in starts:
+            time = np.arange(start, start + 25, 0.01)
+            flux = 1000 + 10 * np.sin(2 * np.pi * 3 * time) + rng.normal(0, 1, len(time))
+            np.savetxt(folder / f"sector_{start}.txt", np.vstack((time, flux, np.ones(len(time)))))
+    return MirrorBackend(tmp_path, pattern="*.txt", reader=read_text)
+
+
+def test_mirror_fetch(mirror):
+    light_curves = fetch_light_curves("TIC 123", [Mission.KEPLER, Mission.TESS, Mission.K2], mirror, workers=4)
+    assert [lc.time.value[0] for lc in light_curves] == [100, 0, 30]
+
+
+def test_missing_target(mirror):
+    with pytest.raises(FileNotFoundError):
+        fetch_light_curves("TIC 456", [Mission.TESS], mirror)
+
+
+def test_load_from_mirror(mirror):
+    lc = load_data_from_target_name("TIC 123", FluxType.PDCSAP, Mission.all, backend=mirror)
+    # the Kepler product comes first, so the TESS products are converted to BKJD, 2167 days after BTJD 0
+    assert lc.time.format == "bkjd"
+    assert lc.time.value[0] == pytest.approx(100)
+    assert np.all(np.diff(lc.time.value) > 0)
+    assert np.count_nonzero(lc.time.value > 2167) > np.count_nonzero(lc.time.value < 2167)
+
+
+class FlakyBackend(StorageBackend):
+    def __init__(self):
+        self.attempts = {}
+
+    def search(self, target, mission):
+        return [Product(Mission(mission).value, f"product_{i}", i) for i in range(3)]
+
+    def fetch(self, product):
+        self.attempts[product.name] = self.attempts.get(product.name, 0) + 1
+        if self.attempts[product.name] < 2:
+            raise IOError("Connection reset")
+        return product.source
+
+
+def test_retries():
+    backend = FlakyBackend()
+    assert fetch_light_curves("x", [Mission.TESS], backend, backoff=0) == [0, 1, 2]
+    assert all(i == 2 for i in backend.attempts.values())
+
+    with pytest.raises(IOError):
+        fetch_light_curves("x", [Mission.TESS], FlakyBackend(), retries=0, backoff=0)
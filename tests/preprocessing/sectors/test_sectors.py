@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from astropy.time import Time
+from lightkurve import LightCurve
+
+from smurfs.smurfs_common.preprocessing.calculators import mag, mag_arrays, sigma_clip_mask
+from smurfs.smurfs_common.preprocessing.sectors import preprocess_sectors, StageTimer
+
+
+def sector(start, seed, time_format=None):
+    rng = np.random.default_rng(seed)
+    time = np.arange(start, start + 20, 0.01)
+    flux = 1000 + 20 * np.sin(time) + rng.normal(0, 1, len(time))
+    flux[::200] += 100
+    flux[5] = np.nan
+    if time_format is not None:
+        time = Time(time, format=time_format, scale='tdb')
+    return LightCurve(time=time, flux=flux, flux_err=np.ones(len(time)))
+
+
+def test_mag_arrays_matches_mag():
+    lc = sector(0, 1)
+    magnitude, magnitude_err, valid = mag_arrays(lc.flux.value, lc.flux_err.value)
+    expected = mag(lc)
+
+    np.testing.assert_allclose(magnitude, expected.flux.value)
+    np.testing.assert_allclose(magnitude_err, expected.flux_err.value)
+    assert np.count_nonzero(~valid) == 1
+
+
+def test_sigma_clip_mask_matches_lightkurve():
+    lc = sector(0, 2).remove_nans()
+    for iters in [1, 3, None]:
+        mask = sigma_clip_mask(lc.flux.value, 4, iters)
+        expected = lc.remove_outliers(4, maxiters=iters if iters is not None else 100)
+        np.testing.assert_array_equal(lc.time.value[mask], expected.time.value)
+
+
+def test_preprocess_sectors():
+    sectors = [sector(40, 3), sector(0, 4), sector(20, 5)]
+    timer = StageTimer()
+    lc = preprocess_sectors(sectors, 4, 1, workers=3, timer=timer)
+
+    assert np.all(np.diff(lc.time.value) > 0)
+    assert np.all(np.isfinite(lc.flux.value))
+    assert lc.flux.unit == "mag"
+    # every sector is normalized on its own
+    for start in [0, 20, 40]:
+        part = lc.flux.value[(lc.time.value >= start) & (lc.time.value < start + 20)]
+        assert abs(np.median(part)) < 1e-3
+        assert len(part) < 2000
+    assert {"extract", "sectors", "concatenate"} <= set(timer.durations)
+
+
+def test_preprocess_mixed_time_formats():
+    # BKJD is JD - 2454833, BTJD is JD - 2457000
+    kepler, tess = sector(100, 6, 'bkjd'), sector(0, 7, 'btjd')
+    lc = preprocess_sectors([kepler, tess], 4, 1)
+
+    assert lc.time.format == 'bkjd'
+    assert np.all(np.diff(lc.time.value) > 0)
+    # the first point of every sector is an outlier and clipped
+    kepler_part = lc.time.value[lc.time.value < 1000]
+    tess_part = lc.time.value[lc.time.value >= 1000]
+    assert kepler_part[0] == pytest.approx(100.01, abs=1e-9)
+    # the TESS time stamps are shifted by exactly the difference of the BTJD and BKJD offsets
+    np.testing.assert_allclose(tess_part[:3], 2167 + np.array([0.01, 0.02, 0.03]), atol=1e-6)
+    assert lc.time.value[-1] == pytest.approx(2167 + 19.99, abs=1e-6)
+    np.testing.assert_allclose(lc.time.jd[[0, -1]], [2454933.01, 2457019.99], atol=1e-6)
+
+
+def test_preprocess_no_sectors():
+    with pytest.raises(ValueError):
+        preprocess_sectors([])
@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from smurfs.smurfs_service.cache import LRUCache
+
+
+def test_get_or_compute():
+    cache = LRUCache(2)
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        return value * 2
+
+    assert cache.get_or_compute("a", lambda: compute(1)) == 2
+    assert cache.get_or_compute("a", lambda: compute(1)) == 2
+    assert calls == [1]
+    assert cache.stats() == {"size": 1, "maxsize": 2, "hits": 1, "misses": 1}
+
+
+def test_least_recently_used_is_evicted():
+    cache = LRUCache(2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("c", lambda: 3)
+
+    assert len(cache) == 2
+    assert cache.get_or_compute("a", lambda: -1) == 1
+    assert cache.get_or_compute("b", lambda: -1) == -1
+
+
+def test_concurrent_access():
+    cache = LRUCache(8)
+    with ThreadPoolExecutor(8) as executor:
+        values = list(executor.map(lambda i: cache.get_or_compute(i % 4, lambda: i % 4), range(200)))
+
+    assert values == [i % 4 for i in range(200)]
+    assert len(cache) == 4
@@ -0,0 +1,73 @@
+import json
+from http.client import HTTPConnection
+from threading import Thread
+
+import astropy.units as u
+import numpy as np
+import pytest
+
+from smurfs.smurfs_common.signal.frequency_finder import sin_multiple
+from smurfs.smurfs_service.server import AnalysisService, make_server, _clean
+
+
+@pytest.fixture
+def server():
+    service = AnalysisService(workers=2, cache_size=4)
+    server = make_server(service, port=0)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    service.shutdown()
+
+
+def request(server, method, path, body=None):
+    connection = HTTPConnection(*server.server_address)
+    connection.request(method, path, body=json.dumps(body) if body is not None else None)
+    response = connection.getresponse()
+    return response.status, response.read()
+
+
+def job_request():
+    rng = np.random.default_rng(2)
+    time = np.arange(0, 20, 0.02)
+    flux = sin_multiple(time, 0.05, 2.5, 0.3) + rng.normal(0, 0.002, len(time))
+    return {"time": time.tolist(), "flux": flux.tolist(), "label": "synthetic",
+            "run": {"snr": 4, "window_size": 2, "improve_fit": False, "mode": "scipy"}}
+
+
+def test_stream_and_metrics(server):
+    status, body = request(server, "POST", "/jobs", job_request())
+    assert status == 202
+    job_id = json.loads(body)["id"]
+
+    status, body = request(server, "GET", f"/jobs/{job_id}/stream")
+    events = [json.loads(line) for line in body.decode().splitlines()]
+    assert status == 200
+    assert events[0]["event"] == "started"
+    assert any(e["event"] == "frequency" for e in events)
+    assert events[-1]["event"] == "done"
+    assert abs(events[-1]["result"]["frequencies"][0]["frequency"] - 2.5) < 0.01
+
+    # the same light curve again hits the caches
+    status, body = request(server, "POST", "/jobs", job_request())
+    request(server, "GET", f"/jobs/{json.loads(body)['id']}/stream")
+
+    metrics = json.loads(request(server, "GET", "/metrics")[1])
+    assert metrics["completed"] == 2
+    assert metrics["caches"]["light_curves"]["hits"] == 1
+    assert metrics["caches"]["periodograms"]["hits"] == 1
+
+
+def test_invalid_requests(server):
+    assert request(server, "POST", "/jobs", {"target": "x", "run": {"unknown": 1}})[0] == 400
+    assert request(server, "POST", "/jobs", {"run": {}})[0] == 400
+    assert request(server, "GET", "/jobs/999")[0] == 404
+
+
+def test_clean_numpy_values():
+    value = _clean({"f": np.array(1.5), "amp": np.float32(0.25), "list": np.array([1, np.nan]),
+                    "nyquist": 24.5 * u.Unit("1/d"), "n": np.int64(3)})
+    assert json.loads(json.dumps(value, allow_nan=False)) == {"f": 1.5, "amp": 0.25, "list": [1, None],
+                                                              "nyquist": 24.5, "n": 3}
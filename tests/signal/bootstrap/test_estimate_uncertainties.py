@@ -0,0 +1,66 @@
+import pytest
+import numpy as np
+from unittest.mock import patch
+
+from smurfs.smurfs_common.signal.bootstrap import estimate_uncertainties, UncertaintyMethod
+from smurfs.smurfs_common.signal.frequency_finder import sin_multiple
+
+
+@pytest.fixture(autouse=True)
+def mock_mprint():
+    with patch('smurfs.smurfs_common.signal.bootstrap.mprint'):
+        yield
+
+
+@pytest.fixture(scope="module")
+def light_curve():
+    rng = np.random.default_rng(42)
+    time = 1500 + np.arange(0, 27, 0.02)
+    params = np.array([0.01, 1.3, 0.2, 0.004, 4.7, 0.8])
+    flux = sin_multiple(time, *params) + rng.normal(0, 0.002, len(time))
+    return time, flux, params
+
+
+@pytest.mark.parametrize("method", [UncertaintyMethod.BOOTSTRAP, UncertaintyMethod.MONTECARLO])
+def test_estimate_uncertainties_shape_and_magnitude(light_curve, method):
+    time, flux, params = light_curve
+    sigma_amp, sigma_f, sigma_phi = estimate_uncertainties(time, flux, params, n_samples=30, workers=1,
+                                                           method=method, seed=1)
+    for sigma in (sigma_amp, sigma_f, sigma_phi):
+        assert sigma.shape == (2,)
+        assert np.all(np.isfinite(sigma))
+        assert np.all(sigma > 0)
+
+    # Analytic expectation (Montgomery & O'Donoghue 1999) for the amplitude uncertainty
+    expected = np.sqrt(2 / len(time)) * 0.002
+    assert np.allclose(sigma_amp, expected, rtol=0.6)
+
+
+def test_estimate_uncertainties_reproducible(light_curve):
+    time, flux, params = light_curve
+    first = estimate_uncertainties(time, flux, params, n_samples=10, workers=1, seed=7)
+    second = estimate_uncertainties(time, flux, params, n_samples=10, workers=1, seed=7)
+    for a, b in zip(first, second):
+        assert np.array_equal(a, b)
+
+
+def test_estimate_uncertainties_independent_of_workers(light_curve):
+    time, flux, params = light_curve
+    serial = estimate_uncertainties(time, flux, params, n_samples=6, workers=1, seed=3)
+    parallel = estimate_uncertainties(time, flux, params, n_samples=6, workers=2, seed=3)
+    for a, b in zip(serial, parallel):
+        assert np.allclose(a, b)
+
+
+def test_phase_uncertainty_independent_of_time_origin(light_curve):
+    time, flux, params = light_curve
+    shifted = np.array(params)
+    # the same light curve on a time axis starting at 2458000 + 1500
+    shifted[2::3] = (params[2::3] - params[1::3] * 2458000) % 1
+    _, _, sigma_phi = estimate_uncertainties(time, flux, params, n_samples=30, workers=1, seed=2)
+    _, _, sigma_phi_shifted = estimate_uncertainties(time + 2458000, flux, shifted, n_samples=30, workers=1, seed=2)
+
+    np.testing.assert_allclose(sigma_phi_shifted, sigma_phi, rtol=0.05)
+    # Analytic expectation (Montgomery & O'Donoghue 1999) for the phase uncertainty
+    expected = np.sqrt(2 / len(time)) * 0.002 / (2 * np.pi * params[0::3])
+    assert np.allclose(sigma_phi, expected, rtol=0.6)
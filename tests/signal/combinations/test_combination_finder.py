@@ -0,0 +1,55 @@
+import pytest
+import numpy as np
+from unittest.mock import patch
+
+from smurfs.smurfs_common.signal.combinations import CombinationFinder, combination_columns
+
+
+@pytest.fixture(autouse=True)
+def mock_mprint():
+    with patch('smurfs.smurfs_common.signal.combinations.mprint'):
+        yield
+
+
+@pytest.fixture
+def frequencies():
+    f1, f2, f3 = 1.234, 3.517, 0.871
+    ids = [1, 2, 3, 4, 5, 6, 7]
+    f = [f1, f2, f3, f1 + f2, 2 * f1, f2 - f3 + 0.0005, f1 + f2 + f3]
+    a = [10, 8, 6, 3, 2.5, 2, 1]
+    return ids, f, a
+
+
+def test_update_schema(frequencies):
+    frame = CombinationFinder().update(*frequencies)
+    assert frame.columns.tolist() == combination_columns
+    assert frame.ID.tolist() == frequencies[0]
+    assert frame.Name.tolist() == [f"f{i}" for i in frequencies[0]]
+
+
+def test_update_finds_combinations(frequencies):
+    frame = CombinationFinder().update(*frequencies).set_index('ID')
+    assert frame.loc[[1, 2, 3], 'Independent'].all()
+    assert frame.loc[4, 'Solution'] == 'f1+f2'
+    assert frame.loc[5, 'Solution'] == '2f1'
+    assert frame.loc[6, 'Solution'] == 'f2-f3'
+    assert np.isclose(frame.loc[6, 'Residual'], 0.0005)
+    assert frame.loc[7, 'Solution'] == 'f3+f4'
+    assert 'f1+f2+f3' in frame.loc[7, 'Other_Solutions']
+
+
+def test_update_parents_need_higher_amplitude():
+    frame = CombinationFinder().update([1, 2, 3], [3.0, 1.0, 2.0], [3, 2, 1]).set_index('ID')
+    assert frame.loc[1, 'Independent']
+    assert frame.loc[3, 'Solution'] == 'f1-f2'
+
+
+def test_update_is_incremental(frequencies):
+    ids, f, a = frequencies
+    finder = CombinationFinder()
+    finder.update(ids[:3], f[:3], a[:3])
+    with patch.object(finder, '_search', wraps=finder._search) as search:
+        finder.update(ids, f, a)
+        assert search.call_args[0][0].tolist() == [3, 4, 5, 6]
+        finder.update(ids, f, a)
+        assert search.call_count == 1
@@ -0,0 +1,50 @@
+import numpy as np
+
+from smurfs.smurfs_common.signal.fit_cache import FitCache
+from smurfs.smurfs_common.support.options import FitMethod
+
+
+def test_get_and_put(tmp_path):
+    with FitCache(tmp_path / "fits.db") as cache:
+        key = FitCache.key("prewhitening", FitMethod.LMFIT, np.arange(10.), f_guess=1.5)
+        assert cache.get(key) is None
+
+        cache.put(key, {"amp": [1., 0.1], "f": [1.5, 0.01], "phase": [0.2, 0.05], "fitter": "lmfit", "nfev": 12})
+        assert cache.get(key)["f"] == [1.5, 0.01]
+        assert cache.stats()["entries"] == 1
+        assert cache.hits == 1 and cache.misses == 1
+
+
+def test_key_depends_on_inputs():
+    time = np.linspace(0, 10, 100)
+    key = FitCache.key("prewhitening", FitMethod.LMFIT, time, np.sin(time), f_guess=1.5)
+
+    assert key == FitCache.key("prewhitening", "lmfit", time, np.sin(time), f_guess=1.5)
+    assert key != FitCache.key("prewhitening", FitMethod.SCIPY, time, np.sin(time), f_guess=1.5)
+    assert key != FitCache.key("improve", FitMethod.LMFIT, time, np.sin(time), f_guess=1.5)
+    assert key != FitCache.key("prewhitening", FitMethod.LMFIT, time, np.cos(time), f_guess=1.5)
+    assert key != FitCache.key("prewhitening", FitMethod.LMFIT, time, np.sin(time), f_guess=1.6)
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    value = {"nfev": 1, "fitter": "x" * 100}
+    with FitCache(tmp_path / "fits.db", max_size=300 / 1024 ** 2) as cache:
+        cache.put("a", value)
+        cache.put("b", value)
+        cache.get("a")
+        cache.put("c", value)
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+        assert cache.stats()["size"] <= 300
+
+
+def test_persistence(tmp_path):
+    with FitCache(tmp_path / "fits.db") as cache:
+        cache.put("a", {"nfev": 3})
+
+    with FitCache(tmp_path / "fits.db") as cache:
+        assert cache.get("a") == {"nfev": 3}
+        cache.clear()
+        assert cache.get("a") is None
@@ -0,0 +1,42 @@
+import numpy as np
+
+from smurfs.smurfs_common.signal.frequency_finder import Frequency, sin, sin_multiple
+from smurfs.smurfs_common.signal.lightcurve import LightCurve
+from smurfs.smurfs_common.signal.periodogram import Periodogram
+from smurfs.smurfs_common.smurfs_.smurfs import Smurfs
+
+time = np.arange(0, 25, 0.02)
+noise = np.random.default_rng(11).normal(0, 0.001, len(time))
+
+
+def test_grid_frequency_uses_closed_form():
+    pdg = Periodogram.from_lightcurve(LightCurve(time=time, flux=sin(time, 0.01, 3.3, 0.2) + noise))
+    f_grid = pdg.frequency.value[np.argmax(pdg.power.value)]
+
+    f = Frequency(time, sin(time, 0.01, f_grid, 0.2) + noise, window_size=2, snr=4)
+    f.pre_whiten('auto')
+    assert f.fitter == "linear"
+    assert f.f.nominal_value == f_grid
+    assert abs(f.amp.nominal_value - 0.01) < 0.001
+
+
+def test_off_grid_frequency_escalates():
+    f = Frequency(time, sin(time, 0.01, 3.3123, 0.2) + noise, window_size=2, snr=4)
+    f.pre_whiten('auto')
+    assert f.fitter in ("scipy", "lmfit")
+    assert f.nfev > 1
+    # the noise shifts the least squares optimum to 3.3125, about 2 sigma from the input frequency
+    assert abs(f.f.nominal_value - 3.3123) < 3e-4
+    assert abs(f.amp.nominal_value - 0.01) < 5e-4
+
+
+def test_run_records_fitters():
+    flux = sin_multiple(time, 0.05, 1.7123, 0.1, 0.02, 4.3456, 0.5) + noise
+    s = Smurfs.from_lightcurve(LightCurve(time=time, flux=flux), label="auto", quiet_flag=True)
+    s.run(snr=4, window_size=2, mode='auto')
+
+    diagnostics = s.fit_diagnostics
+    assert list(diagnostics.name) == [f.label for f in s.result.f_obj]
+    assert set(diagnostics.fitter) <= {"linear", "scipy", "lmfit"}
+    assert (diagnostics.nfev > 0).all()
+    np.testing.assert_allclose(sorted(i.nominal_value for i in s.result.frequency[:2]), [1.7123, 4.3456], atol=1e-3)
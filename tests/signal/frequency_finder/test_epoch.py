@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from smurfs.smurfs_common.signal.frequency_finder import Frequency, from_epoch, phase_at_epoch, reference_epoch, \
+    sin, sin_multiple, to_epoch
+
+
+def light_curve():
+    rng = np.random.default_rng(2)
+    time = 2458325 + np.arange(0, 27, 0.02)
+    flux = sin(time, 0.01, 3.217, 0.4) + rng.normal(0, 0.001, len(time))
+    return time, flux
+
+
+def test_reference_epoch():
+    time = np.array([10., 11, 12, 20])
+    assert reference_epoch(time) == 15
+    assert reference_epoch(time, weights=np.array([1, 1, 1, 0])) == 11
+
+
+def test_phase_at_epoch_matches_model():
+    time = np.linspace(100, 110, 500)
+    epoch = 104.3
+    phase = phase_at_epoch(0.3, 2.7, epoch)
+    np.testing.assert_allclose(sin(time - epoch, 0.1, 2.7, phase), sin(time, 0.1, 2.7, 0.3), atol=1e-10)
+
+
+def test_epoch_round_trip():
+    params = np.array([0.02, 1.3, 0.25, 0.005, 7.1, 0.9])
+    shifted = to_epoch(params, 1234.5)
+    np.testing.assert_allclose(sin_multiple(np.arange(5) - 1234.5, *shifted), sin_multiple(np.arange(5), *params),
+                               atol=1e-9)
+    np.testing.assert_allclose(from_epoch(shifted, 1234.5), params, atol=1e-9)
+
+
+@pytest.mark.parametrize("mode", ["scipy", "lmfit"])
+def test_centered_fit(mode):
+    time, flux = light_curve()
+    f = Frequency(time, flux, window_size=2, snr=4)
+    f.pre_whiten(mode)
+
+    assert f.epoch == pytest.approx((time[0] + time[-1]) / 2)
+    assert f.nfev > 0
+    if mode == "lmfit":
+        # lmfit keeps the frequency fixed at the peak of the periodogram
+        assert f.f.nominal_value == f.f_guess.value
+    else:
+        assert f.f.nominal_value == pytest.approx(3.217, abs=1e-4)
+    assert f.amp.nominal_value == pytest.approx(0.01, rel=0.05)
+    # phases are relative to epoch 0
+    model = sin(time, f.amp.nominal_value, f.f.nominal_value, f.phase.nominal_value)
+    assert np.std(flux - model) < 0.002
+
+
+def test_centering_reduces_function_evaluations():
+    time, flux = light_curve()
+    time = time - 2458325 + 1800
+    nfev = {}
+    for center_time in [True, False]:
+        f = Frequency(time, flux, window_size=2, snr=4, center_time=center_time)
+        f.pre_whiten('scipy')
+        nfev[center_time] = f.nfev
+
+    assert nfev[True] <= nfev[False]
+
+
+@pytest.mark.parametrize("center_time", [True, False])
+def test_centered_fit_off_grid(center_time):
+    time = np.arange(0, 25, 0.02)
+    flux = sin(time, 0.01, 3.3123, 0.2) + np.random.default_rng(11).normal(0, 0.001, len(time))
+    f = Frequency(time, flux, window_size=2, snr=4, center_time=center_time)
+    f.pre_whiten('scipy')
+
+    # the noise shifts the least squares optimum to 3.3125, about 2 sigma from the input frequency
+    assert f.f.nominal_value == pytest.approx(3.3123, abs=3e-4)
+    assert f.amp.nominal_value == pytest.approx(0.01, rel=0.05)
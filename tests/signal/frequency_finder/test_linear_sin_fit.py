@@ -0,0 +1,31 @@
+import numpy as np
+
+from smurfs.smurfs_common.signal.frequency_finder import linear_sin_fit, sin_multiple, sin_multiple_jacobian
+
+
+def test_linear_sin_fit_recovers_parameters():
+    time = 1800 + np.arange(0, 20, 0.01)
+    flux = sin_multiple(time, 0.02, 1.3, 0.25, 0.005, 7.1, 0.9) + 0.1
+    amps, phases = linear_sin_fit(time, flux, np.array([1.3, 7.1]))
+    assert np.allclose(amps, [0.02, 0.005], rtol=1e-6)
+    assert np.allclose(phases, [0.25, 0.9], atol=1e-6)
+
+
+def test_linear_sin_fit_single_frequency():
+    time = np.arange(0, 10, 0.01)
+    amps, phases = linear_sin_fit(time, 0.1 * np.sin(2 * np.pi * 2 * time), 2)
+    assert amps.shape == (1,)
+    assert np.isclose(amps[0], 0.1)
+    assert np.isclose(phases[0], 0, atol=1e-8) or np.isclose(phases[0], 1, atol=1e-8)
+
+
+def test_sin_multiple_jacobian_matches_numerical():
+    time = np.arange(0, 5, 0.05)
+    params = np.array([0.02, 1.3, 0.25, 0.005, 7.1, 0.9])
+    jac = sin_multiple_jacobian(time, *params)
+    eps = 1e-7
+    for i in range(len(params)):
+        shifted = params.copy()
+        shifted[i] += eps
+        numerical = (sin_multiple(time, *shifted) - sin_multiple(time, *params)) / eps
+        assert np.allclose(jac[:, i], numerical, atol=1e-4)
@@ -0,0 +1,70 @@
+import numpy as np
+
+from smurfs.smurfs_common.signal.frequency_finder import sin, sin_multiple, phase_at_epoch, reference_epoch
+from smurfs.smurfs_common.signal.lightcurve import LightCurve
+from smurfs.smurfs_common.smurfs_.smurfs import Smurfs
+
+
+def run():
+    rng = np.random.default_rng(4)
+    time = np.arange(0, 20, 0.02)
+    flux = sin_multiple(time, 0.05, 1.71, 0.1, 0.02, 4.33, 0.5, 0.01, 6.12, 0.2) + rng.normal(0, 0.001, len(time))
+    s = Smurfs.from_lightcurve(LightCurve(time=time, flux=flux), label="lmfit", quiet_flag=True)
+    s.run(snr=4, window_size=2, mode='lmfit', max_frequencies=3)
+    return s
+
+
+def composite_fit(ff, result):
+    # the combined fit as a sum of lmfit models, which the cached parameters replace
+    from lmfit import Model
+
+    x = ff.lc.time.value
+    epoch = reference_epoch(x)
+    models = []
+    for f in result:
+        m = Model(sin, prefix=f.label)
+        phase = phase_at_epoch(f.phase.nominal_value, f.f.nominal_value, epoch)
+        for name, value in [('amp', f.amp.nominal_value), ('f', f.f.nominal_value)]:
+            m.set_param_hint(f.label + name, value=value, min=0.8 * value, max=1.2 * value)
+        m.set_param_hint(f.label + 'phase', value=phase, min=phase - 0.5, max=phase + 0.5)
+        models.append(m)
+    return np.sum(models).fit(ff.lc.flux.value, x=x - epoch).values
+
+
+def test_parameters_are_extended_in_place():
+    s = run()
+    ff = s._ff
+    params = ff._lmfit_params
+    assert len(params) == 3 * len(s.result)
+
+    result = list(s.result.f_obj)
+    ff._lmfit_fit(result[:2])
+    assert ff._lmfit_params is params
+    assert sorted(params) == sorted(f.label + name for f in result[:2] for name in ['amp', 'f', 'phase'])
+
+
+def test_matches_composite_model():
+    s = run()
+    ff = s._ff
+    result = list(s.result.f_obj)
+    expected = composite_fit(ff, result)
+
+    ff._lmfit_fit(result)
+    for f in result:
+        assert abs(f.amp.nominal_value - expected[f.label + 'amp']) < 1e-6
+        assert abs(f.f.nominal_value - expected[f.label + 'f']) < 1e-6
+
+
+def test_phase_near_zero_can_vary():
+    s = run()
+    ff = s._ff
+    result = list(s.result.f_obj)
+    epoch = reference_epoch(ff.lc.time.value)
+    # shift the phase of the first frequency to 0.001 on the centered axis
+    f = result[0]
+    f.phase = f.phase - phase_at_epoch(f.phase.nominal_value, f.f.nominal_value, epoch) + 0.001
+
+    params = ff._lmfit_parameters(result, epoch)
+    phase = params[f.label + 'phase']
+    assert phase.min < phase.value < phase.max
+    assert abs(phase.max - phase.min - 1) < 1e-12
@@ -0,0 +1,122 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+import numpy as np
+import pytest
+
+from smurfs.smurfs_common.signal import kernels
+from smurfs.smurfs_common.support.options import KernelBackend
+from smurfs.smurfs_common.support.settings import Settings
+
+backends = [KernelBackend.NUMPY, pytest.param(KernelBackend.NUMBA, marks=pytest.mark.skipif(
+    kernels.numba is None, reason="numba is not installed"))]
+
+
+def reference_minima(power, peak):
+    # the loop of the original Frequency.find_adjacent_minima
+    def check_minima(y, counter):
+        return y[counter] < y[counter + 1] and y[counter] < y[counter - 1]
+
+    counter, lower, upper = 1, -1, -1
+    while lower == -1 or upper == -1:
+        neg, pos = peak - counter, peak + counter
+        if neg - 1 < 0:
+            lower = 0
+        elif check_minima(power, neg):
+            lower = neg
+        if pos + 1 >= len(power):
+            upper = len(power) - 1
+        elif check_minima(power, pos):
+            upper = pos
+        counter += 1
+    return lower, upper
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_sin_sum(backend):
+    x = np.linspace(0, 10, 1000)
+    params = [0.1, 1.3, 0.2, 0.05, 4.2, 0.7]
+    expected = sum(params[i] * np.sin(2 * np.pi * (params[i + 1] * x + params[i + 2])) for i in range(0, 6, 3))
+    np.testing.assert_allclose(kernels.sin_sum(x, params, backend), expected, atol=1e-12)
+    np.testing.assert_array_equal(kernels.sin_sum(x, [], backend), np.zeros_like(x))
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_adjacent_minima(backend):
+    rng = np.random.default_rng(3)
+    power = np.abs(rng.normal(size=500))
+    for peak in [0, 1, 2, 100, 250, 497, 498, 499]:
+        assert kernels.adjacent_minima(power, peak, backend) == reference_minima(power, peak)
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_window_mean(backend):
+    frequency = np.linspace(0, 10, 1001)
+    power = np.random.default_rng(4).uniform(size=1001)
+    mask = (frequency > 2.005) & (frequency < 4.5)
+    assert kernels.window_mean(frequency, power, 2.005, 4.5, backend) == pytest.approx(np.mean(power[mask]))
+    # both ends are exclusive
+    assert kernels.window_mean(frequency, power, frequency[200], frequency[202], backend) == pytest.approx(power[201])
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_lomb_scargle_matches_numpy(backend):
+    rng = np.random.default_rng(6)
+    time = np.sort(rng.uniform(0, 10, 300))
+    flux = rng.normal(size=(2, 300))
+    flux[1, 50:80] = np.nan
+    finite = np.isfinite(flux)
+    w = finite / finite.sum(axis=1)[:, None]
+    y = np.where(finite, flux, 0)
+    wy = w * np.where(finite, y - np.sum(w * y, axis=1, keepdims=True), 0)
+    frequency = np.linspace(0.1, 15, 400)
+
+    expected = kernels.lomb_scargle(time, frequency, w, wy, 50, KernelBackend.NUMPY)
+    np.testing.assert_allclose(kernels.lomb_scargle(time, frequency, w, wy, 50, backend), expected, rtol=1e-8,
+                               atol=1e-14)
+
+
+def test_set_backend():
+    previous = kernels.set_backend(KernelBackend.NUMPY)
+    try:
+        assert kernels.active_backend() == KernelBackend.NUMPY
+        if kernels.numba is None:
+            with pytest.raises(ImportError):
+                kernels.set_backend("numba")
+        else:
+            kernels.set_backend("numba")
+            assert kernels.active_backend() == KernelBackend.NUMBA
+    finally:
+        kernels.set_backend(previous)
+
+
+def test_backend_context_is_thread_local():
+    barrier = Barrier(2)
+    default = kernels.active_backend()
+
+    def run(backend):
+        with Settings.context(kernels=backend):
+            barrier.wait()
+            return kernels.active_backend()
+
+    with ThreadPoolExecutor(2) as executor:
+        numpy_backend, auto_backend = executor.map(run, [KernelBackend.NUMPY, KernelBackend.AUTO])
+    assert numpy_backend == KernelBackend.NUMPY
+    assert auto_backend == (KernelBackend.NUMBA if kernels.numba is not None else KernelBackend.NUMPY)
+    assert kernels.active_backend() == default
+
+
+def test_benchmark():
+    result = kernels.benchmark(n_points=500, n_frequencies=5000, n_sines=3, repeat=3, seed=1)
+    assert set(result) == {"sin_sum", "adjacent_minima", "window_mean", "lomb_scargle"}
+    for durations in result.values():
+        assert {"reference", KernelBackend.NUMPY.value} <= set(durations)
+        assert (KernelBackend.NUMBA.value in durations) == (kernels.numba is not None)
+        assert all(d > 0 for d in durations.values())
+
+    speedup = {name: durations["reference"] / durations[KernelBackend.NUMPY.value]
+               for name, durations in result.items()}
+    print("Speedup of the numpy kernels:", speedup)
+    # the binary search and the plain array replace a mask and a loop over the Quantity spectrum
+    assert speedup["window_mean"] > 1
+    assert speedup["adjacent_minima"] > 1
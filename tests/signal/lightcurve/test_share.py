@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from smurfs.smurfs_common.signal.lightcurve import LightCurve
+
+
+@pytest.fixture
+def lc():
+    time = np.arange(0, 10, 0.1)
+    return LightCurve(time=time, flux=np.sin(time), flux_err=np.full(len(time), 0.1))
+
+
+def test_share_uses_the_same_data(lc):
+    shared = lc.share()
+    assert np.shares_memory(shared.time.jd1, lc.time.jd1)
+    assert np.shares_memory(shared.flux.value, lc.flux.value)
+    assert np.shares_memory(shared.flux_err.value, lc.flux_err.value)
+
+
+def test_shared_data_is_read_only(lc):
+    shared = lc.share()
+    with pytest.raises(ValueError):
+        shared.flux.value[0] = 1
+    with pytest.raises(ValueError):
+        lc.flux.value[0] = 1
+
+
+def test_new_flux_only_changes_the_copy(lc):
+    flux = lc.flux.value.copy()
+    shared = lc.share(flux=np.zeros(len(lc.flux)))
+
+    np.testing.assert_array_equal(shared.flux.value, 0)
+    np.testing.assert_array_equal(lc.flux.value, flux)
+    assert shared.flux.unit == lc.flux.unit
+    assert np.shares_memory(shared.time.jd1, lc.time.jd1)
+
+    shared.flux = np.ones(len(lc.flux))
+    np.testing.assert_array_equal(lc.flux.value, flux)
+
+
+def test_replaced_flux_stays_writeable(lc):
+    lc.share(flux=np.zeros(len(lc.flux)))
+    lc.flux.value[0] = 1
+    assert lc.flux.value[0] == 1
@@ -0,0 +1,81 @@
+from time import perf_counter
+
+import numpy as np
+from astropy.timeseries import LombScargle
+
+from smurfs.smurfs_common.signal.frequency_finder import sin_multiple
+from smurfs.smurfs_common.signal.lightcurve import LightCurve
+from smurfs.smurfs_common.signal.periodogram import Periodogram
+
+
+def light_curves(n_stars=3, n_time=500, seed=5):
+    rng = np.random.default_rng(seed)
+    time = 1500 + np.arange(n_time) * 0.02
+    stars = [(0.01, 1.3), (0.02, 4.2), (0.005, 7.7)]
+    flux = np.array([sin_multiple(time, *stars[i % 3], 0.2) + rng.normal(0, 0.001, len(time))
+                     for i in range(n_stars)])
+    return time, flux
+
+
+def per_star(time, flux, **kwargs):
+    pdgs = []
+    for star in flux:
+        mask = np.isfinite(star)
+        pdgs.append(Periodogram.from_lightcurve(LightCurve(time=time[mask], flux=star[mask]), **kwargs))
+    return pdgs
+
+
+def test_stacked_matches_from_lightcurve():
+    time, flux = light_curves()
+    f, p = Periodogram.batch_from_flux(time, flux, f_max=10, stacked=True)
+
+    assert p.shape == (3, len(f))
+    for row, pdg in zip(p, per_star(time, flux, f_max=10)):
+        np.testing.assert_allclose(f, pdg.frequency.value)
+        np.testing.assert_allclose(row, pdg.power.value, rtol=1e-9, atol=1e-12)
+
+    for row, (amp, frequency) in zip(p, [(0.01, 1.3), (0.02, 4.2), (0.005, 7.7)]):
+        assert abs(f[np.argmax(row)] - frequency) < 0.01
+        assert abs(np.max(row) - amp) / amp < 0.05
+
+
+def test_short_grid_is_exact():
+    time, flux = light_curves()
+    f, p = Periodogram.batch_from_flux(time, flux, f_min=1, f_max=1.5, stacked=True, chunk_size=50)
+
+    assert len(f) < 200
+    for row, star in zip(p, flux):
+        reference = LombScargle(time, star, normalization='psd').power(f, method='slow')
+        np.testing.assert_allclose(row, np.sqrt(4 / len(time)) * np.sqrt(reference), rtol=1e-6, atol=1e-9)
+
+
+def test_missing_cadences():
+    time, flux = light_curves()
+    flux[1, 100:150] = np.nan
+
+    f, p = Periodogram.batch_from_flux(time, flux, f_max=10, stacked=True)
+
+    for row, pdg in zip(p, per_star(time, flux, f_max=10)):
+        np.testing.assert_allclose(row, pdg.power.value, rtol=1e-9, atol=1e-12)
+
+
+def test_faster_than_per_star_loop():
+    time, flux = light_curves(n_stars=30, n_time=4000)
+
+    durations = []
+    for call in [lambda: Periodogram.batch_from_flux(time, flux, stacked=True), lambda: per_star(time, flux)]:
+        start = perf_counter()
+        call()
+        durations.append(perf_counter() - start)
+
+    batch, loop = durations
+    assert batch < loop
+
+
+def test_periodogram_objects():
+    time, flux = light_curves()
+    pdgs = Periodogram.batch_from_flux(time, flux, targetids=["a", "b", "c"], remove_ranges=[(4, 5)])
+
+    assert [i.targetid for i in pdgs] == ["a", "b", "c"]
+    assert not np.any((pdgs[0].frequency.value >= 4) & (pdgs[0].frequency.value <= 5))
+    assert len(pdgs[0].frequency) == len(pdgs[2].power)
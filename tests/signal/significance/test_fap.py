@@ -0,0 +1,43 @@
+import pytest
+import numpy as np
+from astropy.timeseries import LombScargle
+
+from smurfs.smurfs_common.signal.significance import standard_power, fap_baluev, fap_bootstrap
+
+
+@pytest.fixture(scope="module")
+def time():
+    rng = np.random.default_rng(0)
+    return np.sort(rng.uniform(0, 30, 2000))
+
+
+def test_standard_power_pure_sinusoid(time):
+    flux = 0.1 * np.sin(2 * np.pi * 1.7 * time)
+    assert np.isclose(standard_power(0.1, np.var(flux)), 1, rtol=1e-2)
+
+
+def test_fap_baluev_matches_astropy(time):
+    rng = np.random.default_rng(1)
+    flux = rng.normal(0, 1, len(time))
+    z = np.array([0.005, 0.01, 0.02])
+    ls = LombScargle(time, flux)
+    expected = ls.false_alarm_probability(z, method='baluev', maximum_frequency=30)
+    # astropy uses the last frequency of its grid as upper end, which is slightly below maximum_frequency
+    _, f_max = ls.autofrequency(maximum_frequency=30, return_freq_limits=True)
+    assert np.allclose(fap_baluev(z, f_max, time), expected, rtol=1e-6)
+
+
+def test_fap_baluev_vectorized_and_monotonic(time):
+    z = np.linspace(0, 1, 50)
+    fap = fap_baluev(z, 30, time)
+    assert fap.shape == z.shape
+    assert np.all((fap >= 0) & (fap <= 1))
+    assert np.all(np.diff(fap) <= 0)
+
+
+def test_fap_bootstrap_fraction():
+    null = np.sort(np.linspace(0.01, 0.1, 100))
+    fap = fap_bootstrap(np.array([0.0, 0.055, 1.0]), null)
+    assert fap[0] == 1
+    assert np.isclose(fap[1], 0.5, atol=0.02)
+    assert fap[2] == 0
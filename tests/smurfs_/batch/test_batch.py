@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from smurfs.smurfs_common.signal import frequency_finder
+from smurfs.smurfs_common.signal.frequency_finder import FFinder, Frequency, sin_multiple
+from smurfs.smurfs_common.signal.lightcurve import LightCurve
+from smurfs.smurfs_common.smurfs_.smurfs import Smurfs
+from smurfs.smurfs_common.support.options import FitMethod
+
+# amplitude, frequency and phase of the signal. The first two peaks are closer than 2.5/T
+params = [0.05, 1.7, 0.1, 0.03, 1.8, 0.7, 0.02, 4.3, 0.5, 0.015, 6.1, 0.2, 0.01, 8.9, 0.9]
+
+
+def smurfs():
+    rng = np.random.default_rng(5)
+    time = np.arange(0, 20, 0.02)
+    flux = sin_multiple(time, *params) + rng.normal(0, 0.001, len(time))
+    return Smurfs.from_lightcurve(LightCurve(time=time, flux=flux), label="batch", quiet_flag=True)
+
+
+def sorted_result(s):
+    result = s.result.sort_values('frequency', key=lambda c: [i.nominal_value for i in c])
+    return (np.array([i.nominal_value for i in result.frequency]),
+            np.array([i.nominal_value for i in result.amp]))
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """
+    Records every batch, together with the candidates that were created while it was collected and their
+    significance at that time.
+    """
+    batches = []
+    candidates = []
+
+    class RecordingFrequency(Frequency):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            if kwargs.get('peak_index') is not None:
+                candidates.append(self)
+
+    batch_candidates = FFinder._batch_candidates
+
+    def record(self, f, batch_size, batch_separation, *args):
+        candidates.clear()
+        batch = batch_candidates(self, f, batch_size, batch_separation, *args)
+        time = f.lc.time.value
+        batches.append((batch, [(c, c.significant) for c in candidates], batch_size,
+                        batch_separation / (time[-1] - time[0])))
+        return batch
+
+    monkeypatch.setattr(frequency_finder, 'Frequency', RecordingFrequency)
+    monkeypatch.setattr(FFinder, '_batch_candidates', record)
+    return batches
+
+
+def test_batch_matches_single_frequencies(batches):
+    single = smurfs()
+    single.run(snr=4, window_size=2, mode=FitMethod.SCIPY)
+    batch = smurfs()
+    batch.run(snr=4, window_size=2, mode=FitMethod.SCIPY, batch_size=3)
+
+    assert len(single.result) == len(batch.result) == 5
+    assert any(len(b) > 1 for b, _, _, _ in batches)
+    f_single, amp_single = sorted_result(single)
+    f_batch, amp_batch = sorted_result(batch)
+    np.testing.assert_allclose(f_batch, f_single, atol=1e-3)
+    np.testing.assert_allclose(amp_batch, amp_single, rtol=0.02)
+    np.testing.assert_allclose(f_batch, params[1::3], atol=0.01)
+
+
+def test_batch_peaks_are_resolved(batches):
+    smurfs().run(snr=4, window_size=2, mode=FitMethod.SCIPY, batch_size=3)
+
+    for batch, _, _, min_distance in batches:
+        frequencies = np.array([b.f_guess.value for b in batch])
+        distances = np.abs(frequencies[:, None] - frequencies[None, :])[np.triu_indices(len(batch), 1)]
+        assert np.all(distances > min_distance)
+
+
+def test_batch_stops_at_insignificant_peak(batches):
+    smurfs().run(snr=4, window_size=2, mode=FitMethod.SCIPY, batch_size=10)
+
+    assert len(batches) > 0
+    for batch, candidates, batch_size, _ in batches:
+        # all candidates except the last one are significant and part of the batch, the last one ends the search
+        assert [c for c, _ in candidates[:len(batch) - 1]] == batch[1:]
+        assert all(significant for _, significant in candidates[:len(batch) - 1])
+        if len(batch) < batch_size:
+            assert len(candidates) == len(batch)
+            assert not candidates[-1][1]
+
+
+@pytest.mark.parametrize("mode", [FitMethod.LMFIT, FitMethod.AUTO])
+def test_batch_uses_fit_mode(batches, monkeypatch, mode):
+    modes = []
+    fit_batch = FFinder._fit_batch
+
+    def record(self, batch, lc, mode):
+        modes.append(mode)
+        return fit_batch(self, batch, lc, mode)
+
+    single = smurfs()
+    single.run(snr=4, window_size=2, mode=mode)
+    monkeypatch.setattr(FFinder, '_fit_batch', record)
+    batch = smurfs()
+    batch.run(snr=4, window_size=2, mode=mode, batch_size=3)
+
+    assert len(modes) > 0 and set(modes) == {mode}
+    assert len(single.result) == len(batch.result) == 5
+    np.testing.assert_allclose(sorted_result(batch)[0], sorted_result(single)[0], atol=1e-3)
+
+
+def test_batch_peaks_are_significant_after_removal(batches):
+    s = smurfs()
+    s.run(snr=4, window_size=2, mode=FitMethod.SCIPY, batch_size=10)
+
+    assert any(len(b) > 1 for b, _, _, _ in batches)
+    assert all(s.result.snr > 4)
+    # peaks after the first one of a batch are checked on a light curve without the stronger peaks
+    candidates = {id(c) for b, _, _, _ in batches for c in b[1:]}
+    assert not any(id(f) in candidates for f in s.result.f_obj)
@@ -0,0 +1,46 @@
+import json
+
+import numpy as np
+
+from smurfs.smurfs_common.signal.frequency_finder import sin_multiple
+from smurfs.smurfs_common.signal.lightcurve import LightCurve
+from smurfs.smurfs_common.smurfs_.catalog import FrequencyCatalog
+from smurfs.smurfs_common.smurfs_.smurfs import Smurfs
+
+
+def analyse(label, frequencies, seed):
+    rng = np.random.default_rng(seed)
+    time = np.arange(0, 20, 0.02)
+    flux = sum(sin_multiple(time, 0.05, f, 0.3) for f in frequencies) + rng.normal(0, 0.002, len(time))
+    s = Smurfs.from_lightcurve(LightCurve(time=time, flux=flux), label=label, quiet_flag=True)
+    s.target_name = label
+    s.run(snr=4, window_size=2, improve_fit=False, mode='scipy')
+    return s
+
+
+def test_catalog_queries(tmp_path):
+    with FrequencyCatalog(tmp_path / "catalog.db") as catalog:
+        first = catalog.add(analyse("star_a", [2.1, 5.3], 1))
+        catalog.add(analyse("star_b", [2.1, 7.9], 2))
+        catalog.add(analyse("star_c", [4.4], 3))
+
+        runs = catalog.runs()
+        assert list(runs.target) == ["star_a", "star_b", "star_c"]
+        assert json.loads(runs.settings[0])["Signal to Noise Ratio"] == 4
+        assert abs(json.loads(runs.statistics[0])["Nyquist frequency"] - 25) < 1e-6
+
+        frequencies = catalog.frequencies(first)
+        assert abs(frequencies.frequency[0] - 2.1) < 0.01 or abs(frequencies.frequency[0] - 5.3) < 0.01
+
+        assert sorted(catalog.targets_near(2.1, 0.01)) == ["star_a", "star_b"]
+        assert catalog.targets_near(4.4, 0.01) == ["star_c"]
+        assert catalog.targets_near(10, 0.01) == []
+
+        shared = catalog.shared_frequencies(0.01)
+        assert len(shared) == 1
+        assert abs(shared.frequency[0] - 2.1) < 0.01
+        assert shared.n_targets[0] == 2
+
+    # the catalog persists
+    with FrequencyCatalog(tmp_path / "catalog.db") as catalog:
+        assert len(catalog.runs("star_b")) == 1
@@ -0,0 +1,46 @@
+import numpy as np
+
+from smurfs.smurfs_common.signal.frequency_finder import sin_multiple
+from smurfs.smurfs_common.signal.lightcurve import LightCurve
+from smurfs.smurfs_common.smurfs_.smurfs import Smurfs
+
+
+def smurfs():
+    rng = np.random.default_rng(8)
+    time = np.arange(0, 20, 0.02)
+    flux = sin_multiple(time, 0.05, 1.7, 0.1, 0.02, 4.3, 0.5, 0.01, 6.1, 0.2) + rng.normal(0, 0.001, len(time))
+    return Smurfs.from_lightcurve(LightCurve(time=time, flux=flux), label="limits", quiet_flag=True)
+
+
+def test_stops_on_significance():
+    s = smurfs()
+    s.run(snr=4, window_size=2)
+    assert s.statistics['Stop reason'][0] == "insignificant"
+
+
+def test_max_frequencies_keeps_results():
+    s = smurfs()
+    s.run(snr=4, window_size=2, max_frequencies=2)
+    assert len(s.result) == 2
+    assert s.statistics['Stop reason'][0] == "max_frequencies"
+    assert abs(s.result.frequency[0].nominal_value - 1.7) < 0.01
+
+
+def test_max_frequencies_trims_batches():
+    s = smurfs()
+    s.run(snr=4, window_size=2, batch_size=3, max_frequencies=2)
+    assert len(s.result) == 2
+
+
+def test_max_wall_time():
+    s = smurfs()
+    s.run(snr=4, window_size=2, max_wall_time=0)
+    assert len(s.result) == 0
+    assert s.statistics['Stop reason'][0] == "wall_time"
+
+
+def test_fit_time_falls_back_to_closed_form():
+    s = smurfs()
+    s.run(snr=4, window_size=2, fit_time=0, max_frequencies=3)
+    assert len(s.result) == 3
+    np.testing.assert_allclose(sorted(f.nominal_value for f in s.result.frequency), [1.7, 4.3, 6.1], atol=0.01)
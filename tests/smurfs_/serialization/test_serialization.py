@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+import pytest
+
+from smurfs.smurfs_common.signal.frequency_finder import sin_multiple
+from smurfs.smurfs_common.signal.lightcurve import LightCurve
+from smurfs.smurfs_common.smurfs_.serialization import dump_state
+from smurfs.smurfs_common.smurfs_.smurfs import Smurfs
+
+
+@pytest.fixture(scope="module")
+def analysis():
+    rng = np.random.default_rng(4)
+    time = np.arange(0, 20, 0.02)
+    flux = sin_multiple(time, 0.05, 1.7, 0.1, 0.02, 4.3, 0.5) + rng.normal(0, 0.002, len(time))
+    s = Smurfs.from_lightcurve(LightCurve(time=time, flux=flux), label="synthetic", quiet_flag=True)
+    s.run(snr=4, window_size=2, improve_fit=False, mode='scipy')
+    s.notes = "test"
+    return s
+
+
+@pytest.mark.parametrize("spectra", [False, True])
+def test_round_trip(analysis, tmp_path, spectra):
+    dump_state(analysis, tmp_path / "state", spectra)
+    loaded = Smurfs.load(tmp_path, quiet_flag=True)
+
+    # light curves and spectra are only created on access
+    assert {"lc", "pdg", "original_lc", "res_lc"} <= set(loaded._lazy)
+
+    np.testing.assert_allclose([i.nominal_value for i in loaded.result.frequency],
+                               [i.nominal_value for i in analysis.result.frequency])
+    np.testing.assert_allclose([i.std_dev for i in loaded.result.amp], [i.std_dev for i in analysis.result.amp])
+    assert loaded.result.significant.tolist() == analysis.result.significant.tolist()
+    assert loaded.combinations.Solution.tolist() == analysis.combinations.Solution.tolist()
+    assert loaded.settings.equals(analysis.settings)
+    assert loaded.notes == "test"
+    assert loaded.statistics[['Function evaluations', 'Stop reason']].equals(
+        analysis.statistics[['Function evaluations', 'Stop reason']])
+    assert loaded.statistics['Stop reason'][0] is not None
+
+    np.testing.assert_allclose(loaded.lc.flux.value, analysis.lc.flux.value)
+    np.testing.assert_allclose(loaded.res_lc.flux.value, analysis.res_lc.flux.value)
+    np.testing.assert_allclose(loaded.pdg.power.value, analysis.pdg.power.value)
+    assert "lc" not in loaded._lazy
+
+
+def test_newer_version_is_rejected(analysis, tmp_path):
+    dump_state(analysis, tmp_path)
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    manifest["version"] += 1
+    (tmp_path / "manifest.json").write_text(json.dumps(manifest))
+
+    with pytest.raises(ValueError):
+        Smurfs.load(tmp_path)
+
+
+def memory_mapped(values):
+    while values is not None:
+        if isinstance(values, np.memmap):
+            return True
+        values = values.base
+    return False
+
+
+def test_light_curves_are_memory_mapped(analysis, tmp_path):
+    dump_state(analysis, tmp_path)
+    loaded = Smurfs.load(tmp_path, quiet_flag=True)
+
+    for lc in [loaded.lc, loaded.res_lc]:
+        assert memory_mapped(lc.flux.value)
+        assert not lc.flux.value.flags.writeable
+    assert memory_mapped(loaded.lc.flux_err.value)
+    np.testing.assert_allclose(loaded.lc.time.value, analysis.lc.time.value)
+    np.testing.assert_allclose(loaded.lc.flux_err.value, analysis.lc.flux_err.value)
+
+
+def test_round_trip_of_loaded_state(analysis, tmp_path):
+    dump_state(analysis, tmp_path / "first")
+    dump_state(Smurfs.load(tmp_path / "first", quiet_flag=True), tmp_path / "second")
+    loaded = Smurfs.load(tmp_path / "second", quiet_flag=True)
+
+    assert loaded._nfev == analysis._ff.nfev
+    assert loaded._stop_reason == analysis._ff.stop_reason
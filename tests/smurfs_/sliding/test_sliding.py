@@ -0,0 +1,77 @@
+import pytest
+import numpy as np
+
+from smurfs.smurfs_common.smurfs_.sliding import segment_bounds, match_tracks
+
+
+@pytest.fixture
+def time():
+    return np.arange(0, 20, 0.01)
+
+
+def test_segment_bounds_basic(time):
+    segments = segment_bounds(time, 5, 2.5)
+    assert len(segments) == 7
+    for start, stop, t_mid in segments:
+        assert time[start] >= t_mid - 2.5
+        assert time[stop - 1] <= t_mid + 2.5
+
+
+def test_segment_bounds_skips_gaps(time):
+    time = time[(time < 6) | (time > 14)]
+    segments = segment_bounds(time, 2, 2, min_points=100)
+    assert all(not (6 < t_mid < 14) for _, _, t_mid in segments)
+
+
+def test_segment_bounds_window_too_long(time):
+    with pytest.raises(ValueError):
+        segment_bounds(time, 30, 1)
+
+
+def test_segment_bounds_invalid_step(time):
+    with pytest.raises(ValueError):
+        segment_bounds(time, 5, 0)
+
+
+def test_match_tracks_follows_drifting_frequency():
+    segments = [np.array([[1.00], [5.0]]), np.array([[1.02], [5.01]]), np.array([[1.04], [4.99]])]
+    ids = match_tracks(segments, tolerance=0.1)
+    assert ids.tolist() == [0, 1, 0, 1, 0, 1]
+
+
+def test_match_tracks_new_track_outside_tolerance():
+    segments = [np.array([[1.0]]), np.array([[1.0], [3.0]]), np.empty((0, 1)), np.array([[3.05]])]
+    ids = match_tracks(segments, tolerance=0.1)
+    assert ids.tolist() == [0, 0, 1, 1]
+
+
+def test_segment_phase_error_independent_of_time_origin():
+    from smurfs.smurfs_common.signal.frequency_finder import sin_multiple
+    from smurfs.smurfs_common.signal.lightcurve import LightCurve
+    from smurfs.smurfs_common.smurfs_.sliding import share_light_curve, _run_segment
+
+    rng = np.random.default_rng(1)
+    time = np.arange(0, 30, 0.02)
+    flux = sin_multiple(time, 0.05, 2.3, 0.2) + rng.normal(0, 0.005, len(time))
+    run_kwargs = dict(snr=4, window_size=2, improve_fit=False, mode='scipy')
+
+    segments = []
+    for offset in [0, 2458000]:
+        with share_light_curve(LightCurve(time=time + offset, flux=flux)) as (shm_name, shape):
+            segments.append(_run_segment(shm_name, shape, 1000, 1500, 25 + offset, run_kwargs))
+
+    seg, seg_offset = segments
+    assert len(seg) > 0 and len(seg) == len(seg_offset)
+    # the fit is centred on the segment, so the phase error at its middle is about the error of the fit
+    assert np.all(seg[:, 5] < 0.05)
+    np.testing.assert_allclose(seg_offset[:, 5], seg[:, 5], rtol=1e-2)
+
+
+def test_segment_label_is_not_a_target():
+    from smurfs.smurfs_common.signal.lightcurve import LightCurve
+    from smurfs.smurfs_common.smurfs_.smurfs import Smurfs
+
+    time = np.arange(0, 10, 0.02)
+    s = Smurfs.from_lightcurve(LightCurve(time=time, flux=np.sin(time)), label="Segment 5.00", quiet_flag=True)
+    assert s.label == "Segment 5.00"
+    assert s.target_name is None
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from smurfs.smurfs_common.signal.frequency_finder import sin_multiple
+from smurfs.smurfs_common.signal.lightcurve import LightCurve
+from smurfs.smurfs_common.smurfs_.smurfs import Smurfs
+from smurfs.smurfs_common.smurfs_.sweep import trajectory_length
+
+
+@pytest.fixture
+def snr():
+    return np.array([20, 12, 8, 3, 5, 2, 1])
+
+
+def test_trajectory_length_threshold(snr):
+    assert trajectory_length(snr, 4, 0) == 3
+    assert trajectory_length(snr, 10, 0) == 2
+    assert trajectory_length(snr, 30, 0) == 0
+
+
+def test_trajectory_length_extension(snr):
+    # the insignificant fourth frequency is kept, the fifth one resets the extensions
+    assert trajectory_length(snr, 4, 1) == 6
+    assert trajectory_length(snr, 4, 2) == 7
+
+
+def test_sweep_matches_single_runs():
+    rng = np.random.default_rng(3)
+    time = np.arange(0, 20, 0.02)
+    flux = sin_multiple(time, 0.05, 1.7, 0.1, 0.02, 4.3, 0.5, 0.004, 6.1, 0.2) + rng.normal(0, 0.002, len(time))
+    lc = LightCurve(time=time, flux=flux)
+
+    s = Smurfs.from_lightcurve(lc, quiet_flag=True)
+    sweep = s.run_sweep([3, 6, 10], window_size=[1, 2], extend_frequencies=[0, 1], workers=2, improve_fit=False,
+                        mode='scipy')
+
+    assert set(sweep.window_size) == {1, 2}
+    for snr in [3, 6, 10]:
+        for extend in [0, 1]:
+            single = Smurfs.from_lightcurve(lc, quiet_flag=True)
+            single.run(snr=snr, window_size=2, extend_frequencies=extend, improve_fit=False, mode='scipy')
+            derived = sweep[(sweep.window_size == 2) & (sweep.snr_threshold == snr) &
+                            (sweep.extend_frequencies == extend)]
+
+            assert len(derived) == len(single.result)
+            np.testing.assert_allclose(derived.frequency, [i.nominal_value for i in single.result.frequency])
+            assert derived.significant.tolist() == single.result.significant.tolist()
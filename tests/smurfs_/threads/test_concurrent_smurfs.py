@@ -0,0 +1,42 @@
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from smurfs.smurfs_common.signal.frequency_finder import sin_multiple
+from smurfs.smurfs_common.signal.lightcurve import LightCurve
+from smurfs.smurfs_common.smurfs_.smurfs import Smurfs
+from smurfs.smurfs_common.support.mprint import MPrinter
+from smurfs.smurfs_common.support.settings import Settings
+
+
+def analyse(f, stream):
+    rng = np.random.default_rng(int(f * 10))
+    time = np.arange(0, 20, 0.02)
+    flux = sin_multiple(time, 0.05, f, 0.3) + rng.normal(0, 0.002, len(time))
+
+    s = Smurfs.from_lightcurve(LightCurve(time=time, flux=flux), label=f"f={f}", quiet_flag=True,
+                               printer=MPrinter(json_stream=stream))
+    s.run(snr=4, window_size=2, improve_fit=False, mode='scipy')
+    return s.result
+
+
+def test_concurrent_analyses():
+    frequencies = [1.5, 3.2, 5.7, 8.1]
+    streams = [io.StringIO() for _ in frequencies]
+
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(analyse, frequencies, streams))
+
+    for f, result, stream in zip(frequencies, results, streams):
+        significant = result[result.significant == True]
+        assert abs(significant.frequency.iloc[0].nominal_value - f) < 0.01
+
+        # every instance logs into its own printer
+        labels = {json.loads(line)["message"] for line in stream.getvalue().splitlines()}
+        assert any(f"f={f}" in label for label in labels)
+        assert not any(f"f={other}" in label for label in labels for other in frequencies if other != f)
+
+    # the process wide setting is untouched
+    assert Settings.quiet is False
@@ -0,0 +1,45 @@
+import inspect
+import time
+
+import pytest
+
+from smurfs.smurfs_common.support.limits import FitTimeout, RunLimits, memory_usage, time_budget
+from smurfs.smurfs_common.support.options import StopReason
+
+
+def model(x, amp, f, phase):
+    return amp * x + f + phase
+
+
+def test_time_budget_raises_after_deadline():
+    wrapped = time_budget(model, 0.05)
+    assert wrapped(1, 2, 3, 4) == 9
+    time.sleep(0.06)
+    with pytest.raises(FitTimeout):
+        wrapped(1, 2, 3, 4)
+
+
+def test_time_budget_keeps_signature():
+    assert time_budget(model, None) is model
+    assert list(inspect.signature(time_budget(model, 1)).parameters) == ['x', 'amp', 'f', 'phase']
+
+
+def test_memory_usage():
+    assert memory_usage() > 0
+
+
+def test_run_limits():
+    assert RunLimits().exceeded(1000) is None
+    assert RunLimits().remaining_frequencies(5) is None
+
+    limits = RunLimits(max_frequencies=3)
+    assert limits.exceeded(2) is None
+    assert limits.exceeded(3) == StopReason.MAX_FREQUENCIES
+    assert limits.remaining_frequencies(1) == 2
+
+    limits = RunLimits(max_wall_time=0.01)
+    time.sleep(0.02)
+    assert limits.exceeded(0) == StopReason.WALL_TIME
+
+    assert RunLimits(max_memory=1e-3).exceeded(0) == StopReason.MEMORY
+    assert RunLimits(max_memory=1e9).exceeded(0) is None
@@ -0,0 +1,109 @@
+import io
+import json
+import queue
+
+import pytest
+
+from smurfs.smurfs_common.support.logging import ProcessLogger, LogLevel
+from smurfs.smurfs_common.support.mprint import MPrinter, mprint, menabled, log, info, warn, error, state
+from smurfs.smurfs_common.support.settings import Settings
+
+
+@pytest.fixture(autouse=True)
+def printer():
+    quiet, level, instance = Settings.quiet, Settings.level, MPrinter._instance
+    MPrinter._instance = MPrinter()
+    yield MPrinter._instance
+    Settings.quiet, Settings.level, MPrinter._instance = quiet, level, instance
+
+
+def test_lazy_message_skipped_when_quiet():
+    Settings.quiet = True
+    called = []
+    mprint(lambda: called.append(1) or "text", state, lambda: called.append(2) or {})
+    assert called == []
+
+
+def test_lazy_message_built_when_printed(capsys):
+    Settings.quiet = False
+    mprint(lambda: "lazy text", info)
+    assert "lazy text" in capsys.readouterr().out
+
+
+def test_level_filter(capsys):
+    Settings.quiet = False
+    Settings.level = "warn"
+    mprint("hidden", log)
+    mprint("hidden", info)
+    mprint("shown", warn)
+    mprint("also shown", error)
+    out = capsys.readouterr().out
+    assert "hidden" not in out
+    assert "shown" in out and "also shown" in out
+
+
+def test_enabled_levels():
+    Settings.quiet = False
+    Settings.level = "info"
+    assert not menabled(log)
+    assert menabled(state)
+    Settings.quiet = True
+    assert not menabled(state)
+    MPrinter.set_json_output(io.StringIO())
+    assert menabled(state)
+
+
+def test_json_output(printer):
+    Settings.quiet = True
+    stream = io.StringIO()
+    MPrinter.set_json_output(stream)
+    mprint(lambda: "F0   1.0 c/d", state, lambda: {"frequency": 1.0})
+    mprint("\x1b[7;32;40m colored \x1b[0m", warn)
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert records[0]["level"] == "state"
+    assert records[0]["message"] == "F0   1.0 c/d"
+    assert records[0]["frequency"] == 1.0
+    assert records[1]["level"] == "warn"
+    assert records[1]["message"] == "colored"
+
+
+def test_process_logger_batches():
+    q = queue.Queue()
+    logger = ProcessLogger(q, channel=3, batch_size=3, flush_interval=60)
+
+    # The first message is sent right away, following ones are batched
+    logger.log("first")
+    assert len(q.get_nowait()) == 1
+    logger.log("second")
+    logger.log("third")
+    assert q.empty()
+    logger.log("fourth")
+    batch = q.get_nowait()
+    assert [m["text"].split("] ")[1] for m in batch] == ["second", "third", "fourth"]
+    assert all(m["job"] == 3 for m in batch)
+
+    logger.log("fifth")
+    logger.flush()
+    assert len(q.get_nowait()) == 1
+
+
+def test_process_logger_sends_errors_immediately():
+    q = queue.Queue()
+    logger = ProcessLogger(q, batch_size=100, flush_interval=60)
+    logger.log("first")
+    q.get_nowait()
+    logger.log("warning", LogLevel.WARN)
+    assert q.empty()
+    logger.log("error", LogLevel.ERROR)
+    assert [m["color"] for m in q.get_nowait()] == ["yellow", "red"]
+
+
+def test_mprint_forwards_levels_to_logger(printer):
+    Settings.quiet = True
+    q = queue.Queue()
+    printer.logger = ProcessLogger(q, flush_interval=0)
+    mprint("message", warn, {"key": 1})
+    msg = q.get_nowait()[0]
+    assert msg["color"] == "yellow"
+    assert msg["data"] == {"key": 1}
@@ -0,0 +1,61 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+from smurfs.smurfs_common.support.mprint import MPrinter, mprint, info
+from smurfs.smurfs_common.support.settings import Settings
+
+
+def test_context_overrides_and_restores():
+    default = Settings.quiet
+    with Settings.context(quiet=not default, level="warn"):
+        assert Settings.quiet == (not default)
+        assert Settings.level == "warn"
+        with Settings.context(quiet=default):
+            assert Settings.quiet == default
+        assert Settings.quiet == (not default)
+    assert Settings.quiet == default
+    assert Settings.level == "log"
+
+
+def test_context_is_thread_local():
+    barrier = Barrier(2)
+
+    def run(quiet):
+        with Settings.context(quiet=quiet):
+            # Both threads are inside their context at the same time
+            barrier.wait()
+            return Settings.quiet
+
+    with ThreadPoolExecutor(2) as executor:
+        assert list(executor.map(run, [True, False])) == [True, False]
+
+
+def test_printer_context_is_thread_local():
+    barrier = Barrier(2)
+    streams = [io.StringIO(), io.StringIO()]
+
+    def run(i):
+        with Settings.context(quiet=True), MPrinter.context(MPrinter(json_stream=streams[i])):
+            barrier.wait()
+            mprint(f"message {i}", info)
+
+    with ThreadPoolExecutor(2) as executor:
+        list(executor.map(run, [0, 1]))
+
+    assert "message 0" in streams[0].getvalue() and "message 1" not in streams[0].getvalue()
+    assert "message 1" in streams[1].getvalue() and "message 0" not in streams[1].getvalue()
+
+
+def test_kernels_context_is_thread_local():
+    barrier = Barrier(2)
+    default = Settings.kernels
+
+    def run(kernels):
+        with Settings.context(kernels=kernels):
+            barrier.wait()
+            return Settings.kernels
+
+    with ThreadPoolExecutor(2) as executor:
+        assert list(executor.map(run, ["numpy", "numba"])) == ["numpy", "numba"]
+    assert Settings.kernels == default
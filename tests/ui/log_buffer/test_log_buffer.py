@@ -0,0 +1,81 @@
+import queue
+
+import pytest
+
+from smurfs.smurfs_ui.log_buffer import LogBuffer, next_poll_interval
+
+
+def message(i):
+    return {"text": f"message {i}", "color": "white", "timestamp": ""}
+
+
+def test_since_returns_only_new_messages():
+    buffer = LogBuffer(10)
+    for i in range(3):
+        buffer.append(message(i))
+
+    messages, last_seq, missing = buffer.since(-1)
+    assert [m["text"] for m in messages] == ["message 0", "message 1", "message 2"]
+    assert last_seq == 2
+    assert not missing
+
+    buffer.append(message(3))
+    messages, last_seq, missing = buffer.since(last_seq)
+    assert [m["text"] for m in messages] == ["message 3"]
+    assert last_seq == 3
+
+    assert buffer.since(last_seq)[0] == []
+
+
+def test_capacity_drops_oldest_messages():
+    buffer = LogBuffer(5)
+    for i in range(12):
+        buffer.append(message(i))
+
+    assert buffer.first_seq == 7
+    messages, last_seq, missing = buffer.since(2)
+    assert [m["text"] for m in messages] == [f"message {i}" for i in range(7, 12)]
+    assert last_seq == 11
+    assert missing
+
+    messages, _, missing = buffer.since(8)
+    assert len(messages) == 3
+    assert not missing
+
+
+def test_since_limit():
+    buffer = LogBuffer(10)
+    for i in range(8):
+        buffer.append(message(i))
+
+    messages, last_seq, missing = buffer.since(-1, limit=3)
+    assert [m["text"] for m in messages] == ["message 5", "message 6", "message 7"]
+    assert last_seq == 7
+    assert missing
+
+
+def test_drain():
+    q = queue.Queue()
+    for i in range(4):
+        q.put(message(i))
+
+    buffer = LogBuffer(10)
+    assert buffer.drain(q, max_messages=3) == 3
+    assert buffer.drain(q) == 1
+    assert buffer.last_seq == 3
+
+    q.put([message(4), message(5)])
+    assert buffer.drain(q) == 2
+    assert buffer.since(3)[0] == [message(4), message(5)]
+
+
+def test_invalid_capacity():
+    with pytest.raises(ValueError):
+        LogBuffer(0)
+
+
+def test_next_poll_interval():
+    assert next_poll_interval(1600, True) == 100
+    assert next_poll_interval(100, False) == 200
+    assert next_poll_interval(1600, False) == 2000
+    assert next_poll_interval(2000, False) == 2000
@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from smurfs.smurfs_ui.progress import ProgressWriter, read_progress, downsample_peaks
+
+
+def pdg(n):
+    frequency = np.linspace(0.1, 10, n)
+    return SimpleNamespace(frequency=SimpleNamespace(value=frequency),
+                           power=SimpleNamespace(value=np.sin(frequency) ** 2))
+
+
+def frequency(f, amp, phase, snr):
+    return SimpleNamespace(f=f, amp=amp, phase=phase, snr=snr)
+
+
+def test_read_missing_file(tmp_path):
+    assert read_progress(tmp_path / "missing.progress") is None
+
+
+def test_publish_and_read(tmp_path):
+    path = tmp_path / "job.progress"
+    writer = ProgressWriter(path, max_rows=2)
+
+    writer.publish(pdg(100), [])
+    snapshot = read_progress(path)
+    assert snapshot.iteration == 0
+    assert len(snapshot.frequency) == 100
+    np.testing.assert_allclose(snapshot.power, pdg(100).power.value)
+    assert snapshot.table.shape == (0, 4)
+    assert not snapshot.finished
+
+    result = [frequency(1, 0.1, 0.2, 10), frequency(2, 0.05, 0.3, 8), frequency(3, 0.01, 0.4, 5)]
+    writer.publish(pdg(100), result)
+    new_snapshot = read_progress(path)
+    assert new_snapshot.seq > snapshot.seq
+    assert new_snapshot.iteration == 3
+    # only the newest rows are kept
+    np.testing.assert_allclose(new_snapshot.table, [[2, 0.05, 0.3, 8], [3, 0.01, 0.4, 5]])
+
+    writer.finish()
+    assert read_progress(path).finished
+
+
+def test_publish_larger_spectrum(tmp_path):
+    path = tmp_path / "job.progress"
+    writer = ProgressWriter(path)
+    writer.publish(pdg(50), [])
+    writer.publish(pdg(200), [])
+
+    snapshot = read_progress(path)
+    assert len(snapshot.frequency) == 200
+    assert snapshot.seq % 2 == 0
+
+
+def test_downsample_peaks_keeps_maxima():
+    x = np.arange(10000)
+    y = np.zeros(10000)
+    y[1234] = 5
+    y[9999] = 3
+
+    x_ds, y_ds = downsample_peaks(x, y, 100)
+    assert len(x_ds) == 100
+    assert 1234 in x_ds and 9999 in x_ds
+    assert np.amax(y_ds) == 5
+
+
+def test_downsample_peaks_short_input():
+    x = np.arange(10)
+    x_ds, y_ds = downsample_peaks(x, x, 100)
+    assert len(x_ds) == 10